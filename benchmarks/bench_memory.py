@@ -0,0 +1,107 @@
+"""Memory benchmark of the bookkeeping of files held by a run: the OpenAI SDK models against the compact records.
+
+Listing the files of an organization keeps one object per file for the whole run (discovery, upload and cleanup). The
+benchmark builds the objects the same way the OpenAI SDK builds them from the API responses and measures the memory they
+retain with `tracemalloc`.
+
+Usage:
+    python -m benchmarks.bench_memory --files 10000 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+import tracemalloc
+from typing import TYPE_CHECKING, Any
+
+from openai.types import FileDeleted
+from openai.types.beta.vector_stores import VectorStoreFile
+from openai.types.file_object import FileObject
+
+from src.records import DeletedRecord, FileRecord, VectorStoreFileRecord
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+
+def file_response(i: int) -> dict[str, Any]:
+    return {
+        "id": f"file-{i:024d}",
+        "object": "file",
+        "bytes": 12_345,
+        "created_at": 1_700_000_000 + i,
+        "filename": f"wcc_YHgNyXx6qqz3hK8vd_{i}.json",
+        "purpose": "assistants",
+        "status": "processed",
+        "status_details": None,
+    }
+
+
+def vector_store_file_response(i: int) -> dict[str, Any]:
+    return {
+        "id": f"file-{i:024d}",
+        "object": "vector_store.file",
+        "created_at": 1_700_000_000 + i,
+        "usage_bytes": 4_321,
+        "vector_store_id": "vs_abc123",
+        "status": "completed",
+        "last_error": None,
+        "chunking_strategy": {"type": "static", "static": {"max_chunk_size_tokens": 800, "chunk_overlap_tokens": 400}},
+    }
+
+
+def retained_bytes(build: Callable[[], Any]) -> int:
+    """Return the memory retained by the result of `build()`."""
+
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        after = tracemalloc.get_traced_memory()[0]
+    finally:
+        tracemalloc.stop()
+    del result
+    return after - before
+
+
+def cases(n: int) -> dict[str, Callable[[], Any]]:
+    # the SDK builds the models from the JSON responses without validation (`construct`)
+    return {
+        "files/FileObject": lambda: [FileObject.construct(**file_response(i)) for i in range(n)],
+        "files/FileRecord": lambda: [FileRecord.from_file(FileObject.construct(**file_response(i))) for i in range(n)],
+        "vector_store_files/VectorStoreFile": lambda: [VectorStoreFile.construct(**vector_store_file_response(i)) for i in range(n)],
+        "vector_store_files/VectorStoreFileRecord": lambda: [
+            VectorStoreFileRecord.from_file(VectorStoreFile.construct(**vector_store_file_response(i))) for i in range(n)
+        ],
+        "deleted/FileDeleted": lambda: [FileDeleted.construct(id=f"file-{i:024d}", object="file", deleted=True) for i in range(n)],
+        "deleted/DeletedRecord": lambda: [
+            DeletedRecord.from_deleted(FileDeleted.construct(id=f"file-{i:024d}", object="file", deleted=True)) for i in range(n)
+        ],
+    }
+
+
+def run(sizes: list[int]) -> dict[str, dict[str, float]]:
+    """Return the retained memory (total MB and bytes per file) of every representation."""
+
+    results = {}
+    for n in sizes:
+        for case, build in cases(n).items():
+            nbytes = retained_bytes(build)
+            results[f"{case}[{n}]"] = {"mb": nbytes / 2**20, "bytesPerFile": nbytes / n}
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, nargs="+", default=[10_000, 100_000], help="Number of files")
+    args = parser.parse_args()
+
+    for name, r in run(args.files).items():
+        print(f"{name:<55} {r['mb']:>10.1f} MB {r['bytesPerFile']:>10.0f} B/file")  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
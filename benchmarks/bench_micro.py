@@ -0,0 +1,166 @@
+"""Micro-benchmarks of the CPU-side parts of the pipeline: splitting, projection and serialisation.
+
+The benchmarks use the crawler datasets in `data/` scaled up synthetically to the requested number of items. Results can
+be stored as a named baseline and later compared against it. The baseline `main` in `benchmarks/baselines/` is the
+reference of the repository, its `meta` records the machine and the Python version it was measured on, timings from
+another machine are only roughly comparable.
+
+Usage:
+    python -m benchmarks.bench_micro --sizes 1000 10000 --save main
+    python -m benchmarks.bench_micro --sizes 1000 10000 --compare main --fail-on-regression
+
+Tokenization benchmarks are skipped when the tiktoken encoding cannot be loaded (it is downloaded on the first use).
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import timeit
+from pathlib import Path
+from typing import TYPE_CHECKING, Any
+
+from src.projection import compile_projection
+from src.utils import get_nested_value, split_data_if_required, split_data_into_batches
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+ROOT = Path(__file__).parent.parent
+BASELINES_DIR = Path(__file__).parent / "baselines"
+FIXTURES = {"web": ROOT / "data" / "dataset_apify-web.json", "actors": ROOT / "data" / "dataset_apify-public-actors.json"}
+FIELDS = {"web": ["url", "text", "metadata.title", "metadata.headers.0"], "actors": ["url", "title", "description", "usersTotal"]}
+MAX_TOKENS = 20_000
+
+
+def load_fixture(name: str, size: int) -> list[dict]:
+    """Scale the crawler dataset up to `size` items, every item gets a unique url and a slightly different text."""
+
+    items = json.loads(FIXTURES[name].read_text())
+    scaled = []
+    for i in range(size):
+        item = dict(items[i % len(items)])
+        item["url"] = f"{item['url']}?page={i}"
+        if "text" in item:
+            item["text"] = f"{item['text']} {i}"
+            item["metadata"] = {"title": item["text"][:60], "headers": [f"h{i}"]}
+        scaled.append(item)
+    return scaled
+
+
+def load_encoding() -> Any:
+    try:
+        import tiktoken
+
+        return tiktoken.encoding_for_model("gpt-3.5-turbo")
+    except Exception as e:
+        print(f"tiktoken encoding is not available, skipping tokenization benchmarks: {e}", file=sys.stderr)  # noqa: T201
+        return None
+
+
+def benchmarks(name: str, data: list[dict], encoding: Any) -> dict[str, Callable[[], Any]]:
+    fields = FIELDS[name]
+    project = compile_projection(fields)
+    projected = project(data)
+    cases: dict[str, Callable[[], Any]] = {
+        "projection/get_nested_value": lambda: [{k: get_nested_value(d, k) for k in fields} for d in data],
+        "projection/compile_projection": lambda: project(data),
+        "serialisation/json_dumps_items": lambda: [json.dumps(d) for d in projected],
+        "serialisation/json_dumps_file": lambda: json.dumps(projected).encode("utf-8"),
+    }
+    if encoding is not None:
+        cases["split/split_data_into_batches"] = lambda: split_data_into_batches(projected, MAX_TOKENS, encoding)
+        cases["split/split_data_if_required"] = lambda: asyncio.run(split_data_if_required(projected, encoding))
+    return cases
+
+
+def run(sizes: list[int], repeat: int = 5, fixtures: list[str] | None = None) -> dict[str, dict[str, float]]:
+    """Run all benchmarks, return the best and the median time (in seconds) of every benchmark."""
+
+    encoding = load_encoding()
+    results = {}
+    for fixture in fixtures or list(FIXTURES):
+        for size in sizes:
+            data = load_fixture(fixture, size)
+            for case, fn in benchmarks(fixture, data, encoding).items():
+                times = timeit.Timer(fn).repeat(repeat=repeat, number=1)
+                results[f"{case}[{fixture}-{size}]"] = {"min": min(times), "median": statistics.median(times)}
+    return results
+
+
+def compare(results: dict[str, dict[str, float]], baseline: dict[str, dict[str, float]], threshold: float) -> list[str]:
+    """Print the comparison report, return names of benchmarks slower than the baseline by more than `threshold`."""
+
+    regressions = []
+    print(f"{'benchmark':<60} {'baseline [ms]':>14} {'current [ms]':>13} {'ratio':>7}")  # noqa: T201
+    for name, r in results.items():
+        if not (b := baseline.get(name)):
+            print(f"{name:<60} {'-':>14} {r['min'] * 1000:>13.2f} {'new':>7}")  # noqa: T201
+            continue
+        ratio = r["min"] / b["min"] if b["min"] else float("inf")
+        flag = " !" if ratio > threshold else ""
+        if flag:
+            regressions.append(name)
+        print(f"{name:<60} {b['min'] * 1000:>14.2f} {r['min'] * 1000:>13.2f} {ratio:>7.2f}{flag}")  # noqa: T201
+    return regressions
+
+
+def machine_info() -> dict[str, Any]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def load_baseline(name: str) -> dict[str, Any]:
+    """Load the baseline `name`, exit with a message listing the stored baselines when it does not exist."""
+
+    path = BASELINES_DIR / f"{name}.json"
+    if not path.exists():
+        stored = ", ".join(sorted(p.stem for p in BASELINES_DIR.glob("*.json"))) or "none"
+        sys.exit(f"Baseline {name!r} does not exist in {BASELINES_DIR} (stored baselines: {stored}), create it with --save {name}")
+    baseline: dict[str, Any] = json.loads(path.read_text())
+    return baseline
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 10_000], help="Number of items of the scaled datasets")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--fixtures", nargs="+", choices=list(FIXTURES))
+    parser.add_argument("--save", metavar="NAME", help="Save results as baseline NAME")
+    parser.add_argument("--compare", metavar="NAME", help="Compare results with baseline NAME")
+    parser.add_argument("--threshold", type=float, default=1.2, help="Slowdown ratio reported as a regression")
+    parser.add_argument("--fail-on-regression", action="store_true")
+    args = parser.parse_args()
+
+    baseline = load_baseline(args.compare) if args.compare else None
+    results = run(args.sizes, args.repeat, args.fixtures)
+
+    if baseline:
+        if (meta := baseline["meta"]) != meta | machine_info():
+            print(f"The baseline was measured on another machine or Python version: {meta}", file=sys.stderr)  # noqa: T201
+        regressions = compare(results, baseline["results"], args.threshold)
+        if regressions and args.fail_on_regression:
+            sys.exit(f"Regressions: {', '.join(regressions)}")
+    else:
+        for name, r in results.items():
+            print(f"{name:<60} min {r['min'] * 1000:>10.2f} ms, median {r['median'] * 1000:>10.2f} ms")  # noqa: T201
+
+    if args.save:
+        BASELINES_DIR.mkdir(exist_ok=True)
+        baseline = {"meta": machine_info() | {"sizes": args.sizes, "repeat": args.repeat}, "results": results}
+        (BASELINES_DIR / f"{args.save}.json").write_text(json.dumps(baseline, indent=2, sort_keys=True) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""End-to-end throughput benchmark of the ingestion pipeline.
+
+Runs the Actor (`python -m src`) against the local fake OpenAI/Apify server (see `benchmarks/fake_server.py`) on
+synthetic datasets and key-value stores and reports files/s, requests per file, peak RSS and wall time.
+
+Usage:
+    python -m benchmarks.bench_pipeline --items 1000 10000 100000 --records 100 --latency-ms 20 --output bench.json
+
+Without `--assistant-id` every dataset is uploaded as a single file (tokenization requires tiktoken encodings).
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+ROOT = Path(__file__).parent.parent
+
+
+@dataclass
+class BenchmarkResult:
+    items: int
+    records: int
+    files_created: int
+    wall_time_secs: float
+    files_per_sec: float
+    requests: int
+    requests_per_file: float
+    peak_rss_mb: float
+    exit_code: int
+    requests_by_endpoint: dict[str, int]
+    run_report: dict
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return int(s.getsockname()[1])
+
+
+def get_stats(url: str) -> dict:
+    with urllib.request.urlopen(f"{url}/__stats") as r:  # noqa: S310
+        return dict(json.load(r))
+
+
+def reset_state(url: str) -> None:
+    urllib.request.urlopen(urllib.request.Request(f"{url}/__reset", method="POST")).close()  # noqa: S310
+
+
+def is_running(url: str) -> bool:
+    try:
+        get_stats(url)
+    except OSError:
+        return False
+    return True
+
+
+def start_fake_server(server_args: list[str]) -> tuple[subprocess.Popen, str]:
+    port = free_port()
+    cmd = [sys.executable, "-m", "benchmarks.fake_server", "--port", str(port), *server_args]
+    proc = subprocess.Popen(cmd, cwd=ROOT, stdout=subprocess.DEVNULL)  # noqa: S603
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        if is_running(url):
+            return proc, url
+        time.sleep(0.05)
+    proc.kill()
+    raise RuntimeError("Fake server did not start")
+
+
+def run_scenario(url: str, items: int, records: int, actor_input: dict | None = None, *, reset: bool = True) -> BenchmarkResult:
+    """Run the Actor once and measure it, the Actor runs in a subprocess so that its peak RSS can be measured.
+
+    The server state is cleared first unless `reset` is False (then the files from previous runs are replaced).
+    """
+
+    if reset:
+        reset_state(url)
+
+    with tempfile.TemporaryDirectory() as storage_dir:
+        input_dir = Path(storage_dir) / "key_value_stores" / "default"
+        input_dir.mkdir(parents=True)
+        payload = {
+            "vectorStoreId": "vs-benchmark",
+            "openaiApiKey": "benchmark",
+            "datasetFields": ["url", "text", "metadata.title"],
+            "datasetId": f"synthetic-{items}" if items else None,
+            "keyValueStoreId": f"synthetic-{records}" if records else None,
+            "filePrefix": "benchmark",
+        } | (actor_input or {})
+        (input_dir / "INPUT.json").write_text(json.dumps(payload))
+
+        env = os.environ | {
+            "OPENAI_BASE_URL": f"{url}/v1",
+            "APIFY_API_BASE_URL": url,
+            "CRAWLEE_STORAGE_DIR": storage_dir,
+            "CRAWLEE_PURGE_ON_START": "0",
+            "APIFY_LOG_LEVEL": "WARNING",
+        }
+        before = get_stats(url)
+        start = time.perf_counter()
+        proc = subprocess.Popen([sys.executable, "-m", "src"], cwd=ROOT, env=env, stdout=subprocess.DEVNULL)  # noqa: S603
+        _, status, rusage = os.wait4(proc.pid, 0)
+        wall_time = time.perf_counter() - start
+        after = get_stats(url)
+        report_path = input_dir / "RUN_REPORT.json"
+        run_report = json.loads(report_path.read_text()) if report_path.exists() else {}
+
+    requests = {k: v - before["requests"].get(k, 0) for k, v in after["requests"].items() if v - before["requests"].get(k, 0)}
+    files_created = after["created"].get("files", 0) - before["created"].get("files", 0)
+    total = sum(requests.values())
+    return BenchmarkResult(
+        items=items,
+        records=records,
+        files_created=files_created,
+        wall_time_secs=round(wall_time, 3),
+        files_per_sec=round(files_created / wall_time, 2),
+        requests=total,
+        requests_per_file=round(total / files_created, 2) if files_created else 0,
+        peak_rss_mb=round(rusage.ru_maxrss / 1024, 1),
+        exit_code=os.waitstatus_to_exitcode(status),
+        requests_by_endpoint=requests,
+        run_report=run_report,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, nargs="+", default=[1_000, 10_000, 100_000], help="Dataset sizes to benchmark")
+    parser.add_argument("--records", type=int, default=100, help="Number of key-value store records in every scenario")
+    parser.add_argument("--assistant-id", help="Assistant ID, enables splitting of datasets into files (requires tiktoken encodings)")
+    parser.add_argument("--max-concurrency", type=int, default=5)
+    parser.add_argument("--output", type=Path, help="Write results as JSON")
+    parser.add_argument("--keep-state", action="store_true", help="Keep files between scenarios, every run then replaces the previous files")
+    parser.add_argument("--latency-ms", default="0")
+    parser.add_argument("--processing-delay-ms", default="0")
+    parser.add_argument("--failure-rate", default="0")
+    parser.add_argument("--rate-limit", default="0")
+    parser.add_argument("--item-size", default="2000")
+    parser.add_argument("--record-size", default="50000")
+    args = parser.parse_args()
+
+    server_args = [
+        f"--{k.replace('_', '-')}={getattr(args, k)}"
+        for k in ("latency_ms", "processing_delay_ms", "failure_rate", "rate_limit", "item_size", "record_size")
+    ]
+    actor_input = {"maxConcurrency": args.max_concurrency} | ({"assistantId": args.assistant_id} if args.assistant_id else {})
+
+    server, url = start_fake_server(server_args)
+    results = []
+    try:
+        print(f"{'items':>8} {'records':>8} {'files':>7} {'wall [s]':>9} {'files/s':>8} {'req/file':>9} {'RSS [MB]':>9} {'exit':>5}")  # noqa: T201
+        for items in args.items:
+            r = run_scenario(url, items, args.records, actor_input, reset=not args.keep_state)
+            results.append(r)
+            print(  # noqa: T201
+                f"{r.items:>8} {r.records:>8} {r.files_created:>7} {r.wall_time_secs:>9.2f} {r.files_per_sec:>8.2f} "
+                f"{r.requests_per_file:>9.2f} {r.peak_rss_mb:>9.1f} {r.exit_code:>5}"
+            )
+    finally:
+        server.terminate()
+
+    if args.output:
+        args.output.write_text(json.dumps({"args": vars(args) | {"output": str(args.output)}, "results": [asdict(r) for r in results]}, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,329 @@
+"""Local stand-in for the OpenAI and Apify APIs used by the benchmarks.
+
+The server implements the endpoints used by the Actor (files, vector stores, vector store files and file batches,
+assistants, Apify dataset items and key-value store keys/records) on top of in-memory state. Datasets and key-value stores
+are synthetic: the ID `synthetic-<n>` is a source with `n` items (records).
+
+Latency, processing delay of vector store files, failure rate and rate limiting (429) can be configured to resemble the
+real APIs. Request counts per endpoint are available at `GET /__stats`, `POST /__reset` clears the state.
+
+Usage:
+    python -m benchmarks.fake_server --port 8765 --latency-ms 20 --processing-delay-ms 200 --rate-limit 0.01
+"""
+
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any
+from urllib.parse import parse_qs, unquote, urlparse
+
+WORDS = "the quick brown fox jumps over lazy dog apify crawler vector store assistant openai dataset record".split()
+
+
+@dataclass
+class FakeServerConfig:
+    latency_ms: float = 0
+    processing_delay_ms: float = 0
+    failure_rate: float = 0
+    rate_limit: float = 0
+    item_size: int = 2_000
+    record_size: int = 50_000
+    seed: int = 0
+
+
+@dataclass
+class FakeState:
+    files: dict[str, dict] = field(default_factory=dict)
+    vector_store_files: dict[str, dict[str, dict]] = field(default_factory=dict)
+    batches: dict[str, dict] = field(default_factory=dict)
+    stats: Counter = field(default_factory=Counter)
+    created: Counter = field(default_factory=Counter)
+    bytes_received: int = 0
+    ids: itertools.count = field(default_factory=itertools.count)
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def new_id(self, prefix: str) -> str:
+        with self.lock:
+            return f"{prefix}-{next(self.ids)}"
+
+
+def synthetic_item(i: int, size: int) -> dict:
+    rnd = random.Random(i)
+    text = " ".join(rnd.choices(WORDS, k=max(1, size // 6)))
+    return {"url": f"https://example.com/page/{i}", "text": text, "metadata": {"title": f"Page {i}", "languageCode": "en"}}
+
+
+def synthetic_size(source_id: str) -> int:
+    m = re.fullmatch(r"synthetic-(\d+)", source_id)
+    return int(m.group(1)) if m else 0
+
+
+def endpoint(method: str, path: str) -> str:
+    """Normalise the path to an endpoint name, e.g. `GET /v1/vector_stores/{id}/files/{id}`."""
+    path = re.sub(r"/(file|vs|batch|asst)-[^/]+", "/{id}", path)
+    path = re.sub(r"/(datasets|key-value-stores)/[^/]+", r"/\1/{id}", path)
+    path = re.sub(r"/records/.+", "/records/{key}", path)
+    return f"{method} {path}"
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: FakeServer
+
+    def log_message(self, *_: Any) -> None:
+        pass
+
+    def do_GET(self) -> None:  # noqa: N802
+        self._handle("GET")
+
+    def do_POST(self) -> None:  # noqa: N802
+        self._handle("POST")
+
+    def do_DELETE(self) -> None:  # noqa: N802
+        self._handle("DELETE")
+
+    def _send(self, status: int, body: Any = None, headers: dict | None = None, content_type: str = "application/json") -> None:
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, str(v))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _handle(self, method: str) -> None:
+        url = urlparse(self.path)
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        config, state = self.server.config, self.server.state
+
+        if url.path == "/__reset":
+            self.server.state = FakeState()
+            self._send(200, {})
+            return
+        if url.path == "/__stats":
+            stats = {"requests": dict(state.stats), "created": dict(state.created), "bytes_received": state.bytes_received}
+            self._send(200, stats | {"total_requests": sum(state.stats.values())})
+            return
+
+        with state.lock:
+            state.stats[endpoint(method, url.path)] += 1
+            state.bytes_received += len(body)
+
+        if config.latency_ms:
+            time.sleep(random.expovariate(1 / config.latency_ms) / 1000)
+        if config.rate_limit and random.random() < config.rate_limit:
+            self._send(429, {"error": {"message": "Rate limit reached", "type": "requests"}}, {"retry-after-ms": 50})
+            return
+        if config.failure_rate and random.random() < config.failure_rate:
+            self._send(500, {"error": {"message": "Injected failure", "type": "server_error"}})
+            return
+
+        try:
+            status, response, headers, content_type = self.server.route(method, url.path, parse_qs(url.query), body, self.headers)
+        except KeyError:
+            status, response, headers, content_type = (
+                404,
+                {"error": {"message": "Not found", "type": "invalid_request_error"}},
+                {},
+                "application/json",
+            )
+        self._send(status, response, headers, content_type)
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: tuple[str, int], config: FakeServerConfig) -> None:
+        super().__init__(address, Handler)
+        self.config = config
+        self.state = FakeState()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def route(self, method: str, path: str, query: dict, body: bytes, headers: Any) -> tuple[int, Any, dict, str]:
+        parts = [unquote(p) for p in path.strip("/").split("/")]
+        if parts[0] == "v1":
+            return (*self.openai(method, parts[1:], query, body, headers), {}, "application/json")
+        if parts[0] == "v2":
+            return self.apify(parts[1:], query)
+        raise KeyError(path)
+
+    def openai(self, method: str, parts: list[str], query: dict, body: bytes, headers: Any) -> tuple[int, Any]:
+        state, now = self.state, int(time.time())
+        match method, parts:
+            case "POST", ["files"]:
+                m = re.search(rb'filename="([^"]*)"', body)
+                file_id = state.new_id("file")
+                file = {"id": file_id, "object": "file", "bytes": len(body), "created_at": now, "status": "processed"}
+                file |= {"filename": m.group(1).decode() if m else "file", "purpose": "assistants"}
+                state.files[file_id] = file
+                state.created["files"] += 1
+                return 200, file
+            case "GET", ["files"]:
+                return 200, self.page(list(state.files.values()), query)
+            case "GET", ["files", file_id]:
+                return 200, state.files[file_id]
+            case "DELETE", ["files", file_id]:
+                state.files.pop(file_id)
+                return 200, {"id": file_id, "object": "file", "deleted": True}
+            case "GET", ["assistants", assistant_id]:
+                return 200, {"id": assistant_id, "object": "assistant", "created_at": now, "model": "gpt-4o", "tools": [], "instructions": None}
+            case "GET", ["vector_stores", vs_id]:
+                files = state.vector_store_files.get(vs_id, {})
+                counts = Counter(self.vs_file(f)["status"] for f in files.values())
+                file_counts = {s: counts[s] for s in ("in_progress", "completed", "failed", "cancelled")} | {"total": len(files)}
+                return 200, {
+                    "id": vs_id,
+                    "object": "vector_store",
+                    "created_at": now,
+                    "name": "benchmark",
+                    "usage_bytes": 0,
+                    "file_counts": file_counts,
+                    "status": "completed",
+                    "last_active_at": now,
+                    "metadata": {},
+                }
+            case "POST", ["vector_stores", vs_id, "files"]:
+                file_id = json.loads(body)["file_id"]
+                vs_file = {
+                    "id": file_id,
+                    "object": "vector_store.file",
+                    "created_at": now,
+                    "vector_store_id": vs_id,
+                    "usage_bytes": 0,
+                    "status": "in_progress",
+                    "last_error": None,
+                    "_completed_at": time.time() + self.config.processing_delay_ms / 1000,
+                }
+                state.vector_store_files.setdefault(vs_id, {})[file_id] = vs_file
+                return 200, self.vs_file(vs_file)
+            case "GET", ["vector_stores", vs_id, "files"]:
+                return 200, self.page([self.vs_file(f) for f in state.vector_store_files.get(vs_id, {}).values()], query)
+            case "GET", ["vector_stores", vs_id, "files", file_id]:
+                return 200, self.vs_file(state.vector_store_files[vs_id][file_id])
+            case "DELETE", ["vector_stores", vs_id, "files", file_id]:
+                state.vector_store_files[vs_id].pop(file_id)
+                return 200, {"id": file_id, "object": "vector_store.file.deleted", "deleted": True}
+            case "POST", ["vector_stores", vs_id, "file_batches"]:
+                file_ids = json.loads(body)["file_ids"]
+                for file_id in file_ids:
+                    self.openai("POST", ["vector_stores", vs_id, "files"], {}, json.dumps({"file_id": file_id}).encode(), headers)
+                batch = {"id": state.new_id("batch"), "vector_store_id": vs_id, "file_ids": file_ids}
+                state.batches[batch["id"]] = batch
+                return 200, self.batch(batch)
+            case "GET", ["vector_stores", vs_id, "file_batches", batch_id]:
+                return 200, self.batch(state.batches[batch_id])
+        raise KeyError(parts)
+
+    def apify(self, parts: list[str], query: dict) -> tuple[int, Any, dict, str]:
+        match parts:
+            case ["datasets", dataset_id, "items"]:
+                total = synthetic_size(dataset_id)
+                offset = int(query.get("offset", ["0"])[0])
+                limit = int(query.get("limit", [str(total)])[0])
+                items = [synthetic_item(i, self.config.item_size) for i in range(offset, min(total, offset + limit))]
+                headers = {
+                    "x-apify-pagination-total": total,
+                    "x-apify-pagination-offset": offset,
+                    "x-apify-pagination-limit": limit,
+                    "x-apify-pagination-count": len(items),
+                    "x-apify-pagination-desc": "",
+                }
+                return 200, items, headers, "application/json"
+            case ["datasets", dataset_id]:
+                return 200, {"data": {"id": dataset_id, "itemCount": synthetic_size(dataset_id)}}, {}, "application/json"
+            case ["actor-runs", run_id]:
+                return 200, {"data": {"id": run_id, "status": "SUCCEEDED"}}, {}, "application/json"
+            case ["key-value-stores", kvs_id, "keys"]:
+                total = synthetic_size(kvs_id)
+                start = int(query.get("exclusiveStartKey", ["file-0.pdf"])[0].removeprefix("file-").removesuffix(".pdf")) + 1
+                if "exclusiveStartKey" not in query:
+                    start = 0
+                limit = int(query.get("limit", ["1000"])[0])
+                keys = [{"key": f"file-{i}.pdf", "size": self.record_size(i)} for i in range(start, min(total, start + limit))]
+                truncated = start + limit < total
+                data = {
+                    "items": keys,
+                    "count": len(keys),
+                    "limit": limit,
+                    "isTruncated": truncated,
+                    "exclusiveStartKey": None,
+                    "nextExclusiveStartKey": keys[-1]["key"] if truncated else None,
+                }
+                return 200, {"data": data}, {}, "application/json"
+            case ["key-value-stores", _, "records", key]:
+                size = self.record_size(int(key.removeprefix("file-").removesuffix(".pdf")))
+                return 200, b"%PDF-1.4 " + b"x" * size, {}, "application/pdf"
+        raise KeyError(parts)
+
+    def record_size(self, i: int) -> int:
+        return int(self.config.record_size * random.Random(i).lognormvariate(0, 1))
+
+    def vs_file(self, vs_file: dict) -> dict:
+        if vs_file["status"] == "in_progress" and time.time() >= vs_file["_completed_at"]:
+            vs_file["status"] = "completed"
+        return {k: v for k, v in vs_file.items() if not k.startswith("_")}
+
+    def batch(self, batch: dict) -> dict:
+        files = self.state.vector_store_files.get(batch["vector_store_id"], {})
+        statuses = Counter(self.vs_file(files[f])["status"] for f in batch["file_ids"] if f in files)
+        counts = {s: statuses[s] for s in ("in_progress", "completed", "failed", "cancelled")} | {"total": len(batch["file_ids"])}
+        return {
+            "id": batch["id"],
+            "object": "vector_store.files_batch",
+            "created_at": int(time.time()),
+            "vector_store_id": batch["vector_store_id"],
+            "status": "in_progress" if counts["in_progress"] else "completed",
+            "file_counts": counts,
+        }
+
+    @staticmethod
+    def page(data: list[dict], query: dict) -> dict:
+        limit = int(query.get("limit", ["100"])[0])
+        if after := query.get("after", [None])[0]:
+            ids = [d["id"] for d in data]
+            data = data[ids.index(after) + 1 :] if after in ids else []
+        return {"object": "list", "data": data[:limit], "has_more": len(data) > limit}
+
+
+def start_server(config: FakeServerConfig, port: int = 0) -> tuple[FakeServer, threading.Thread]:
+    """Start the server in a background thread (used by tests), the benchmark runs it in a separate process."""
+    server = FakeServer(("127.0.0.1", port), config)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server, thread
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Mean (exponentially distributed) latency of every request")
+    parser.add_argument("--processing-delay-ms", type=float, default=0, help="Time until a vector store file is completed")
+    parser.add_argument("--failure-rate", type=float, default=0, help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limit", type=float, default=0, help="Fraction of requests failing with 429")
+    parser.add_argument("--item-size", type=int, default=2_000, help="Approximate size of dataset item text (characters)")
+    parser.add_argument("--record-size", type=int, default=50_000, help="Median size of key-value store records (bytes)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    random.seed(args.seed)
+    config = FakeServerConfig(**{k: v for k, v in vars(args).items() if k != "port"})
+    server = FakeServer(("127.0.0.1", args.port), config)
+    print(f"Fake OpenAI/Apify server listening on {server.url}", flush=True)  # noqa: T201
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
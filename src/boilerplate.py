@@ -0,0 +1,75 @@
+"""Removal of the boilerplate repeated on the pages of a crawled website (navigation, cookie banners, footers)."""
+
+from __future__ import annotations
+
+import math
+
+from .constants import BOILERPLATE_LOSSY_ERROR, BOILERPLATE_MIN_PAGES, BOILERPLATE_TEXT_FIELD
+
+
+def line_key(line: str) -> int | None:
+    """Return the key of a line with normalized whitespace, None for a blank line (blank lines are never boilerplate)."""
+    return hash(normalized) if (normalized := " ".join(line.split())) else None
+
+
+class LineFrequency:
+    """Count on how many pages every line appears, in one pass over the pages and in bounded memory.
+
+    Lossy counting: the pages are processed in windows of `1 / error` pages and after every window the lines which cannot
+    be frequent are forgotten. The number of pages of every line is underestimated by at most `error` times the number of
+    pages, and most content lines (which appear on a single page) are not kept in memory.
+    """
+
+    def __init__(self, error: float = BOILERPLATE_LOSSY_ERROR) -> None:
+        self.error = error
+        self.width = math.ceil(1 / error)
+        self.pages = 0
+        # the key of the line -> [pages counted, maximum pages missed before the line was counted]
+        self.counts: dict[int, list[int]] = {}
+
+    def add(self, text: str) -> None:
+        window = self.pages // self.width
+        for key in {k for line in text.split("\n") if (k := line_key(line)) is not None}:
+            if (entry := self.counts.get(key)) is not None:
+                entry[0] += 1
+            else:
+                self.counts[key] = [1, window]
+        self.pages += 1
+        if self.pages % self.width == 0:
+            window = self.pages // self.width
+            self.counts = {k: v for k, v in self.counts.items() if v[0] + v[1] > window}
+
+    def frequent(self, fraction: float) -> set[int]:
+        """Return the keys of the lines counted on at least `fraction` of the pages.
+
+        The counts are never overestimated, so no line appearing on fewer pages is returned. A line appearing on up to
+        `error` more pages than the threshold may be missed.
+        """
+        return {k for k, (count, _) in self.counts.items() if count >= fraction * self.pages}
+
+
+def strip_boilerplate(items: list[dict], threshold_percent: int, field: str = BOILERPLATE_TEXT_FIELD) -> tuple[list[dict], int, int]:
+    """Remove the lines of the `field` appearing on at least `threshold_percent` of the items.
+
+    Return the items and the number of distinct boilerplate lines and of characters removed. Datasets with fewer than
+    `BOILERPLATE_MIN_PAGES` pages are not changed, a line shared by a few pages is not boilerplate.
+    """
+
+    pages = [i for i, d in enumerate(items) if isinstance(d.get(field), str)]
+    if len(pages) < BOILERPLATE_MIN_PAGES:
+        return items, 0, 0
+
+    frequency = LineFrequency()
+    for i in pages:
+        frequency.add(items[i][field])
+    if not (boilerplate := frequency.frequent(threshold_percent / 100)):
+        return items, 0, 0
+
+    stripped = 0
+    items = list(items)
+    for i in pages:
+        text = items[i][field]
+        content = "\n".join(line for line in text.split("\n") if line_key(line) not in boilerplate)
+        stripped += len(text) - len(content)
+        items[i] = items[i] | {field: content}
+    return items, len(boilerplate), stripped
@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import importlib.util
+import time
+from typing import TYPE_CHECKING, Any
+
+import httpx
+from apify_client import ApifyClientAsync
+
+from .constants import (
+    HTTP_BULK_MIN_CONNECTIONS,
+    HTTP_BULK_TIMEOUT_SECS,
+    HTTP_CONNECT_TIMEOUT_SECS,
+    HTTP_CONTROL_MAX_CONNECTIONS,
+    HTTP_CONTROL_TIMEOUT_SECS,
+    HTTP_KEEPALIVE_EXPIRY_SECS,
+)
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+def is_bulk_request(request: httpx.Request) -> bool:
+    """Return True for requests transferring file contents (OpenAI file upload, Apify record or dataset items download)."""
+
+    path = request.url.path
+    if request.method == "POST":
+        # attaching a file to a vector store (`POST /v1/vector_stores/{id}/files`) is a small control-plane call
+        return path.endswith("/v1/files")
+    return request.method == "GET" and ("/records/" in path or path.endswith("/items"))
+
+
+class RoutingTransport(httpx.AsyncBaseTransport):
+    """Send bulk transfers and control-plane calls through separate connection pools.
+
+    Large uploads do not block the connections used for small requests (polling, listing, deleting) and each
+    kind of request gets its own timeouts. Every request is recorded in the run metrics.
+    """
+
+    def __init__(self, control: httpx.AsyncBaseTransport, bulk: httpx.AsyncBaseTransport, bulk_timeout: httpx.Timeout) -> None:
+        self.control = control
+        self.bulk = bulk
+        self.bulk_timeout = bulk_timeout
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        transport = self.control
+        if is_bulk_request(request):
+            request.extensions["timeout"] = self.bulk_timeout.as_dict()
+            transport = self.bulk
+
+        start = time.perf_counter()
+        try:
+            response = await transport.handle_async_request(request)
+        except Exception:
+            metrics.record_request(request, None, time.perf_counter() - start)
+            raise
+        metrics.record_request(request, response, time.perf_counter() - start)
+        return response
+
+    async def aclose(self) -> None:
+        await self.control.aclose()
+        await self.bulk.aclose()
+
+
+class HttpPools:
+    """Connection pools shared by the OpenAI and Apify clients of a run.
+
+    The control pool serves the many small API calls, the bulk pool serves file transfers and is sized by `max_concurrency`.
+    Connections are kept alive and reused, HTTP/2 is used when the `h2` package is installed.
+    """
+
+    def __init__(self, max_concurrency: int = 1) -> None:
+        self.control_timeout = httpx.Timeout(HTTP_CONTROL_TIMEOUT_SECS, connect=HTTP_CONNECT_TIMEOUT_SECS)
+        self.bulk_timeout = httpx.Timeout(HTTP_BULK_TIMEOUT_SECS, connect=HTTP_CONNECT_TIMEOUT_SECS)
+        bulk_connections = max(HTTP_BULK_MIN_CONNECTIONS, max_concurrency)
+        self.control = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=max(HTTP_CONTROL_MAX_CONNECTIONS, 2 * max_concurrency),
+                max_keepalive_connections=max(HTTP_CONTROL_MAX_CONNECTIONS, 2 * max_concurrency),
+                keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECS,
+            ),
+            http2=HTTP2_AVAILABLE,
+        )
+        self.bulk = httpx.AsyncHTTPTransport(
+            limits=httpx.Limits(
+                max_connections=bulk_connections, max_keepalive_connections=bulk_connections, keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECS
+            ),
+            http2=HTTP2_AVAILABLE,
+        )
+
+    def transport(self) -> RoutingTransport:
+        return RoutingTransport(self.control, self.bulk, self.bulk_timeout)
+
+    def httpx_client(self, **kwargs: Any) -> httpx.AsyncClient:
+        """Create a httpx client using the shared connection pools."""
+        return httpx.AsyncClient(transport=self.transport(), timeout=self.control_timeout, **kwargs)
+
+    async def aclose(self) -> None:
+        await self.control.aclose()
+        await self.bulk.aclose()
+
+
+def create_openai_client(api_key: str, pools: HttpPools) -> AsyncOpenAI:
+    """Create OpenAI client using the shared connection pools."""
+    from openai import AsyncOpenAI
+
+    return AsyncOpenAI(api_key=api_key, http_client=pools.httpx_client())
+
+
+def create_apify_client(pools: HttpPools, token: str | None = None, api_url: str | None = None) -> ApifyClientAsync:
+    """Create Apify client using the shared connection pools.
+
+    The Apify client does not accept a custom httpx client, its async client is replaced (keeping the default headers).
+    """
+    client = ApifyClientAsync(token, api_url=api_url)
+    default = client.http_client.httpx_async_client
+    client.http_client.httpx_async_client = pools.httpx_client(headers=default.headers, follow_redirects=True)
+    return client
@@ -22,3 +22,103 @@ OPENAI_SUPPORTED_FILES = {
     ".sh": "application/x-sh",
     ".ts": "application/typescript",
 }
+
+# HTTP connection pools shared by OpenAI and Apify clients, bulk transfers (file uploads, record downloads) use a separate pool
+HTTP_CONTROL_MAX_CONNECTIONS = 20
+HTTP_BULK_MIN_CONNECTIONS = 4
+HTTP_KEEPALIVE_EXPIRY_SECS = 60
+HTTP_CONTROL_TIMEOUT_SECS = 60
+HTTP_BULK_TIMEOUT_SECS = 600
+HTTP_CONNECT_TIMEOUT_SECS = 10
+
+# token count cache persisted between runs in a named key-value store
+TOKEN_CACHE_KEY_VALUE_STORE_NAME = "openai-vector-store-integration-cache"
+TOKEN_CACHE_RECORD_KEY = "TOKEN_COUNT_CACHE"
+TOKEN_CACHE_MAX_AGE_RUNS = 7
+TOKEN_CACHE_MAX_ENTRIES = 400_000
+
+RUN_REPORT_KEY = "RUN_REPORT"
+
+# opt-in profiling (`profile` input or ACTOR_PROFILE environment variable)
+PROFILE_ENV_VAR = "ACTOR_PROFILE"
+PROFILE_CPU_KEY = "PROFILE_CPU"
+PROFILE_MEMORY_KEY = "PROFILE_MEMORY"
+PROFILE_SAMPLING_INTERVAL_SECS = 0.01
+PROFILE_SAVE_INTERVAL_SECS = 60
+PROFILE_SNAPSHOT_MIN_INTERVAL_SECS = 5
+PROFILE_MEMORY_TOP_ALLOCATORS = 25
+
+# optional OpenTelemetry tracing (OTLP variables or ACTOR_TRACES_FILE environment variable)
+TRACES_FILE_ENV_VAR = "ACTOR_TRACES_FILE"
+TRACING_SERVICE_NAME = "openai-vector-store-integration"
+
+# memory-aware concurrency, the concurrency grows when the memory usage is below this ratio of the target
+MEMORY_TARGET_PERCENT_DEFAULT = 80
+GOVERNOR_GROW_BELOW_RATIO = 0.7
+GOVERNOR_CPU_OVERLOADED_RATIO = 0.95
+GOVERNOR_MIN_BUFFERED_BYTES = 16 * 2**20
+
+# deadline-aware scheduling, the work which does not fit into the run timeout is saved for the next run
+STATE_KEY_VALUE_STORE_NAME = TOKEN_CACHE_KEY_VALUE_STORE_NAME
+PENDING_WORK_KEY_PREFIX = "PENDING_WORK_"
+DEADLINE_DEFAULT_FILE_SECS = 10.0
+DEADLINE_DELETE_FILE_SECS = 1.0
+DEADLINE_CLEANUP_MARGIN_SECS = 30.0
+DEADLINE_EWMA_ALPHA = 0.2
+
+# size-aware scheduling of key-value store records, large records are limited to a share of the upload pool
+LARGE_FILE_BYTES = 8 * 2**20
+LARGE_FILES_LANE = "large"
+LARGE_FILES_LANE_SHARE = 0.5
+
+# sharded runs, every child run saves the files it created to its default key-value store
+MANIFEST_KEY = "MANIFEST"
+# secrets passed to the child runs are encrypted like the secret input fields, `Actor.get_input` of the child run decrypts them
+ENCRYPTED_VALUE_PREFIX = "ENCRYPTED_VALUE"
+ENCRYPTION_KEY_LENGTH = 32
+ENCRYPTION_IV_LENGTH = 16
+
+# standby mode, the Actor serves integration triggers over HTTP and coalesces the triggers into jobs
+STANDBY_COALESCE_SECS_DEFAULT = 30
+STANDBY_INVENTORY_TTL_SECS = 600
+STANDBY_MAX_BODY_BYTES = 2**20
+STANDBY_MAX_CLIENTS = 4
+
+# following a running source run, its dataset is ingested in batches of new items
+FOLLOW_BATCH_ITEMS = 1000
+FOLLOW_POLL_INTERVAL_SECS = 10
+FOLLOW_TERMINAL_STATUSES = ("SUCCEEDED", "FAILED", "TIMED-OUT", "ABORTED")
+
+# failed files are retried at the end of the run and by the next run, permanent failures are only recorded
+RETRY_QUEUE_KEY_PREFIX = "RETRY_QUEUE_"
+RETRY_ROUNDS = 3
+RETRY_BACKOFF_SECS = 5
+RETRY_MAX_ATTEMPTS = 5
+RETRY_MAX_PERMANENT_FAILURES = 1000
+
+# garbage collection, files younger than this may be uploaded by a concurrent run and are kept
+GC_MIN_AGE_SECS = 3600
+GC_REPORT_KEY = "GC_REPORT"
+
+# pre-flight capacity planning, datasets are estimated from a sample of their first items
+PLAN_KEY = "PLAN"
+PLAN_SAMPLE_ITEMS = 100
+PLAN_BYTES_PER_TOKEN = 4
+OPENAI_MAX_FILE_BYTES = 512 * 2**20
+
+# debug copies of the dataset files (`saveInApifyKeyValueStore`) are gzipped
+DEBUG_SNAPSHOT_GZIP_LEVEL = 6
+
+# near-duplicate dataset items, MinHash signatures with one permutation hashing and LSH with bands of the signatures
+MINHASH_PERMUTATIONS = 128
+MINHASH_BANDS = 32
+MINHASH_SHINGLE_WORDS = 5
+NEAR_DUPLICATE_SIMILARITY_PERCENT_DEFAULT = 90
+NEAR_DUPLICATE_PARALLEL_MIN_ITEMS = 5_000
+NEAR_DUPLICATE_TEXT_FIELD = "text"
+
+# boilerplate lines (navigation, cookie banners, footers) repeated on the pages of a dataset
+BOILERPLATE_TEXT_FIELD = "text"
+BOILERPLATE_THRESHOLD_PERCENT_DEFAULT = 50
+BOILERPLATE_MIN_PAGES = 5
+BOILERPLATE_LOSSY_ERROR = 0.01
@@ -0,0 +1,35 @@
+from __future__ import annotations
+
+import base64
+import secrets
+import string
+
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import padding, rsa
+from cryptography.hazmat.primitives.ciphers import Cipher, algorithms, modes
+
+from .constants import ENCRYPTED_VALUE_PREFIX, ENCRYPTION_IV_LENGTH, ENCRYPTION_KEY_LENGTH
+
+
+def load_private_key(private_key_file_base64: str, passphrase: str) -> rsa.RSAPrivateKey:
+    """Load the RSA private key from the base64 encoded PEM file protected by the `passphrase`."""
+
+    private_key = serialization.load_pem_private_key(base64.b64decode(private_key_file_base64), password=passphrase.encode("utf-8"))
+    if not isinstance(private_key, rsa.RSAPrivateKey):
+        raise TypeError("The input secrets key is not an RSA private key")
+    return private_key
+
+
+def encrypt_input_value(value: str, public_key: rsa.RSAPublicKey) -> str:
+    """Encrypt the value in the format of the secret input fields: `ENCRYPTED_VALUE:<password>:<value>`.
+
+    The value is encrypted by AES-GCM with a random key and IV (the password, with the authentication tag appended to the
+    value), the password is encrypted by the RSA public key with OAEP padding. Both are encoded in base64.
+    """
+
+    alphabet = string.ascii_letters + string.digits
+    password = "".join(secrets.choice(alphabet) for _ in range(ENCRYPTION_KEY_LENGTH + ENCRYPTION_IV_LENGTH)).encode("utf-8")
+    encryptor = Cipher(algorithms.AES(password[:ENCRYPTION_KEY_LENGTH]), modes.GCM(password[ENCRYPTION_KEY_LENGTH:])).encryptor()
+    encrypted_value = encryptor.update(value.encode("utf-8")) + encryptor.finalize() + encryptor.tag
+    encrypted_password = public_key.encrypt(password, padding.OAEP(mgf=padding.MGF1(algorithm=hashes.SHA1()), algorithm=hashes.SHA1(), label=None))
+    return f"{ENCRYPTED_VALUE_PREFIX}:{base64.b64encode(encrypted_password).decode()}:{base64.b64encode(encrypted_value).decode()}"
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING
+
+from apify import Actor
+
+from .constants import NEAR_DUPLICATE_PARALLEL_MIN_ITEMS, NEAR_DUPLICATE_TEXT_FIELD
+from .metrics import metrics
+from .minhash import find_near_duplicates, signatures
+
+if TYPE_CHECKING:
+    from .minhash import Signature
+
+
+def item_text(item: dict) -> str:
+    """Return the text of a projected item compared for near-duplicates, the whole item when it has no `text` field."""
+
+    text = item.get(NEAR_DUPLICATE_TEXT_FIELD)
+    return text if isinstance(text, str) else json.dumps(item)
+
+
+async def compute_signatures(texts: list[str]) -> list[Signature | None]:
+    """Compute the MinHash signatures in a thread, or in worker processes (one chunk per CPU) for large datasets."""
+
+    workers = min(os.cpu_count() or 1, len(texts) // NEAR_DUPLICATE_PARALLEL_MIN_ITEMS)
+    if workers <= 1:
+        return await asyncio.to_thread(signatures, texts)
+
+    size = -(-len(texts) // workers)
+    loop = asyncio.get_running_loop()
+    # the workers are spawned, forking a process with a running event loop and threads is not safe
+    with ProcessPoolExecutor(workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+        chunks = await asyncio.gather(*(loop.run_in_executor(executor, signatures, texts[i : i + size]) for i in range(0, len(texts), size)))
+    return [sig for chunk in chunks for sig in chunk]
+
+
+async def drop_near_duplicates(items: list[dict], similarity_percent: int, source: str) -> list[dict]:
+    """Return the items without their near-duplicates, one representative (the first item) of every cluster is kept.
+
+    Every dropped item is pushed to the dataset with its URL and the URL of its representative (when `url` is among the
+    `datasetFields`).
+    """
+
+    with metrics.operation("near_duplicates"):
+        sigs = await compute_signatures([item_text(d) for d in items])
+        duplicates = await asyncio.to_thread(find_near_duplicates, sigs, similarity_percent / 100)
+    if not duplicates:
+        return items
+
+    Actor.log.info("Dropping %d near-duplicate items of %d in %s", len(duplicates), len(items), source)
+    metrics.increment("itemsNearDuplicate", len(duplicates))
+    await Actor.push_data(
+        [
+            {
+                "filename": "",
+                "file_id": "",
+                "status": "near-duplicate",
+                "error": "",
+                "url": items[i].get("url", ""),
+                "duplicateOf": items[rep].get("url", ""),
+                "similarity": round(sim, 2),
+            }
+            for i, (rep, sim) in duplicates.items()
+        ]
+    )
+    return [d for i, d in enumerate(items) if i not in duplicates]
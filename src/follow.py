@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+from typing import TYPE_CHECKING
+
+from apify import Actor
+
+from .constants import FOLLOW_BATCH_ITEMS, FOLLOW_POLL_INTERVAL_SECS, FOLLOW_TERMINAL_STATUSES
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Iterable
+
+    from apify_client import ApifyClientAsync
+
+    from .input_model import OpenaiVectorStoreIntegration as ActorInput
+    from .records import FileRecord
+
+
+def window_item(window: tuple[int, int], index: int) -> str:
+    """Return the item which identifies the batch `index` of the items in the `window` (offset, limit).
+
+    The batches of a followed dataset are retried and deferred by their window, so that a later run can resume them.
+
+    Example:
+      >>> window_item((100, 50), 2)
+      '100+50:2'
+    """
+    return f"{window[0]}+{window[1]}:{index}"
+
+
+def group_window_items(items: Iterable[int | str]) -> dict[tuple[int, int] | None, set[int]]:
+    """Group the items by their window, the batches of a whole dataset (plain indices) are grouped under None."""
+
+    groups: dict[tuple[int, int] | None, set[int]] = {}
+    for item in items:
+        if isinstance(item, str):
+            offset, _, rest = item.partition("+")
+            limit, _, index = rest.partition(":")
+            groups.setdefault((int(offset), int(limit)), set()).add(int(index))
+        else:
+            groups.setdefault(None, set()).add(item)
+    return groups
+
+
+class DatasetFollower:
+    """Ingest the default dataset of a running source run (e.g. a crawler) while the items are being appended.
+
+    The item count of the dataset is polled and every `batch_items` new items are ingested as soon as they are available.
+    When the source run reaches a terminal status, the remaining items are ingested in batches of at most `batch_items`, until
+    the final item count is reached. The old files are deleted only when the source run succeeded, otherwise the vector store
+    keeps them together with the new files. Following stops when `stop()` returns True (e.g. when the run timeout is near),
+    the items which were not ingested yet are left to the next run and the old files are kept.
+    """
+
+    def __init__(
+        self,
+        aclient_apify: ApifyClientAsync,
+        run_id: str,
+        dataset_id: str,
+        batch_items: int = FOLLOW_BATCH_ITEMS,
+        poll_interval_secs: float = FOLLOW_POLL_INTERVAL_SECS,
+    ) -> None:
+        self.aclient_apify = aclient_apify
+        self.run_id = run_id
+        self.dataset_id = dataset_id
+        self.batch_items = batch_items
+        self.poll_interval_secs = poll_interval_secs
+        self.status: str | None = None
+        self.offset = 0
+
+    @classmethod
+    def from_payload(cls, aclient_apify: ApifyClientAsync, actor_input: ActorInput, payload: dict) -> DatasetFollower | None:
+        """Return the follower of the source run from the integration payload, None when the run is not followed."""
+
+        resource = payload.get("payload", {}).get("resource", {})
+        if not actor_input.followSourceRun or resource.get("status") in FOLLOW_TERMINAL_STATUSES:
+            return None
+        if not (resource.get("id") and resource.get("defaultDatasetId")):
+            Actor.log.warning("Following the source run requires the integration payload with the run, processing the datasets once")
+            return None
+        return cls(aclient_apify, resource["id"], resource["defaultDatasetId"])
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status == "SUCCEEDED"
+
+    async def follow(self, ingest: Callable[..., Awaitable[list[FileRecord]]], stop: Callable[[], bool] | None = None) -> list[FileRecord]:
+        """Ingest the dataset in batches until the source run finishes, `ingest(window=(offset, limit))` creates the files."""
+
+        Actor.log.info("Following the dataset %s of the run %s, ingesting every %d new items", self.dataset_id, self.run_id, self.batch_items)
+        files: list[FileRecord] = []
+        while True:
+            run = await self.aclient_apify.run(self.run_id).get()
+            self.status = run["status"] if run else "ABORTED"
+            if self.status in FOLLOW_TERMINAL_STATUSES:
+                return await self.drain(ingest, files)
+            if stop and stop():
+                Actor.log.warning("Stopped following the run %s after %d items, the old files are kept", self.run_id, self.offset)
+                return files
+
+            info = await self.aclient_apify.dataset(self.dataset_id).get()
+            if (info or {}).get("itemCount", 0) - self.offset >= self.batch_items:
+                files.extend(await self.ingest_batch(ingest, self.batch_items))
+            else:
+                await asyncio.sleep(self.poll_interval_secs)
+
+    async def drain(self, ingest: Callable[..., Awaitable[list[FileRecord]]], files: list[FileRecord]) -> list[FileRecord]:
+        """Ingest the items written after the last batch, the item count is read again after every batch until no items are left."""
+
+        dataset = self.aclient_apify.dataset(self.dataset_id)
+        while (count := ((await dataset.get()) or {}).get("itemCount", 0) - self.offset) > 0:
+            files.extend(await self.ingest_batch(ingest, min(count, self.batch_items)))
+        Actor.log.info("The run %s finished with the status %s, %d items ingested", self.run_id, self.status, self.offset)
+        return files
+
+    async def ingest_batch(self, ingest: Callable[..., Awaitable[list[FileRecord]]], limit: int) -> list[FileRecord]:
+        Actor.log.info("Ingesting items %d-%d of the dataset %s", self.offset, self.offset + limit, self.dataset_id)
+        files = await ingest(window=(self.offset, limit))
+        self.offset += limit
+        return files
@@ -0,0 +1,145 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING, Any
+
+from apify import Actor
+
+from .constants import GC_MIN_AGE_SECS
+from .metrics import metrics
+from .pool import UploadPool
+from .records import FileRecord, VectorStoreFileRecord
+from .tracing import span
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+
+# vector store entries in these states are never going to be searchable
+STALE_STATUSES = ("failed", "cancelled")
+
+
+class Garbage:
+    """Orphans found by a single inventory pass of the OpenAI files and the vector store files.
+
+    - detached: files with the prefix which are not attached to any vector store nor assistant (e.g. uploaded by a run that crashed)
+    - dangling: vector store entries whose file no longer exists
+    - stale: vector store entries which failed, were cancelled or are in progress for too long (left from file batches)
+    """
+
+    def __init__(self) -> None:
+        self.detached: list[FileRecord] = []
+        self.dangling: list[VectorStoreFileRecord] = []
+        self.stale: list[VectorStoreFileRecord] = []
+        # the files of the stale entries with the prefix, they are deleted after the entries are removed
+        self.stale_files: list[FileRecord] = []
+
+    def __len__(self) -> int:
+        return len(self.detached) + len(self.dangling) + len(self.stale)
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "detachedFiles": len(self.detached),
+            "detachedBytes": sum(f.bytes for f in self.detached),
+            "danglingEntries": len(self.dangling),
+            "staleEntries": len(self.stale),
+            "staleBytes": sum(f.usage_bytes for f in self.stale) + sum(f.bytes for f in self.stale_files),
+        }
+
+
+async def find_referenced_files(client: AsyncOpenAI, skip_vector_store_id: str, max_concurrency: int = 1) -> set[str]:
+    """Return the IDs of the files attached to the vector stores (except `skip_vector_store_id`) and to the assistants."""
+
+    async def list_files(vector_store_id: str) -> list[str]:
+        return [f.id async for f in client.beta.vector_stores.files.list(vector_store_id=vector_store_id)]
+
+    with span("gc.references"):
+        vector_store_ids = [vs.id async for vs in client.beta.vector_stores.list() if vs.id != skip_vector_store_id]
+        referenced = {file_id for ids in await UploadPool(max_concurrency).map(list_files, vector_store_ids) for file_id in ids}
+        async for assistant in client.beta.assistants.list():
+            if (resources := assistant.tool_resources) and resources.code_interpreter:
+                referenced.update(resources.code_interpreter.file_ids or [])
+    Actor.log.info("%d files are referenced by %d other vector stores and the assistants", len(referenced), len(vector_store_ids))
+    return referenced
+
+
+async def find_garbage(
+    client: AsyncOpenAI, vector_store_id: str, file_prefix: str | None, min_age_secs: float = GC_MIN_AGE_SECS, max_concurrency: int = 1
+) -> Garbage:
+    """List the OpenAI files and the vector store files once and find the orphans.
+
+    Only files older than `min_age_secs` are considered, so that the files being uploaded by a concurrent run are kept.
+    Files are deleted only with the `file_prefix`. The OpenAI files belong to the whole organization, so a file with the
+    prefix is deleted only when no other vector store nor assistant references it.
+    """
+
+    with span("gc.inventory", {"vector_store.id": vector_store_id}):
+        files = {f.id: FileRecord.from_file(f) async for f in client.files.list()}
+        vs_files = [VectorStoreFileRecord.from_file(f) async for f in client.beta.vector_stores.files.list(vector_store_id=vector_store_id)]
+    Actor.log.info("Inventory: %d OpenAI files, %d files in the vector store %s", len(files), len(vs_files), vector_store_id)
+
+    garbage = Garbage()
+    created_before = time.time() - min_age_secs
+    attached = {f.id for f in vs_files}
+    if file_prefix:
+        garbage.detached = [
+            f for f in files.values() if f.filename.startswith(file_prefix) and f.id not in attached and f.created_at < created_before
+        ]
+    for f in vs_files:
+        if f.id not in files:
+            garbage.dangling.append(f)
+        elif f.status in STALE_STATUSES or (f.status == "in_progress" and f.created_at < created_before):
+            garbage.stale.append(f)
+            if file_prefix and files[f.id].filename.startswith(file_prefix):
+                garbage.stale_files.append(files[f.id])
+
+    # the files referenced elsewhere are kept, the stale entries are still removed from this vector store
+    if garbage.detached or garbage.stale_files:
+        referenced = await find_referenced_files(client, vector_store_id, max_concurrency)
+        garbage.detached = [f for f in garbage.detached if f.id not in referenced]
+        garbage.stale_files = [f for f in garbage.stale_files if f.id not in referenced]
+    return garbage
+
+
+async def collect_garbage(client: AsyncOpenAI, vector_store_id: str, file_prefix: str | None, max_concurrency: int = 1) -> dict[str, Any]:
+    """Find the orphans and remove them with a bounded concurrency, return the summary with the bytes reclaimed.
+
+    The reclaimed bytes are the sizes of the deleted files and the vector store usage of the removed entries of this collection.
+    """
+
+    garbage = await find_garbage(client, vector_store_id, file_prefix, max_concurrency=max_concurrency)
+    summary = garbage.summary()
+    Actor.log.info("Found garbage: %s", summary)
+    summary["bytesReclaimed"] = 0
+
+    async def delete_file(file_id: str, nbytes: int, reason: str) -> None:
+        try:
+            with metrics.operation("delete"), span("files.delete", {"file.id": file_id, "gc.reason": reason}):
+                await client.files.delete(file_id)
+        except Exception as e:
+            Actor.log.warning("Failed to delete the %s file %s: %s", reason, file_id, e)
+            return
+        summary["bytesReclaimed"] += nbytes
+        metrics.increment("bytesReclaimed", nbytes)
+        metrics.increment(f"{reason}FilesDeleted")
+        await Actor.push_data({"filename": "", "file_id": file_id, "status": "deleted", "error": "", "reason": reason})
+
+    async def remove_entry(vs_file: VectorStoreFileRecord, reason: str) -> None:
+        try:
+            with metrics.operation("detach"), span("vector_stores.files.delete", {"file.id": vs_file.id, "gc.reason": reason}):
+                await client.beta.vector_stores.files.delete(vs_file.id, vector_store_id=vector_store_id)
+        except Exception as e:
+            Actor.log.warning("Failed to remove the %s entry %s from the vector store: %s", reason, vs_file.id, e)
+            return
+        summary["bytesReclaimed"] += vs_file.usage_bytes
+        metrics.increment("bytesReclaimed", vs_file.usage_bytes)
+        metrics.increment(f"{reason}EntriesRemoved")
+        await Actor.push_data({"filename": "", "file_id": vs_file.id, "status": "removed", "error": "", "reason": reason})
+
+    pool = UploadPool(max_concurrency)
+    await pool.map(lambda f: delete_file(f.id, f.bytes, "detached"), garbage.detached)
+    await pool.map(lambda f: remove_entry(f, "dangling"), garbage.dangling)
+    await pool.map(lambda f: remove_entry(f, "stale"), garbage.stale)
+    await pool.map(lambda f: delete_file(f.id, f.bytes, "stale"), garbage.stale_files)
+
+    Actor.log.info("Garbage collected, %.1f MB reclaimed", summary["bytesReclaimed"] / 1e6)
+    return summary
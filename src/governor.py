@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from typing import TYPE_CHECKING
+
+from apify import Actor, Event
+
+from .constants import GOVERNOR_CPU_OVERLOADED_RATIO, GOVERNOR_GROW_BELOW_RATIO, GOVERNOR_MIN_BUFFERED_BYTES
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    from crawlee.events._types import EventSystemInfoData
+
+    from .pool import UploadPool
+
+
+class ResourceGovernor:
+    """Adapt the concurrency of the upload pool to the memory usage reported by the Actor's SYSTEM_INFO events.
+
+    When the memory usage exceeds `target_ratio` of `memory_limit_bytes`, the concurrency is halved. When the usage drops
+    well below the target (and the CPU is not overloaded), the concurrency grows by one up to `maxConcurrency`.
+    The bytes buffered by the pool are limited to the memory left under the target.
+    """
+
+    def __init__(self, pool: UploadPool, memory_limit_bytes: int, target_ratio: float) -> None:
+        self.pool = pool
+        self.memory_limit_bytes = memory_limit_bytes
+        self.target_bytes = int(memory_limit_bytes * target_ratio)
+
+    def start(self) -> None:
+        Actor.log.info("Adapting concurrency to memory usage, target %.0f MB of %.0f MB", self.target_bytes / 2**20, self.memory_limit_bytes / 2**20)
+        Actor.on(Event.SYSTEM_INFO, self.on_system_info)
+
+    def stop(self) -> None:
+        Actor.off(Event.SYSTEM_INFO, self.on_system_info)
+
+    async def on_system_info(self, event_data: EventSystemInfoData) -> None:
+        await self.update(event_data.memory_info.current_size.bytes, cpu_overloaded=event_data.cpu_info.used_ratio >= GOVERNOR_CPU_OVERLOADED_RATIO)
+
+    async def update(self, used_bytes: int, *, cpu_overloaded: bool = False) -> None:
+        """Resize the pool for the current memory usage."""
+
+        limit = self.pool.limit
+        if used_bytes > self.target_bytes:
+            limit = max(1, limit // 2)
+        elif used_bytes < self.target_bytes * GOVERNOR_GROW_BELOW_RATIO and not cpu_overloaded:
+            limit = min(self.pool.max_concurrency, limit + 1)
+
+        # the bytes already buffered by the pool are part of the used memory
+        budget = max(GOVERNOR_MIN_BUFFERED_BYTES, self.target_bytes - used_bytes + self.pool.buffered_bytes)
+        if limit != self.pool.limit:
+            Actor.log.info("Memory usage %.0f MB, changing concurrency from %d to %d", used_bytes / 2**20, self.pool.limit, limit)
+            metrics.increment("concurrencyIncreased" if limit > self.pool.limit else "concurrencyDecreased")
+        await self.pool.resize(limit, budget)
+
+
+@contextmanager
+def governing(pool: UploadPool, memory_mbytes: int | None, target_ratio: float) -> Iterator[ResourceGovernor | None]:
+    """Adapt the concurrency of the pool to the memory usage in the wrapped code, only when the memory limit is known."""
+
+    if not memory_mbytes:
+        yield None
+        return
+
+    governor = ResourceGovernor(pool, memory_mbytes * 2**20, target_ratio)
+    governor.start()
+    try:
+        yield governor
+    finally:
+        governor.stop()
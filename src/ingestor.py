@@ -0,0 +1,270 @@
+"""Embeddable ingestion engine: uploads files to an OpenAI vector store from any asyncio application.
+
+The engine does not depend on a running Actor. It does not read the Actor input, push to the dataset, fail the run or
+record the run metrics unless it is given a `RunMetrics` instance; the Actor entry point (`src.main`) is an adapter that
+turns its results into the dataset rows and records them in the run report. Logs go to the `src.ingestor` logger.
+
+Example:
+    from openai import AsyncOpenAI
+    from src.ingestor import Ingestor
+
+    ingestor = Ingestor(AsyncOpenAI(), "vs_abc123", max_concurrency=10)
+    async for result in ingestor.ingest([("page-1.json", b'[{"text": "..."}]'), ("page-2.json", b"...")]):
+        print(result.filename, result.file_id, result.status, result.error)
+"""
+
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from collections.abc import AsyncIterable
+from contextlib import AbstractContextManager, nullcontext
+from typing import TYPE_CHECKING, Any
+
+from .constants import OPENAI_VECTOR_STORE_POLLING_INTERVAL_MS
+from .pool import UploadPool
+from .records import DeletedRecord, FileRecord
+from .retry_queue import classify_attach_error, classify_error
+from .tracing import span
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncGenerator, AsyncIterator, Iterable
+    from io import BytesIO
+
+    from openai import AsyncOpenAI
+    from openai.types.beta.vector_stores import VectorStoreFile
+    from openai.types.file_object import FileObject
+
+    from .metrics import RunMetrics
+    from .retry_queue import OnFailure
+
+    # a file to upload, its name and content
+    Document = tuple[str, bytes | BytesIO]
+
+# the status of a file which could not be created or attached because of an error
+STATUS_ERROR = "error"
+
+logger = logging.getLogger(__name__)
+
+
+def _operation(metrics: RunMetrics | None, name: str) -> AbstractContextManager[Any]:
+    return metrics.operation(name) if metrics else nullcontext()
+
+
+def _increment(metrics: RunMetrics | None, name: str) -> None:
+    if metrics:
+        metrics.increment(name)
+
+
+class FileResult:
+    """The outcome of uploading a file: the id and status of the vector store file and the created file (None on failure).
+
+    A file which was created but could not be attached keeps its `file_id` in the result, although it has been deleted.
+    """
+
+    __slots__ = ("error", "file", "file_id", "filename", "status")
+
+    def __init__(self, filename: str, file_id: str, status: str, error: Any = "", file: FileRecord | None = None) -> None:
+        self.filename = filename
+        self.file_id = file_id
+        self.status = status
+        self.error = error
+        self.file = file
+
+    def row(self) -> dict[str, Any]:
+        """Return the dataset row of the Actor output."""
+        return {"filename": self.filename, "file_id": self.file_id, "status": self.status, "error": self.error}
+
+
+async def create_file(
+    client: AsyncOpenAI, filename: str, data: bytes | BytesIO, on_failure: OnFailure | None = None, *, metrics: RunMetrics | None = None
+) -> FileObject | None:
+    """Create OpenAI file.
+
+    https://platform.openai.com/docs/api-reference/files/create
+    """
+    try:
+        size = len(data) if isinstance(data, bytes) else data.getbuffer().nbytes
+        with _operation(metrics, "upload"), span("files.create", {"file.name": filename, "file.bytes": size}) as s:
+            file = await client.files.create(file=(filename, data), purpose="assistants")
+            s.set_attribute("file.id", file.id)
+        logger.info("Created OpenAI file: %s, id: %s", file.filename, file.id)
+        return file  # noqa: TRY300
+    except Exception as e:
+        logger.error("Failed to create OpenAI file: %s, error: %s", filename, e)  # noqa: TRY400
+        if on_failure:
+            on_failure(*classify_error(e))
+
+    return None
+
+
+async def delete_file(client: AsyncOpenAI, file_id: str, *, metrics: RunMetrics | None = None) -> DeletedRecord:
+    """Delete OpenAI file.
+
+    https://platform.openai.com/docs/api-reference/files/delete
+    """
+    with _operation(metrics, "delete"), span("files.delete", {"file.id": file_id}):
+        deleted = await client.files.delete(file_id)
+    logger.info("Deleted OpenAI File with id: %s", file_id)
+    return DeletedRecord.from_deleted(deleted)
+
+
+async def upload_file(
+    client: AsyncOpenAI,
+    filename: str,
+    data: bytes | BytesIO,
+    vector_store_id: str,
+    on_failure: OnFailure | None = None,
+    *,
+    metrics: RunMetrics | None = None,
+) -> FileResult:
+    """Create OpenAI file and add it to the vector store.
+
+    If the attachment to the vector store fails, the file is deleted. The cause of a failure and whether it is permanent
+    are reported to `on_failure`. The operations, the outcome and the latency of the file are recorded in the `metrics`.
+    """
+
+    start = time.perf_counter()
+    if not (file := await create_file(client, filename, data, on_failure, metrics=metrics)):
+        _increment(metrics, "filesFailed")
+        return FileResult(filename, "", STATUS_ERROR, "Failed to create the file")
+
+    try:
+        with _operation(metrics, "attach"), span("vector_stores.files.create_and_poll", {"file.name": filename, "file.id": file.id}) as s:
+            file_vs: VectorStoreFile = await client.beta.vector_stores.files.create_and_poll(
+                vector_store_id=vector_store_id, file_id=file.id, poll_interval_ms=OPENAI_VECTOR_STORE_POLLING_INTERVAL_MS
+            )
+            s.set_attribute("file.status", file_vs.status)
+    except Exception as e:
+        logger.error("Failed to create OpenAI file: %s, error: %s", filename, e)  # noqa: TRY400
+        # the file may not be attached, it is deleted so that it is not left behind when the file is retried
+        await delete_files_quietly(client, [file.id], metrics=metrics)
+        if on_failure:
+            on_failure(*classify_error(e))
+        _increment(metrics, "filesFailed")
+        return FileResult(filename, file.id, STATUS_ERROR, str(e))
+
+    if (file_vs.status in ("failed", "cancelled")) or file_vs.last_error:
+        logger.error(
+            "Failed to attach file to vector store: %s (this typically happens when PDF file is an image or scan), deleting OpenAI file",
+            file_vs.last_error,
+        )
+        await delete_files_quietly(client, [file.id], metrics=metrics)
+        _increment(metrics, "filesFailed")
+        if on_failure:
+            on_failure(*classify_attach_error(file_vs))
+        return FileResult(filename, file.id, file_vs.status, file_vs.last_error or "")
+
+    logger.info("Attached file to vector store: %s", file_vs.id)
+    if metrics:
+        metrics.increment("filesCreated")
+        metrics.record_file(time.perf_counter() - start)
+    return FileResult(filename, file.id, file_vs.status, file=FileRecord.from_file(file))
+
+
+async def delete_files_quietly(client: AsyncOpenAI, file_ids: list[str], *, metrics: RunMetrics | None = None) -> None:
+    """Delete OpenAI files, the failures are only logged."""
+    try:
+        for file_id in file_ids:
+            await delete_file(client, file_id, metrics=metrics)
+    except Exception:
+        logger.exception("Failed to delete OpenAI files: %s", file_ids)
+
+
+async def remove_file_from_vector_store(
+    client: AsyncOpenAI, vector_store_id: str, file_id: str, *, metrics: RunMetrics | None = None
+) -> DeletedRecord:
+    """Remove file from vector store. The file is not actually deleted, only removed."""
+
+    with _operation(metrics, "detach"), span("vector_stores.files.delete", {"file.id": file_id}):
+        deleted = await client.beta.vector_stores.files.delete(file_id, vector_store_id=vector_store_id)
+    logger.info("Removed file from vector store: %s", deleted)
+    return DeletedRecord.from_deleted(deleted)
+
+
+class Ingestor:
+    """Upload documents to an OpenAI vector store from an asyncio application, reusing its OpenAI client.
+
+    Every document is uploaded as an OpenAI file and attached to the vector store. The uploads are scheduled by the
+    `UploadPool` (at most `max_concurrency` at the same time by default), a pool can be shared with other work, e.g. the
+    Actor shares one pool, with its priorities, lanes and byte budget, by all datasets and key-value stores of a run.
+    The documents are consumed lazily, so they can be produced by an (async) generator, and the results are yielded as
+    soon as the files are attached, in the order of completion.
+
+    The operations and files are recorded in the `metrics` when provided (the Actor passes its run metrics), nothing is
+    recorded by default, so that a long-lived application does not accumulate them.
+    """
+
+    def __init__(
+        self,
+        client: AsyncOpenAI,
+        vector_store_id: str,
+        *,
+        max_concurrency: int = 5,
+        pool: UploadPool | None = None,
+        metrics: RunMetrics | None = None,
+    ) -> None:
+        self.client = client
+        self.vector_store_id = vector_store_id
+        self.pool = pool or UploadPool(max_concurrency)
+        self.metrics = metrics
+
+    async def upload(self, filename: str, content: bytes | BytesIO, on_failure: OnFailure | None = None) -> FileResult:
+        """Upload a single document right away, the caller is responsible for taking a slot in the pool."""
+        return await upload_file(self.client, filename, content, self.vector_store_id, on_failure, metrics=self.metrics)
+
+    async def ingest(
+        self, documents: Iterable[Document] | AsyncIterable[Document], *, priority: Any = 0, lane: str = ""
+    ) -> AsyncGenerator[FileResult, None]:
+        """Upload the documents (pairs of the filename and content) and yield the result of every file.
+
+        The next document is read once the previous one took a slot in the pool, with the `priority` and in the `lane`.
+        To stop early, close the iterator (e.g. with `contextlib.aclosing`), the uploads in progress are cancelled.
+        """
+
+        results: asyncio.Queue[FileResult | None] = asyncio.Queue()
+
+        async def upload(filename: str, content: bytes | BytesIO, nbytes: int) -> None:
+            try:
+                results.put_nowait(await self.upload(filename, content))
+            finally:
+                self.pool.release(nbytes, lane)
+
+        async def produce() -> None:
+            try:
+                async with asyncio.TaskGroup() as tg:
+                    async for filename, content in _aiter(documents):
+                        nbytes = len(content) if isinstance(content, bytes) else content.getbuffer().nbytes
+                        await self.pool.acquire(nbytes, priority, lane)
+                        tg.create_task(upload(filename, content, nbytes))
+            finally:
+                results.put_nowait(None)
+
+        producer = asyncio.create_task(produce())
+        try:
+            while (result := await results.get()) is not None:
+                yield result
+            await producer
+        finally:
+            # the consumer stopped early, the uploads in progress are cancelled
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+
+    async def delete(self, file_ids: list[str]) -> list[DeletedRecord]:
+        """Remove the files from the vector store and delete them from OpenAI."""
+
+        deleted = []
+        for file_id in file_ids:
+            await remove_file_from_vector_store(self.client, self.vector_store_id, file_id, metrics=self.metrics)
+            deleted.append(await delete_file(self.client, file_id, metrics=self.metrics))
+        return deleted
+
+
+async def _aiter(documents: Iterable[Document] | AsyncIterable[Document]) -> AsyncIterator[Document]:
+    if isinstance(documents, AsyncIterable):
+        async for document in documents:
+            yield document
+    else:
+        for document in documents:
+            yield document
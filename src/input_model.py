@@ -37,11 +37,88 @@ class OpenaiVectorStoreIntegration(BaseModel):
         description='Delete specified file ids associated with vector store. This can be useful when one needs to delete files that are no longer needed.',
         title='Array of vector store file ids to delete',
     )
+    replaceFilesOneByOne: Optional[bool] = Field(
+        False,
+        description='When enabled together with `filePrefix`, an old file is removed from the vector store and deleted as soon as its new version (a file with the same name, i.e. the same dataset or key-value store ID and the same batch index or record key) is attached to the vector store. The cleanup runs together with the upload and the vector store contains both versions of a document only for a few seconds. Old files without a new version are deleted at the end of the run.',
+        title='Replace files with a prefix one by one',
+    )
+    collectGarbage: Optional[bool] = Field(
+        False,
+        description='Instead of uploading data, remove the leftovers of failed or interrupted runs: files with the `filePrefix` uploaded more than an hour ago but never attached to the vector store, vector store entries whose file was deleted, and failed, cancelled or stuck vector store entries. One listing of the files and of the vector store is used, the orphans are removed concurrently (see `maxConcurrency`) and the reclaimed bytes are saved in the `GC_REPORT` record of the default key-value store.',
+        title='Collect garbage (remove orphaned files)',
+    )
+    dryRun: Optional[bool] = Field(
+        False,
+        description='Plan the run without uploading or deleting anything: the number of files to upload and to delete, their bytes and estimated tokens (from a sample of the dataset items), and the number of files in the vector store, compared with the OpenAI limits. The plan is saved in the `PLAN` record of the default key-value store. Without the dry run, the plan is checked too and the run fails before any upload when it would exceed the limits.',
+        title='Dry run (only plan the uploads and deletions)',
+    )
     saveCrawledFiles: Optional[bool] = Field(
         True,
         description="Save files from Apify's key-value store to OpenAI's file store. Useful when utilizing Apify’s website content crawler with the 'saveFiles' option, allowing the found files to be directly store and used in the assistant.",
         title='Save crawled files (docs, pdf, pptx) to OpenAI File Store',
     )
+    tokenCountCache: Optional[bool] = Field(
+        True,
+        description='Token counts of dataset items (used to split large datasets when `assistantId` is provided) are cached in a named key-value store `openai-vector-store-integration-cache`. Items that did not change since the previous runs are not tokenized again.',
+        title='Cache token counts between runs',
+    )
+    stripBoilerplate: Optional[bool] = Field(
+        False,
+        description='Remove the lines of the `text` field repeated on many pages of the dataset, such as the navigation, cookie banners and footers, before the items are packed into files. A line appearing on more than `boilerplateThresholdPercent` of the items is removed from all of them.',
+        title='Strip boilerplate repeated across pages',
+    )
+    boilerplateThresholdPercent: Optional[int] = Field(
+        50,
+        description='A line of the `text` field appearing on at least this percentage of the dataset items is considered boilerplate and removed when `stripBoilerplate` is enabled.',
+        ge=10,
+        le=100,
+        title='Boilerplate threshold (%)',
+    )
+    dropNearDuplicates: Optional[bool] = Field(
+        False,
+        description='Drop dataset items which are nearly identical to an earlier item of the same run (e.g. paginated listings, localized variants or print views of a page), before the items are packed into files. The `text` field (or the whole item when it is not among the `datasetFields`) is compared using MinHash signatures of its 5-word shingles. Every dropped item is reported in the dataset together with the URL of the kept item.',
+        title='Drop near-duplicate dataset items',
+    )
+    nearDuplicateSimilarityPercent: Optional[int] = Field(
+        90,
+        description='Items whose text is at least this similar (estimated Jaccard similarity of the 5-word shingles) to an earlier item are dropped when `dropNearDuplicates` is enabled.',
+        ge=50,
+        le=100,
+        title='Near-duplicate similarity (%)',
+    )
+    maxConcurrency: Optional[int] = Field(
+        5,
+        description='The maximum number of files uploaded to OpenAI at the same time. The limit is shared by all datasets and key-value stores processed in a single run.',
+        ge=1,
+        le=100,
+        title='Maximum number of concurrent uploads',
+    )
+    maxMemoryUsagePercent: Optional[int] = Field(
+        80,
+        description="The concurrency of downloads and uploads adapts to the memory usage reported by the platform. When the memory usage exceeds this percentage of the Actor's memory limit, fewer files are processed at the same time, and the bytes of records held in memory are limited. This allows running the Actor with less memory.",
+        ge=10,
+        le=95,
+        title='Target memory usage (%)',
+    )
+    shards: Optional[int] = Field(
+        1,
+        description='Split very large datasets and key-value stores into shards processed in parallel by child runs of this Actor (with the same memory). Datasets are split into ranges of items and key-value stores by keys. The old files are deleted once, after all child runs finish. Sharding works only on the Apify platform.',
+        ge=1,
+        le=50,
+        title='Number of shards',
+    )
+    standbyCoalesceSecs: Optional[int] = Field(
+        30,
+        description='In the standby mode, the Actor keeps running as an HTTP server and accepts the integration payloads. Triggers for the same vector store (and with the same settings) that arrive within this window are processed together in a single job, reusing the warm OpenAI and Apify clients and the list of existing files.',
+        ge=0,
+        le=3600,
+        title='Coalescing window in standby mode (seconds)',
+    )
+    followSourceRun: Optional[bool] = Field(
+        False,
+        description='When the integration is triggered while the source run (e.g. Website Content Crawler) is still running, ingest its dataset in batches of new items as the items are appended, instead of waiting for the run to finish. The old files with the `filePrefix` are deleted after the source run succeeds.',
+        title='Ingest the dataset while the source run is running',
+    )
     datasetId: Optional[str] = Field(
         None,
         description='The Dataset ID is provided automatically when the actor is set up as an integration. You can fill it in explicitly here to enable debugging of the actor',
@@ -52,8 +129,29 @@ class OpenaiVectorStoreIntegration(BaseModel):
         description='This is the ID for the Key-value store on Apify, which serves as the data source for json, pdf, and pptx files. This ID is automatically provided when the actor is integrated. However, you can manually enter the ID here for debugging purposes.',
         title="Apify's Key-value store ID (source for json, pdf, pptx files) ",
     )
+    datasetIds: Optional[List] = Field(
+        None,
+        description='A list of Dataset IDs to process in a single run, in addition to the `datasetId`. The datasets are processed concurrently and all files are stored in the same vector store.',
+        title="Apify's Dataset IDs",
+    )
+    keyValueStoreIds: Optional[List] = Field(
+        None,
+        description='A list of Key-value store IDs to process in a single run, in addition to the `keyValueStoreId`. The key-value stores are processed concurrently and all files are stored in the same vector store.',
+        title="Apify's Key-value store IDs",
+    )
     saveInApifyKeyValueStore: Optional[bool] = Field(
         False,
-        description="Save all created files in the Apify's Key-Value Store to easily check and retrieve all files (this is typically used when debugging)",
+        description="Save a gzipped copy of all files created from datasets in the Apify's Key-Value Store (the key is the file name with `.gz`) to easily check and retrieve all files (this is typically used when debugging)",
         title="Save all created files in the Apify's key-value store",
     )
+    shardIndex: Optional[int] = Field(
+        None,
+        description='Set by the coordinator run for its child runs when `shards` is greater than 1, the child run processes only this shard and does not delete any files. Do not set it manually.',
+        ge=0,
+        title='Shard index',
+    )
+    profile: Optional[bool] = Field(
+        False,
+        description="Sample the CPU profile and take memory snapshots of the run. The CPU profile is saved as `PROFILE_CPU` (folded stacks for flame graphs) and the memory snapshots as `PROFILE_MEMORY` in the Actor's key-value store. Profiling slows the run down, use it only for debugging. It can be also enabled by the `ACTOR_PROFILE` environment variable.",
+        title='Profile the run',
+    )
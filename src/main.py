@@ -1,91 +1,407 @@
 from __future__ import annotations
 
+import asyncio
+import functools
+import gzip
+import importlib
 import json
+import os
+import time
 from io import BytesIO
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, Any
 
-import openai
-import tiktoken
 from apify import Actor
-from apify_client import ApifyClientAsync
-from openai import AsyncOpenAI
 
-from .constants import OPENAI_SUPPORTED_FILES, OPENAI_VECTOR_STORE_POLLING_INTERVAL_MS
+from .boilerplate import strip_boilerplate
+from .constants import (
+    BOILERPLATE_THRESHOLD_PERCENT_DEFAULT,
+    DEBUG_SNAPSHOT_GZIP_LEVEL,
+    GC_REPORT_KEY,
+    LARGE_FILE_BYTES,
+    LARGE_FILES_LANE,
+    LARGE_FILES_LANE_SHARE,
+    MEMORY_TARGET_PERCENT_DEFAULT,
+    NEAR_DUPLICATE_SIMILARITY_PERCENT_DEFAULT,
+    OPENAI_SUPPORTED_FILES,
+    PROFILE_ENV_VAR,
+    RETRY_BACKOFF_SECS,
+    RETRY_ROUNDS,
+    STATE_KEY_VALUE_STORE_NAME,
+    TOKEN_CACHE_KEY_VALUE_STORE_NAME,
+)
+from .dedup import drop_near_duplicates
+from .follow import DatasetFollower, group_window_items, window_item
+from .garbage import collect_garbage
+from .governor import governing
+from .ingestor import STATUS_ERROR, Ingestor, delete_file, remove_file_from_vector_store
+from .ingestor import logger as ingestor_logger
 from .input_model import OpenaiVectorStoreIntegration as ActorInput
-from .utils import get_nested_value, split_data_if_required
+from .metrics import metrics
+from .planner import plan_run, preflight
+from .pool import UploadPool
+from .profiling import profile, snapshot
+from .projection import compile_projection
+from .replace import FileReplacer
+from .retry_queue import RetryQueue
+from .scheduler import DATASETS, KEY_VALUE_STORES, DeadlineScheduler, load_pending_work, save_pending_work
+from .session import FileInventory, Session
+from .shards import get_shard, in_shard, is_coordinator, run_shards, save_manifest, shard_range
+from .standby import fail, is_standby, serve
+from .token_cache import TokenCountCache
+from .tracing import span, tracing
+from .utils import get_encoding_for_model, split_data_if_required
 
 if TYPE_CHECKING:
-    from openai.types import FileDeleted
+    import logging
+    from collections.abc import Awaitable, Callable
+
+    from apify_client import ApifyClientAsync
+    from openai import AsyncOpenAI
     from openai.types.beta import Assistant
-    from openai.types.beta.vector_stores import VectorStoreFile, VectorStoreFileBatch, VectorStoreFileDeleted
-    from openai.types.file_object import FileObject
+    from openai.types.beta.vector_stores import VectorStoreFileBatch
+
+    from .records import DeletedRecord, FileRecord
+    from .retry_queue import OnFailure
 
 
 async def main() -> None:
-    async with Actor:
-        payload = await Actor.get_input()
-        actor_input = ActorInput(**payload)
+    # the OpenAI SDK is the slowest import, load it in a thread while the Actor is initializing
+    openai_import = asyncio.create_task(asyncio.to_thread(importlib.import_module, "openai"))
 
-        client = AsyncOpenAI(api_key=actor_input.openaiApiKey)
-        aclient_apify = ApifyClientAsync()
+    async with Actor:
+        use_actor_log(ingestor_logger)
+        payload = await Actor.get_input() or {}
+        await openai_import
+
+        with tracing():
+            async with profile(bool(payload.get("profile") or os.getenv(PROFILE_ENV_VAR))):
+                session = Session()
+                try:
+                    if is_standby():
+                        # the Actor keeps running and every coalesced trigger is a job reusing the warm session
+                        await serve(lambda p: run(ActorInput(**p), p, session), payload)
+                    else:
+                        await run(ActorInput(**payload), payload, session)
+                finally:
+                    await session.aclose()
+
+
+def use_actor_log(logger: logging.Logger) -> None:
+    """Send the records of the logger (e.g. of the ingestion engine) to the handlers of the Actor log."""
+    logger.handlers = list(Actor.log.handlers)
+    logger.setLevel(Actor.log.getEffectiveLevel())
+    logger.propagate = False
+
+
+async def run(actor_input: ActorInput, payload: dict, session: Session) -> None:
+    """Upload the datasets and key-value stores to the vector store and delete the previous files."""
+
+    metrics.reset()
+    client, aclient_apify = await session.clients(actor_input)
+
+    if actor_input.collectGarbage:
+        await run_garbage_collection(client, actor_input, session)
+        return
 
+    with metrics.phase("discovery"):
         Actor.log.info("Starting OpenAI Vector Store Integration, checking inputs ...")
         assistant = await check_inputs(client, actor_input, payload)
 
-        Actor.log.info("Get existing files in the vector store, either using fileIdsToDelete and/or by filePrefix")
-        file_ids_to_delete = await get_vector_store_file_ids(client, actor_input.vectorStoreId, actor_input.fileIdsToDelete, actor_input.filePrefix)
-        Actor.log.info("%d files present in vector store", len(file_ids_to_delete))
+        # child runs of a sharded run do not delete any files, the old files are deleted once by the coordinator
+        shard = get_shard(actor_input)
+        file_ids_to_delete: dict[str, str] = {}
+        if not shard:
+            Actor.log.info("Get existing files in the vector store, either using fileIdsToDelete and/or by filePrefix")
+            file_ids_to_delete = await get_vector_store_file_ids(
+                client, actor_input.vectorStoreId, actor_input.fileIdsToDelete, actor_input.filePrefix, inventory=session.inventory
+            )
+            Actor.log.info("%d files present in vector store", len(file_ids_to_delete))
 
-        # 1 - create files from dataset or from key-value store
-        files_created: list[str] = []
-        if actor_input.datasetId:
-            Actor.log.info("Creating files from Apify's dataset")
-            files: list[FileObject] = await create_files_from_dataset(client, aclient_apify, actor_input, assistant)
-            files_created.extend(f.id for f in files)
+        # the work deferred by a previous run (which reached its timeout) is resumed, unless its source is processed again
+        pending = await load_resumable_work(actor_input)
+        resumed = get_resumed_work(actor_input, pending)
+        if pending:
+            keep = {file_id for works in resumed.values() for work in works.values() for file_id in work["created"]}
+            file_ids_to_delete = {k: v for k, v in (dict.fromkeys(pending["deleteFileIds"], "") | file_ids_to_delete).items() if k not in keep}
 
-        if actor_input.saveCrawledFiles and actor_input.keyValueStoreId:
-            Actor.log.info("Creating files from Apify's key-value store")
-            files = await create_files_from_key_value_store(client, aclient_apify, actor_input)
-            files_created.extend(f.id for f in files)
+        sources = get_sources(actor_input, resumed)
 
-        # 2 - remove files from vector store (that were present before the new files were added)
-        if file_ids_to_delete:
-            await delete_files_from_vector_store(client, actor_input.vectorStoreId, file_ids_to_delete)
+    # the plan is made once for all shards by the coordinator, the dry run stops after the plan is saved
+    if not shard and not await check_capacity(client, aclient_apify, actor_input, assistant, sources, deletions=len(file_ids_to_delete)):
+        await metrics.save()
+        return
 
-        # 3 - delete files from OpenAi (that were present before the new files were added)
-        if file_ids_to_delete:
-            await delete_files(client, file_ids_to_delete)
+    if is_coordinator(actor_input):
+        if Actor.config.actor_id:
+            session.inventory.invalidate(actor_input.vectorStoreId)
+            await run_coordinator(client, actor_input, payload, file_ids_to_delete)
+            await metrics.save()
+            return
+        Actor.log.warning("Sharding requires running on the Apify platform, processing all shards in this run")
+
+    scheduler = DeadlineScheduler(Actor.config.timeout_at, cleanup_files=len(file_ids_to_delete))
+    scheduler.resume(resumed)
+
+    # in the replace mode, old files are deleted one by one as soon as their new version is attached
+    replacer = None
+    if actor_input.replaceFilesOneByOne and actor_input.filePrefix:
+        replacer = FileReplacer(
+            file_ids_to_delete,
+            lambda ids: delete_files_from_vector_store_and_openai(client, actor_input.vectorStoreId, ids),
+            max_concurrency=actor_input.maxConcurrency or 1,
+        )
 
+    # token counts of dataset items are cached between runs, tokens are only counted when an assistant is provided
+    token_cache = None
+    if assistant and actor_input.datasetIds and actor_input.tokenCountCache:
+        token_cache = await TokenCountCache.load(TOKEN_CACHE_KEY_VALUE_STORE_NAME)
+
+    # 1 - create files from datasets and from key-value stores, all sources share one upload pool of the ingestion engine
+    pool = UploadPool(actor_input.maxConcurrency or 1, lane_shares={LARGE_FILES_LANE: LARGE_FILES_LANE_SHARE})
+    ingestor = Ingestor(client, actor_input.vectorStoreId, pool=pool, metrics=metrics)
+
+    # the dataset of a running source run is ingested in batches while the items are being appended
+    follower = None if shard else DatasetFollower.from_payload(aclient_apify, actor_input, payload)
+
+    # failed files are retried at the end of the run, child runs of a sharded run do not share the queue of the vector store
+    retries = RetryQueue() if shard else await RetryQueue.load(STATE_KEY_VALUE_STORE_NAME, actor_input.vectorStoreId)
+    ingest_dataset = functools.partial(
+        create_files_from_dataset, client, aclient_apify, actor_input, assistant, ingestor=ingestor, replacer=replacer, token_cache=token_cache
+    )
+    ingest_key_value_store = functools.partial(
+        create_files_from_key_value_store,
+        client,
+        aclient_apify,
+        actor_input,
+        ingestor=ingestor,
+        replacer=replacer,
+        scheduler=scheduler,
+        retries=retries,
+    )
+
+    def ingest(kind: str, source_id: str, only: set | None) -> Awaitable[list[FileRecord]]:
+        return (
+            ingest_dataset(dataset_id=source_id, scheduler=scheduler, retries=retries, only=only, shard=shard)
+            if kind == DATASETS
+            else ingest_key_value_store(key_value_store_id=source_id, only=only, shard=shard)
+        )
 
-async def check_inputs(client: AsyncOpenAI, actor_input: ActorInput, payload: dict) -> Assistant | None:
-    """Check that provided input exists at OpenAI or at Apify."""
+    tasks: list[Awaitable[list[FileRecord]]] = []
+    task_sources = []
+    for dataset_id, only in sources[DATASETS].items():
+        Actor.log.info("Creating files from Apify's dataset: %s", dataset_id)
+        task_sources.append((DATASETS, dataset_id))
+        if follower and follower.dataset_id == dataset_id:
+            # the batches of the followed dataset are retried and deferred by their window, following stops at the deadline
+            follow_ingest = functools.partial(ingest_dataset, dataset_id=dataset_id, scheduler=scheduler, retries=retries)
+            tasks.append(follower.follow(follow_ingest, stop=lambda: not scheduler.can_start()))
+        else:
+            tasks.append(ingest(DATASETS, dataset_id, only))
+
+    for key_value_store_id, only in sources[KEY_VALUE_STORES].items():
+        Actor.log.info("Creating files from Apify's key-value store: %s", key_value_store_id)
+        task_sources.append((KEY_VALUE_STORES, key_value_store_id))
+        tasks.append(ingest(KEY_VALUE_STORES, key_value_store_id, only))
+
+    # the concurrency adapts to the memory usage when the memory limit is known (always on the Apify platform)
+    target_percent = actor_input.maxMemoryUsagePercent or MEMORY_TARGET_PERCENT_DEFAULT
+    with metrics.phase("ingestion"), governing(pool, Actor.config.memory_mbytes, target_percent / 100):
+        files_created: list[FileRecord] = []
+        for (kind, source_id), files in zip(task_sources, await asyncio.gather(*tasks)):
+            scheduler.add_created(kind, source_id, [f.id for f in files])
+            files_created.extend(files)
+        files_created.extend(await retry_failed_files(retries, scheduler, ingest))
+    Actor.log.info("Created %d files", len(files_created))
+
+    if token_cache:
+        metrics.increment("tokenCacheHits", token_cache.hits)
+        metrics.increment("tokenCacheMisses", token_cache.misses)
+        await token_cache.save(TOKEN_CACHE_KEY_VALUE_STORE_NAME)
+
+    with metrics.phase("cleanup"):
+        file_ids = list(file_ids_to_delete)
+        if replacer:
+            await replacer.wait()
+            Actor.log.info("Replaced %d files, %d old files left to delete", len(replacer.replaced), len(replacer.remaining))
+            file_ids = replacer.remaining
+
+        remaining = file_ids
+        file_ids = await save_deferred_work(actor_input, scheduler, retries, file_ids, pending=pending, shard=shard)
+        if follower and not follower.succeeded and file_ids:
+            Actor.log.warning("The source run finished with the status %s, %d old files are kept", follower.status, len(file_ids))
+            file_ids = []
+
+        if file_ids:
+            # 2 - remove files from vector store (that were present before the new files were added)
+            await delete_files_from_vector_store(client, actor_input.vectorStoreId, file_ids)
+            # 3 - delete files from OpenAi (that were present before the new files were added)
+            await delete_files(client, file_ids)
+
+    # the old files are deleted unless they were kept for the deferred work
+    deleted = [f for f in file_ids_to_delete if f in file_ids or f not in remaining]
+    session.inventory.update(actor_input.vectorStoreId, actor_input.filePrefix, files_created, deleted)
+    if shard:
+        await save_manifest(files_created, deferred=metrics.counters["filesDeferred"], failed=metrics.counters["filesFailed"])
+    await metrics.save()
+
+
+async def retry_failed_files(
+    retries: RetryQueue, scheduler: DeadlineScheduler, ingest: Callable[[str, str, set], Awaitable[list[FileRecord]]]
+) -> list[FileRecord]:
+    """Retry the files which failed transiently with an exponential backoff and return the files created.
+
+    The files which still fail (or for which there is no time left) are deferred to the next run, which retries them first.
+    """
+
+    files_created: list[FileRecord] = []
+    for attempt in range(RETRY_ROUNDS):
+        delay = RETRY_BACKOFF_SECS * 2**attempt
+        if not (failed := retries.transient()) or scheduler.remaining_secs() - scheduler.cleanup_secs() < delay + scheduler.estimate():
+            break
+        nr_files = sum(len(items) for sources in failed.values() for items in sources.values())
+        Actor.log.info("Retrying %d failed files in %d s", nr_files, delay)
+        metrics.increment("filesRetried", nr_files)
+        await asyncio.sleep(delay)
+
+        sources = [(kind, source_id, items) for kind, items_by_source in failed.items() for source_id, items in items_by_source.items()]
+        for (kind, source_id, _), files in zip(sources, await asyncio.gather(*(ingest(k, i, set(items)) for k, i, items in sources))):
+            scheduler.add_created(kind, source_id, [f.id for f in files])
+            files_created.extend(files)
+
+    for kind, items_by_source in retries.transient().items():
+        for source_id, items in items_by_source.items():
+            Actor.log.warning("%d files from %s %s still fail, they are deferred to the next run", len(items), kind, source_id)
+            for item in (i for i in items if i not in scheduler.deferred[kind][source_id]):
+                scheduler.defer(kind, source_id, item)
+                metrics.increment("filesDeferred")
+    return files_created
+
+
+async def save_deferred_work(
+    actor_input: ActorInput,
+    scheduler: DeadlineScheduler,
+    retries: RetryQueue,
+    file_ids: list[str],
+    *,
+    pending: dict | None,
+    shard: tuple[int, int] | None,
+) -> list[str]:
+    """Save the work deferred by the `scheduler` and the `retries` for the next run and return the old files which can be deleted now.
+
+    The old files are deleted only by the run which finishes the work. The deferred work of a child run is reported
+    in its manifest instead.
+    """
+
+    if not shard:
+        await retries.save(STATE_KEY_VALUE_STORE_NAME, actor_input.vectorStoreId)
+    if scheduler.stopped_early and shard:
+        Actor.log.warning("%d files of the shard were deferred (timeout or failing files)", metrics.counters["filesDeferred"])
+    elif scheduler.stopped_early:
+        work = scheduler.pending_work(actor_input.filePrefix, file_ids)
+        Actor.log.warning(
+            "%d files were deferred (timeout or failing files) and will be created by the next run. %d old files are kept until then.",
+            sum(len(w["pending"]) for sources in (work[DATASETS], work[KEY_VALUE_STORES]) for w in sources.values()),
+            len(file_ids),
+        )
+        await save_pending_work(STATE_KEY_VALUE_STORE_NAME, actor_input.vectorStoreId, work)
+        return []
+    elif pending:
+        await save_pending_work(STATE_KEY_VALUE_STORE_NAME, actor_input.vectorStoreId, None)
+    return file_ids
+
+
+async def run_coordinator(client: AsyncOpenAI, actor_input: ActorInput, payload: dict, file_ids_to_delete: dict[str, str]) -> None:
+    """Process the sources in shards by child runs of this Actor, merge their manifests and delete the old files once.
+
+    The old files are kept when any of the child runs failed or did not finish its shard.
+    """
+
+    reserve_secs = DeadlineScheduler(None, cleanup_files=len(file_ids_to_delete)).cleanup_secs()
+    with metrics.phase("ingestion"):
+        manifests = await run_shards(payload, actor_input, reserve_secs)
+
+    created = [f for m in manifests if m for f in m["created"]]
+    metrics.increment("filesCreated", len(created))
+    metrics.increment("filesFailed", sum(m["failed"] for m in manifests if m))
+    metrics.increment("filesDeferred", sum(m["deferred"] for m in manifests if m))
+    Actor.log.info("Created %d files by %d child runs", len(created), len(manifests))
+    if created:
+        await Actor.push_data([{"filename": f["filename"], "file_id": f["id"], "status": "completed", "error": ""} for f in created])
+
+    if any(m is None or m["deferred"] for m in manifests):
+        msg = f"Not all shards were processed, {len(file_ids_to_delete)} old files are kept in the vector store"
+        Actor.log.warning(msg)
+        return
+
+    with metrics.phase("cleanup"):
+        if file_ids := list(file_ids_to_delete):
+            await delete_files_from_vector_store(client, actor_input.vectorStoreId, file_ids)
+            await delete_files(client, file_ids)
+
+
+async def check_capacity(
+    client: AsyncOpenAI,
+    aclient_apify: ApifyClientAsync,
+    actor_input: ActorInput,
+    assistant: Assistant | None,
+    sources: dict[str, dict[str, set | None]],
+    deletions: int,
+) -> bool:
+    """Plan the uploads and deletions before any data is downloaded, return whether the run continues (see `preflight`)."""
+
+    with metrics.phase("planning"):
+        encoding = assistant and get_encoding_for_model(assistant.model) or None
+        plan = await plan_run(client, aclient_apify, actor_input, encoding, sources, deletions)
+    return await preflight(plan, dry_run=bool(actor_input.dryRun))
+
+
+async def run_garbage_collection(client: AsyncOpenAI, actor_input: ActorInput, session: Session) -> None:
+    """Remove the orphaned files and vector store entries instead of uploading data."""
+
+    Actor.log.info("Starting OpenAI Vector Store Integration, collecting garbage in the vector store %s ...", actor_input.vectorStoreId)
+    await check_vector_store(client, actor_input.vectorStoreId)
+    if not actor_input.filePrefix:
+        Actor.log.warning("The `filePrefix` is not provided, only the vector store entries are collected, detached files are kept")
+
+    session.inventory.invalidate(actor_input.vectorStoreId)
+    with metrics.phase("gc"):
+        summary = await collect_garbage(client, actor_input.vectorStoreId, actor_input.filePrefix, actor_input.maxConcurrency or 1)
+    await Actor.set_value(GC_REPORT_KEY, summary)
+    await metrics.save()
+
+
+async def check_vector_store(client: AsyncOpenAI, vector_store_id: str) -> None:
+    import openai
 
     try:
-        await client.beta.vector_stores.retrieve(actor_input.vectorStoreId)
+        await client.beta.vector_stores.retrieve(vector_store_id)
     except openai.NotFoundError:
         msg = (
-            f"Unable to find the OpenAI Vector Store with the ID: {actor_input.vectorStoreId}. Please verify that the Vector Store has "
+            f"Unable to find the OpenAI Vector Store with the ID: {vector_store_id}. Please verify that the Vector Store has "
             "been correctly created and that the `vectorStoreId` provided is accurate."
         )
-        Actor.log.error(msg)
-        await Actor.fail(status_message=msg)
+        await fail(msg)
     except openai.AuthenticationError:
         msg = "The OpenAI API Key provided is invalid. Please verify that the `OPENAI_API_KEY` is correctly set."
-        Actor.log.error(msg)
-        await Actor.fail(status_message=msg)
+        await fail(msg)
+
+
+async def check_inputs(client: AsyncOpenAI, actor_input: ActorInput, payload: dict) -> Assistant | None:
+    """Check that provided input exists at OpenAI or at Apify."""
+
+    await check_vector_store(client, actor_input.vectorStoreId)
 
     assistant = None
     if actor_input.assistantId and not (assistant := await client.beta.assistants.retrieve(actor_input.assistantId)):
         msg = f"Unable to find the Assistant with the ID: {actor_input.assistantId} on OpenAI. "
         "Please verify that the Assistant has been correctly created and that the `assistantId` provided is accurate. "
-        Actor.log.error(msg)
-        await Actor.fail(status_message=msg)
+        await fail(msg)
 
     resource = payload.get("payload", {}).get("resource", {})
-    dataset_id = resource.get("defaultDatasetId") or actor_input.datasetId or ""
-    key_value_store_id = resource.get("defaultKeyValueStoreId") or actor_input.keyValueStoreId or ""
+    dataset_ids = unique_ids(resource.get("defaultDatasetId") or actor_input.datasetId, *(actor_input.datasetIds or []))
+    key_value_store_ids = unique_ids(resource.get("defaultKeyValueStoreId") or actor_input.keyValueStoreId, *(actor_input.keyValueStoreIds or []))
 
-    if not (dataset_id or key_value_store_id):
+    if not (dataset_ids or key_value_store_ids):
         msg = (
             "The Apify's `datasetId` or Apify's `keyValueStoreId` are not provided. "
             "There are two ways to specify the `datasetId` or `keyValueStoreId`: "
@@ -95,96 +411,289 @@ async def check_inputs(client: AsyncOpenAI, actor_input: ActorInput, payload: di
             "You can do this by entering the values in the 'Debug Settings' section of the Actor's input screen."
             "Please verify that one of these options is correctly configured."
         )
-        Actor.log.error(msg)
-        await Actor.fail(status_message=msg)
+        await fail(msg)
 
-    actor_input.datasetId = dataset_id
-    actor_input.keyValueStoreId = key_value_store_id
+    actor_input.datasetIds = dataset_ids
+    actor_input.keyValueStoreIds = key_value_store_ids
+    actor_input.datasetId = dataset_ids[0] if dataset_ids else ""
+    actor_input.keyValueStoreId = key_value_store_ids[0] if key_value_store_ids else ""
     return assistant
 
 
-async def create_files_from_dataset(
-    client: AsyncOpenAI, aclient_apify: ApifyClientAsync, actor_input: ActorInput, assistant: Assistant | None = None
-) -> list[FileObject]:
-    """Create files in OpenAI."""
+async def load_resumable_work(actor_input: ActorInput) -> dict | None:
+    """Load the work deferred by a previous run, None when there is no work which can be resumed by this run.
 
-    dataset = await aclient_apify.dataset(str(actor_input.datasetId)).list_items(clean=True)
-    data: list = dataset.items
+    The work is resumed only by runs which are not sharded and when the previous run used the same `filePrefix`.
+    """
 
-    if actor_input.datasetFields:
-        Actor.log.info("Selecting the following fields %s", actor_input.datasetFields)
-        data = [{key: get_nested_value(d, key) for key in actor_input.datasetFields} for d in data]
-        data = [d for d in data if d]
+    if get_shard(actor_input) or is_coordinator(actor_input):
+        return None
+    pending = await load_pending_work(STATE_KEY_VALUE_STORE_NAME, actor_input.vectorStoreId)
+    if pending and pending.get("filePrefix", "") != (actor_input.filePrefix or ""):
+        Actor.log.warning("Not resuming the work deferred by a previous run, the run used a different filePrefix: %s", pending.get("filePrefix"))
+        return None
+    return pending
 
-    if encoding := assistant and tiktoken.encoding_for_model(assistant.model) or None:
-        data = await split_data_if_required(data, encoding)
-    else:
-        data = [data]
 
-    files_created = []
-    try:
-        for i, d in enumerate(data):
-            prefix = f"{actor_input.filePrefix}_{actor_input.datasetId}" if actor_input.filePrefix else f"{actor_input.datasetId}"
-            filename = f"{prefix}_{i}.json"
-            if f := await create_file_and_add_to_vector_store(client, filename, json.dumps(d).encode("utf-8"), actor_input.vectorStoreId):
-                files_created.append(f)
-    except Exception as e:
-        Actor.log.exception(e)
+def get_resumed_work(actor_input: ActorInput, pending: dict | None) -> dict[str, dict[str, dict]]:
+    """Return the deferred work of the sources which are not processed again by this run (by kind and source ID)."""
 
-    # store files in Apify's KV store if enabled
-    if actor_input.saveInApifyKeyValueStore:
-        await save_in_apify_kv_store(files_created, data)
+    resumed: dict[str, dict[str, dict]] = {DATASETS: {}, KEY_VALUE_STORES: {}}
+    if not pending:
+        return resumed
 
-    return files_created
+    processed = {DATASETS: actor_input.datasetIds or [], KEY_VALUE_STORES: actor_input.keyValueStoreIds or []}
+    for kind, sources in resumed.items():
+        sources.update({source_id: work for source_id, work in pending.get(kind, {}).items() if source_id not in processed[kind]})
+    return resumed
 
 
-async def create_files_from_key_value_store(client: AsyncOpenAI, aclient_apify: ApifyClientAsync, actor_input: ActorInput) -> list[FileObject]:
-    """Create files from Apify key-value store."""
+def get_sources(actor_input: ActorInput, resumed: dict[str, dict[str, dict]]) -> dict[str, dict[str, set | None]]:
+    """Return the sources processed by the run by kind and source ID, with the items of the resumed work (None for all items)."""
 
-    files_created = []
-    exclusive_start_key = None
-    kv_store = aclient_apify.key_value_store(str(actor_input.keyValueStoreId))
+    sources: dict[str, dict[str, set | None]] = {DATASETS: dict.fromkeys(actor_input.datasetIds or []), KEY_VALUE_STORES: {}}
+    if actor_input.saveCrawledFiles:
+        sources[KEY_VALUE_STORES] = dict.fromkeys(actor_input.keyValueStoreIds or [])
+    for kind, work in resumed.items():
+        if kind == DATASETS or actor_input.saveCrawledFiles:
+            sources[kind].update({k: set(v["pending"]) for k, v in work.items()})
+    return sources
 
-    while keys := await kv_store.list_keys(exclusive_start_key=exclusive_start_key):
-        Actor.log.info("Creating files from Apify key-value store, batch of items: %s", len(keys.get("items", [])))
 
-        for item in keys.get("items", []):
-            key = item.get("key")
-            ext = f".{key.split('.')[-1]}"
-            prefix = f"{actor_input.filePrefix}_{actor_input.keyValueStoreId}" if actor_input.filePrefix else f"{actor_input.keyValueStoreId}"
-
-            if ext in OPENAI_SUPPORTED_FILES:
-                if d := await kv_store.get_record_as_bytes(key):
-                    filename = f"{prefix}_{d['key']}"
-                    if f := await create_file_and_add_to_vector_store(client, filename, BytesIO(d["value"]), actor_input.vectorStoreId):
-                        files_created.append(f)
-            else:
-                Actor.log.debug("Skipping file %s not supported by OpenAI", item.get("key"))
+def unique_ids(*ids: str | None) -> list[str]:
+    """Return non-empty ids without duplicates, preserving their order."""
+    return list(dict.fromkeys(i for i in ids if i))
 
-        if not (exclusive_start_key := keys.get("nextExclusiveStartKey", None)):
-            return files_created
+
+async def create_files_from_dataset(
+    client: AsyncOpenAI,
+    aclient_apify: ApifyClientAsync,
+    actor_input: ActorInput,
+    assistant: Assistant | None = None,
+    *,
+    dataset_id: str | None = None,
+    ingestor: Ingestor | None = None,
+    replacer: FileReplacer | None = None,
+    token_cache: TokenCountCache | None = None,
+    scheduler: DeadlineScheduler | None = None,
+    retries: RetryQueue | None = None,
+    only: set[int | str] | None = None,
+    shard: tuple[int, int] | None = None,
+    window: tuple[int, int] | None = None,
+) -> list[FileRecord]:
+    """Create files in OpenAI.
+
+    The files are uploaded concurrently by the `ingestor`, whose pool is shared with other datasets and key-value stores.
+    When the `replacer` is provided, the previous version of every created file is deleted right after the file is attached.
+    Token counts of the items are taken from the `token_cache` when available.
+    Files which do not fit into the run timeout are deferred by the `scheduler`, `only` limits the files to the given indices.
+    Failed files are recorded in the `retries` queue, which keeps their contents, so that retrying them does not download
+    and process the dataset again.
+    With the `shard` (index, count), only the shard's range of items is processed and the file names contain the offset of the range.
+    The `window` (offset, limit) selects the range of items directly (used when following a running source run), its files
+    are retried and deferred as the items of the window (see `window_item`), which `only` accepts as well.
+    """
+
+    dataset_id = dataset_id or actor_input.datasetId
+    ingestor = ingestor or Ingestor(client, actor_input.vectorStoreId, max_concurrency=actor_input.maxConcurrency or 1, metrics=metrics)
+
+    # the retried files are created from the contents kept by the failed attempts, the dataset is not downloaded again
+    batches: dict[int | str, tuple[str, Any]] = {}
+    if (kept := retries.kept(DATASETS, str(dataset_id), only) if retries and only else None) is not None:
+        Actor.log.info("Retrying %d files of the dataset %s", len(kept), dataset_id)
+        batches = kept
+    else:
+        for w, indices in (group_window_items(only) if only is not None else {window: None}).items():
+            fetched = await get_dataset_batches(
+                aclient_apify, actor_input, assistant, str(dataset_id), token_cache=token_cache, only=indices, shard=shard, window=w
+            )
+            batches.update({window_item(w, i) if w else i: batch for i, batch in fetched.items()})
+
+    async def _create(i: int | str) -> FileRecord | None:
+        filename, batch = batches.pop(i)
+        content = batch if isinstance(batch, bytes) else json.dumps(batch).encode("utf-8")
+        snapshot("json.dumps")
+        if scheduler and not scheduler.can_start(len(content)):
+            scheduler.defer(DATASETS, str(dataset_id), i)
+            metrics.increment("filesDeferred")
+            return None
+        start = time.perf_counter()
+        on_failure = retries.on_failure(DATASETS, str(dataset_id), i, filename) if retries else None
+        file = await create_file_and_add_to_vector_store(ingestor, filename, content, on_failure)
+        if retries and file:
+            retries.succeeded(DATASETS, str(dataset_id), i)
+        elif retries:
+            retries.keep(DATASETS, str(dataset_id), i, filename, content)
+        if file and scheduler:
+            scheduler.observe(time.perf_counter() - start, len(content))
+        if file and replacer:
+            replacer.replace(filename)
+        # store the file in Apify's KV store if enabled, while the pool slot is still taken
+        if file and actor_input.saveInApifyKeyValueStore:
+            await save_in_apify_kv_store(file.filename, content)
+        return file
+
+    # dataset files start before the key-value store files, resumed and retried files (`only`) start first
+    files_created: list[FileRecord] = []
+    try:
+        priority, order = 0 if only is None else -1, {i: n for n, i in enumerate(batches)}
+        files_created = [f for f in await ingestor.pool.map(_create, list(batches), priority=lambda i: (priority, order[i])) if f]
+    except Exception as e:
+        Actor.log.exception(e)
 
     return files_created
 
 
-async def create_file(client: AsyncOpenAI, filename: str, data: bytes | BytesIO) -> FileObject | None:
-    """Create OpenAI file and push information to Apify's output.
+async def get_dataset_batches(
+    aclient_apify: ApifyClientAsync,
+    actor_input: ActorInput,
+    assistant: Assistant | None,
+    dataset_id: str,
+    *,
+    token_cache: TokenCountCache | None = None,
+    only: set[int] | None = None,
+    shard: tuple[int, int] | None = None,
+    window: tuple[int, int] | None = None,
+) -> dict[int, tuple[str, list]]:
+    """Download the items of the dataset, select their fields and split them into batches of files.
+
+    Return the filename and the items of every batch, `only` limits the batches to the given indices.
+    """
+
+    offset, limit = window or (0, None)
+    if shard:
+        info = await aclient_apify.dataset(dataset_id).get()
+        offset, limit = shard_range((info or {}).get("itemCount", 0), *shard)
+    if limit == 0:
+        return {}
 
-    https://platform.openai.com/docs/api-reference/files/create
+    with metrics.operation("download"), span("list_items", {"apify.dataset.id": dataset_id}) as s:
+        dataset = await aclient_apify.dataset(dataset_id).list_items(clean=True, offset=offset, limit=limit)
+        s.set_attribute("apify.dataset.items", len(dataset.items))
+    data: list = dataset.items
+    del dataset
+    snapshot("list_items")
+
+    if actor_input.datasetFields:
+        Actor.log.info("Selecting the following fields %s", actor_input.datasetFields)
+        data = compile_projection(actor_input.datasetFields)(data)
+
+    if actor_input.stripBoilerplate:
+        threshold = actor_input.boilerplateThresholdPercent or BOILERPLATE_THRESHOLD_PERCENT_DEFAULT
+        with metrics.operation("boilerplate"):
+            data, lines, stripped = await asyncio.to_thread(strip_boilerplate, data, threshold)
+        Actor.log.info("Stripped %d boilerplate lines (%d characters) from the items of the dataset %s", lines, stripped, dataset_id)
+        metrics.increment("boilerplateCharsStripped", stripped)
+
+    if actor_input.dropNearDuplicates:
+        similarity = actor_input.nearDuplicateSimilarityPercent or NEAR_DUPLICATE_SIMILARITY_PERCENT_DEFAULT
+        data = await drop_near_duplicates(data, similarity, source=f"the dataset {dataset_id}")
+
+    if encoding := assistant and get_encoding_for_model(assistant.model) or None:
+        with metrics.operation("tokenization"):
+            data = await split_data_if_required(data, encoding, token_cache)
+    else:
+        data = [data]
+
+    prefix = f"{actor_input.filePrefix}_{dataset_id}" if actor_input.filePrefix else f"{dataset_id}"
+    if shard or window:
+        prefix = f"{prefix}_{offset}"
+
+    # every batch is released as soon as its file is created (or deferred), the content of a failed batch is kept for the retries
+    return {i: (f"{prefix}_{i}.json", d) for i, d in enumerate(data) if only is None or i in only}
+
+
+async def create_files_from_key_value_store(
+    client: AsyncOpenAI,
+    aclient_apify: ApifyClientAsync,
+    actor_input: ActorInput,
+    *,
+    key_value_store_id: str | None = None,
+    ingestor: Ingestor | None = None,
+    replacer: FileReplacer | None = None,
+    scheduler: DeadlineScheduler | None = None,
+    retries: RetryQueue | None = None,
+    only: set[str] | None = None,
+    shard: tuple[int, int] | None = None,
+) -> list[FileRecord]:
+    """Create files from Apify key-value store.
+
+    Records are downloaded and uploaded concurrently in the pool of the `ingestor`, the largest first, a record is only held
+    in memory while its pool slot is taken.
+    When the `replacer` is provided, the previous version of every created file is deleted right after the file is attached.
+    Files which do not fit into the run timeout are deferred by the `scheduler`, `only` limits the files to the given keys.
+    Failed files are recorded in the `retries` queue.
+    With the `shard` (index, count), only the keys of the shard are processed.
     """
-    try:
-        file = await client.files.create(file=(filename, data), purpose="assistants")
-        Actor.log.info("Created OpenAI file: %s, id: %s", file.filename, file.id)
-        return file  # noqa: TRY300
-    except Exception as e:
-        Actor.log.error("Failed to create OpenAI file: %s, error: %s", filename, e)
 
-    return None
+    key_value_store_id = key_value_store_id or actor_input.keyValueStoreId
+    ingestor = ingestor or Ingestor(client, actor_input.vectorStoreId, max_concurrency=actor_input.maxConcurrency or 1, metrics=metrics)
+    exclusive_start_key = None
+    kv_store = aclient_apify.key_value_store(str(key_value_store_id))
+    prefix = f"{actor_input.filePrefix}_{key_value_store_id}" if actor_input.filePrefix else f"{key_value_store_id}"
+    sizes: dict[str, int] = {}
+
+    async def _create(key: str) -> FileRecord | None:
+        if scheduler and not scheduler.can_start(sizes[key]):
+            scheduler.defer(KEY_VALUE_STORES, str(key_value_store_id), key)
+            metrics.increment("filesDeferred")
+            return None
+        start = time.perf_counter()
+        with metrics.operation("download"), span(
+            "get_record_as_bytes", {"apify.key_value_store.id": str(key_value_store_id), "apify.record.key": key}
+        ) as s:
+            d = await kv_store.get_record_as_bytes(key)
+            s.set_attribute("file.bytes", len(d["value"]) if d else 0)
+        snapshot("get_record_as_bytes")
+        if d:
+            filename = f"{prefix}_{d['key']}"
+            on_failure = retries.on_failure(KEY_VALUE_STORES, str(key_value_store_id), key, filename) if retries else None
+            file = await create_file_and_add_to_vector_store(ingestor, filename, BytesIO(d["value"]), on_failure)
+            if file and retries:
+                retries.succeeded(KEY_VALUE_STORES, str(key_value_store_id), key)
+            if file and scheduler:
+                scheduler.observe(time.perf_counter() - start, len(d["value"]))
+            if file and replacer:
+                replacer.replace(filename)
+            return file
+        return None
+
+    # all keys are listed first (only their metadata), so that the uploads can be scheduled by the size of the records
+    supported = []
+    while keys := await kv_store.list_keys(exclusive_start_key=exclusive_start_key):
+        Actor.log.info("Listing files in Apify key-value store, batch of items: %s", len(keys.get("items", [])))
 
+        for item in keys.get("items", []):
+            key = item.get("key")
+            if (only is not None and key not in only) or (shard and not in_shard(key, *shard)):
+                continue
+            if f".{key.split('.')[-1]}" in OPENAI_SUPPORTED_FILES:
+                supported.append(key)
+                sizes[key] = item.get("size") or 0
+            else:
+                Actor.log.debug("Skipping file %s not supported by OpenAI", key)
 
-async def delete_files(client: AsyncOpenAI, files_to_delete: list[str], *, actor_push: bool = True) -> list[FileDeleted]:
+        if not (exclusive_start_key := keys.get("nextExclusiveStartKey", None)):
+            break
+
+    # records start after the dataset files (resumed and retried records first), the largest records first (LPT) to shorten
+    # the tail of the run, large records run in their own lane limited to a share of the pool, the small records fill the
+    # remaining slots around them, a record is held in memory from its download until it is uploaded, its size counts
+    # towards the pool's byte budget
+    Actor.log.info("Creating files from Apify key-value store, %d files, %.1f MB", len(supported), sum(sizes.values()) / 1e6)
+    files_created = await ingestor.pool.map(
+        _create,
+        supported,
+        size=sizes.__getitem__,
+        priority=lambda key: (1 if only is None else -1, -sizes[key]),
+        lane=lambda key: LARGE_FILES_LANE if sizes[key] >= LARGE_FILE_BYTES else "",
+    )
+    return [f for f in files_created if f]
+
+
+async def delete_files(client: AsyncOpenAI, files_to_delete: list[str], *, actor_push: bool = True) -> list[DeletedRecord]:
     """
-    Delete OpenAI files.
+    Delete OpenAI files and push information to Apify's output.
 
     https://platform.openai.com/docs/api-reference/files/delete
     """
@@ -192,9 +701,7 @@ async def delete_files(client: AsyncOpenAI, files_to_delete: list[str], *, actor
     files_to_delete = files_to_delete or []
     try:
         for _id in files_to_delete:
-            file_ = await client.files.delete(_id)
-            deleted_files.append(file_)
-            Actor.log.info("Deleted OpenAI File with id: %s", _id)
+            deleted_files.append(file_ := await delete_file(client, _id, metrics=metrics))
             if actor_push:
                 await Actor.push_data({"filename": "", "file_id": file_.id, "status": "deleted"})
     except Exception as e:
@@ -203,32 +710,18 @@ async def delete_files(client: AsyncOpenAI, files_to_delete: list[str], *, actor
     return deleted_files
 
 
-async def create_file_and_add_to_vector_store(client: AsyncOpenAI, filename: str, data: bytes | BytesIO, vector_store_id: str) -> FileObject | None:
-    """Create OpenAI file and add it to the vector store.
+async def create_file_and_add_to_vector_store(
+    ingestor: Ingestor, filename: str, data: bytes | BytesIO, on_failure: OnFailure | None = None
+) -> FileRecord | None:
+    """Create OpenAI file, add it to the vector store and push information to Apify's output.
 
-    If the attachment to the vector store fails, the file is deleted.
+    The upload is done by the ingestion engine (`src.ingestor`), the files which could not be created are not pushed.
     """
 
-    if file := await create_file(client, filename, data):
-        try:
-            file_vs: VectorStoreFile = await client.beta.vector_stores.files.create_and_poll(
-                vector_store_id=vector_store_id, file_id=file.id, poll_interval_ms=OPENAI_VECTOR_STORE_POLLING_INTERVAL_MS
-            )
-            await Actor.push_data({"filename": filename, "file_id": file.id, "status": file_vs.status, "error": file_vs.last_error or ""})
-            if (file_vs.status in ("failed", "cancelled")) or file_vs.last_error:
-                Actor.log.error(
-                    "Failed to attach file to vector store: %s (this typically happens when PDF file is an image or scan), deleting OpenAI file",
-                    file_vs.last_error,
-                )
-                await delete_files(client, [file.id], actor_push=False)
-                return None
-
-            Actor.log.info("Attached file to vector store: %s", file_vs.id)
-            return file  # noqa: TRY300
-        except Exception as e:
-            Actor.log.error("Failed to create OpenAI file: %s, error: %s", filename, e)
-
-    return None
+    result = await ingestor.upload(filename, data, on_failure)
+    if result.status != STATUS_ERROR:
+        await Actor.push_data(result.row())
+    return result.file
 
 
 async def create_files_vector_store_and_poll(client: AsyncOpenAI, vs_id: str, files_created: list[str]) -> VectorStoreFileBatch | None:
@@ -243,7 +736,7 @@ async def create_files_vector_store_and_poll(client: AsyncOpenAI, vs_id: str, fi
     return None
 
 
-async def delete_files_from_vector_store(client: AsyncOpenAI, vs_id: str, file_ids: list[str]) -> list[VectorStoreFileDeleted]:
+async def delete_files_from_vector_store(client: AsyncOpenAI, vs_id: str, file_ids: list[str]) -> list[DeletedRecord]:
     """Remove files from vector store. The files are not actually deleted, only removed."""
 
     deleted_files = []
@@ -252,8 +745,7 @@ async def delete_files_from_vector_store(client: AsyncOpenAI, vs_id: str, file_i
 
     try:
         for _id in file_ids:
-            file_ = await client.beta.vector_stores.files.delete(_id, vector_store_id=vs_id)
-            Actor.log.info("Removed file from vector store: %s", file_)
+            file_ = await remove_file_from_vector_store(client, vs_id, _id, metrics=metrics)
             deleted_files.append(file_)
     except Exception as e:
         Actor.log.exception(e)
@@ -261,18 +753,24 @@ async def delete_files_from_vector_store(client: AsyncOpenAI, vs_id: str, file_i
     return deleted_files
 
 
-async def get_files_by_prefix(client: AsyncOpenAI, file_prefix: str) -> list[str]:
-    """Get files with a specific prefix from OpenAI's file store."""
+async def delete_files_from_vector_store_and_openai(client: AsyncOpenAI, vs_id: str, file_ids: list[str]) -> None:
+    """Remove files from the vector store and delete them from OpenAI."""
+
+    await delete_files_from_vector_store(client, vs_id, file_ids)
+    await delete_files(client, file_ids)
+
 
-    files = [f async for f in client.files.list()]
-    return [f.id for f in files if f.filename.startswith(file_prefix)]
+async def get_files_by_prefix(client: AsyncOpenAI, file_prefix: str) -> dict[str, str]:
+    """Get files with a specific prefix from OpenAI's file store, return mapping of file id to filename."""
+
+    return {f.id: f.filename async for f in client.files.list() if f.filename.startswith(file_prefix)}
 
 
 async def get_vector_store_files_by_ids(client: AsyncOpenAI, vs_id: str, file_ids: list[str]) -> list[str]:
     """Find files in vector store by file ids."""
 
-    vs_files = [f async for f in client.beta.vector_stores.files.list(vector_store_id=vs_id)]
-    files = [f.id for f in vs_files if f.id in file_ids]
+    wanted = set(file_ids)
+    files = [f.id async for f in client.beta.vector_stores.files.list(vector_store_id=vs_id) if f.id in wanted]
 
     if set(file_ids) - set(files):
         Actor.log.warning(
@@ -290,50 +788,67 @@ async def get_vector_store_files_by_prefix(client: AsyncOpenAI, vs_id: str, file
     Get files with prefix from OpenAI's file store, then retrieve the files associated with the vector store and compare them.
     """
 
+    return list(await get_vector_store_file_names_by_prefix(client, vs_id, file_prefix))
+
+
+async def get_vector_store_file_names_by_prefix(client: AsyncOpenAI, vs_id: str, file_prefix: str) -> dict[str, str]:
+    """Find files in vector store by file prefix, return mapping of file id to filename."""
+
     files = await get_files_by_prefix(client, file_prefix)
-    vs_files = [f async for f in client.beta.vector_stores.files.list(vector_store_id=vs_id)]
+    # only the ids of the vector store files are kept, not the whole pages of the listing
+    vs_file_ids = [f.id async for f in client.beta.vector_stores.files.list(vector_store_id=vs_id)]
 
-    file_present = [f.id for f in vs_files if f.id in files]
-    for f in (f.id for f in vs_files if f.id not in files):
+    file_present = {f: files[f] for f in vs_file_ids if f in files}
+    for f in (f for f in vs_file_ids if f not in files):
         Actor.log.warning(
             f"File {f} associated with vector store: {vs_id} was not found in the OpenAI Files. This "
             "typically means that the file was deleted but is still associated with vector store."
-            "You need to solve this issue manually if desired.",
+            "Run the Actor with `collectGarbage` enabled to remove such entries.",
         )
 
     return file_present
 
 
-async def get_vector_store_file_ids(client: AsyncOpenAI, vs_id: str, file_ids: list | None, file_prefix: str | None) -> list[str]:
-    """Find files in vector store, either using file_ids and/or by file prefix."""
+async def get_vector_store_file_ids(
+    client: AsyncOpenAI, vs_id: str, file_ids: list | None, file_prefix: str | None, inventory: FileInventory | None = None
+) -> dict[str, str]:
+    """Find files in vector store, either using file_ids and/or by file prefix.
+
+    Return mapping of file id to filename, the filename is only known for files found by the prefix (empty otherwise).
+    The files found by the prefix are taken from the `inventory` of the previous jobs when it is up to date.
+    """
 
     file_ids = file_ids or []
     file_prefix = file_prefix or ""
 
     if not file_ids and not file_prefix:
-        return []
+        return {}
 
-    files = []
+    files = {}
     if file_ids:
-        files.extend(await get_vector_store_files_by_ids(client, vs_id, file_ids))
+        files.update(dict.fromkeys(await get_vector_store_files_by_ids(client, vs_id, file_ids), ""))
 
     if file_prefix:
-        files.extend(await get_vector_store_files_by_prefix(client, vs_id, file_prefix))
+        if inventory is None or (by_prefix := inventory.get(vs_id, file_prefix)) is None:
+            by_prefix = await get_vector_store_file_names_by_prefix(client, vs_id, file_prefix)
+            if inventory is not None:
+                inventory.put(vs_id, file_prefix, by_prefix)
+        files.update(by_prefix)
 
     return files
 
 
-async def save_in_apify_kv_store(files_created: list[FileObject], data: list[dict]) -> None:
-    """Save files in Apify's KV Store for the debugging purposes."""
+async def save_in_apify_kv_store(filename: str, content: bytes) -> None:
+    """Save a gzipped copy of the file in Apify's KV Store for the debugging purposes, the key is the filename with `.gz`.
 
-    if len(files_created) != len(data):
-        Actor.log.warning("Number of files created does not match the number of data. Saving to Apify's KV store skipped")
-        return
+    The content is compressed in a thread, so that other files are uploaded meanwhile.
+    """
 
     try:
+        data = await asyncio.to_thread(gzip.compress, content, DEBUG_SNAPSHOT_GZIP_LEVEL)
         store = await Actor.open_key_value_store()
-        for file, d in zip(files_created, data):
-            await store.set_value(file.filename, json.dumps(d), content_type="application/json")
-            Actor.log.debug("Stored the file in the Actor's key value store: %s", file.filename)
+        with metrics.operation("debug_snapshot"):
+            await store.set_value(f"{filename}.gz", data, content_type="application/gzip")
+        Actor.log.debug("Stored the file in the Actor's key value store: %s.gz", filename)
     except Exception as e:
         Actor.log.exception(e)
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import time
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any
+
+from apify import Actor
+
+from .constants import RUN_REPORT_KEY
+from .tracing import span
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+    import httpx
+
+# path segments following these collections are IDs, e.g. /v1/vector_stores/{id}/files/{id}
+_COLLECTIONS = {"files", "vector_stores", "file_batches", "assistants", "datasets", "key-value-stores", "actor-runs", "acts"}
+_RETRYABLE_STATUS = {408, 409, 429}
+
+
+def endpoint_name(method: str, path: str) -> str:
+    """Normalise the request to an endpoint name without IDs, e.g. `DELETE /v1/files/{id}`."""
+
+    path, records, _ = path.partition("/records/")
+    parts = path.split("/")
+    for i in range(1, len(parts)):
+        if parts[i - 1] in _COLLECTIONS and parts[i]:
+            parts[i] = "{id}"
+    return f"{method} {'/'.join(parts)}{'/records/{key}' if records else ''}"
+
+
+def percentiles(values: list[float]) -> dict[str, float]:
+    if not values:
+        return {}
+    values = sorted(values)
+
+    def p(q: float) -> float:
+        return round(values[min(len(values) - 1, int(q * len(values)))], 3)
+
+    return {"p50": p(0.5), "p90": p(0.9), "p99": p(0.99), "max": round(values[-1], 3)}
+
+
+class RunMetrics:
+    """Timings and counters of a single run, saved as a JSON run report to the default key-value store.
+
+    - phases: wall time of the main phases of the run (discovery, ingestion, cleanup)
+    - operations: number and cumulative time of operations (download, tokenization, upload, attach, delete), operations
+      run concurrently, so the cumulative time can be longer than the phase
+    - API calls by endpoint (including retried attempts), responses by status code, 429s and other retryable responses
+    - bytes uploaded and downloaded, tokens counted, latency percentiles of files (upload and attach)
+    """
+
+    def __init__(self) -> None:
+        self.reset()
+
+    def reset(self) -> None:
+        """Start collecting metrics of a new run."""
+        self.started_at = time.perf_counter()
+        self.phases: dict[str, float] = {}
+        self.operations: dict[str, list[float]] = defaultdict(lambda: [0, 0.0])
+        self.api_calls: Counter[str] = Counter()
+        self.api_latency: dict[str, list[float]] = defaultdict(list)
+        self.status_codes: Counter[int] = Counter()
+        self.counters: Counter[str] = Counter()
+        self.file_latencies: list[float] = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """Measure a phase of the run, the phase is also traced as a span when tracing is enabled."""
+        start = time.perf_counter()
+        try:
+            with span(name):
+                yield
+        finally:
+            self.phases[name] = self.phases.get(name, 0) + time.perf_counter() - start
+
+    @contextmanager
+    def operation(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            op = self.operations[name]
+            op[0] += 1
+            op[1] += time.perf_counter() - start
+
+    def increment(self, name: str, value: int = 1) -> None:
+        self.counters[name] += value
+
+    def record_file(self, latency: float) -> None:
+        self.file_latencies.append(latency)
+
+    def record_request(self, request: httpx.Request, response: httpx.Response | None, elapsed: float) -> None:
+        """Record an API call (a single attempt), `response` is None when the request failed without a response.
+
+        Failed attempts (no response or a retryable status) are counted whether or not the client retries them.
+        """
+
+        name = endpoint_name(request.method, request.url.path)
+        self.api_calls[name] += 1
+        self.api_latency[name].append(elapsed)
+        if request.method in ("POST", "PUT"):
+            self.counters["bytesUploaded"] += int(request.headers.get("content-length") or 0)
+        if response is None:
+            self.counters["failedAttempts"] += 1
+            return
+        self.status_codes[response.status_code] += 1
+        self.counters["bytesDownloaded"] += int(response.headers.get("content-length") or 0)
+        if response.status_code == 429:  # noqa: PLR2004
+            self.counters["rateLimited"] += 1
+        if response.status_code in _RETRYABLE_STATUS or response.status_code >= 500:  # noqa: PLR2004
+            self.counters["failedAttempts"] += 1
+
+    def report(self) -> dict[str, Any]:
+        wall_time = time.perf_counter() - self.started_at
+        files = len(self.file_latencies)
+        return {
+            "wallTimeSecs": round(wall_time, 3),
+            "phasesSecs": {k: round(v, 3) for k, v in self.phases.items()},
+            "operations": {k: {"count": c, "totalSecs": round(t, 3)} for k, (c, t) in self.operations.items()},
+            "apiCalls": dict(self.api_calls.most_common()),
+            "apiCallsTotal": sum(self.api_calls.values()),
+            "apiLatencySecs": {k: percentiles(v) for k, v in self.api_latency.items()},
+            "statusCodes": {str(k): v for k, v in sorted(self.status_codes.items())},
+            "filesPerSec": round(files / wall_time, 3) if wall_time else 0,
+            "fileLatencySecs": percentiles(self.file_latencies),
+            **dict(self.counters),
+        }
+
+    def summary(self) -> str:
+        r = self.report()
+        phases = ", ".join(f"{k} {v:.1f}s" for k, v in r["phasesSecs"].items())
+        return (
+            f"Created {r.get('filesCreated', 0)} files in {r['wallTimeSecs']:.1f}s ({phases}), {r['apiCallsTotal']} API calls, "
+            f"{r.get('rateLimited', 0)} rate limited, {r.get('bytesUploaded', 0) / 1e6:.1f} MB uploaded"
+        )
+
+    async def save(self) -> None:
+        """Save the run report to the default key-value store and show the summary in the status message."""
+
+        try:
+            await Actor.set_value(RUN_REPORT_KEY, self.report())
+            await Actor.set_status_message(self.summary())
+            Actor.log.info("Run report saved to the key-value store as %s: %s", RUN_REPORT_KEY, self.summary())
+        except Exception as e:
+            Actor.log.warning("Failed to save the run report: %s", e)
+
+
+metrics = RunMetrics()
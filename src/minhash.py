@@ -0,0 +1,96 @@
+"""MinHash signatures and LSH of texts, used to find near-duplicate dataset items.
+
+The module uses only the standard library, so that it is imported quickly by the worker processes computing the
+signatures of large datasets.
+"""
+
+from __future__ import annotations
+
+import re
+import zlib
+
+from .constants import MINHASH_BANDS, MINHASH_PERMUTATIONS, MINHASH_SHINGLE_WORDS
+
+_WORD = re.compile(r"\w+")
+_BUCKET_BITS = (MINHASH_PERMUTATIONS - 1).bit_length()
+_VALUE_BITS = 32 - _BUCKET_BITS
+_VALUE_MASK = (1 << _VALUE_BITS) - 1
+_EMPTY = 1 << _VALUE_BITS
+_ROWS = MINHASH_PERMUTATIONS // MINHASH_BANDS
+
+Signature = tuple[int, ...]
+
+
+def shingle_hashes(text: str, k: int = MINHASH_SHINGLE_WORDS) -> set[int]:
+    """Return the 32-bit hashes of the `k`-word shingles of the lowercased text, a short text is a single shingle."""
+
+    words = _WORD.findall(text.lower())
+    if len(words) <= k:
+        return {zlib.crc32(" ".join(words).encode())} if words else set()
+    return {zlib.crc32(" ".join(words[i : i + k]).encode()) for i in range(len(words) - k + 1)}
+
+
+def signature(text: str) -> Signature | None:
+    """Return the MinHash signature of the text, None for a text without any words.
+
+    One permutation hashing: every shingle is hashed once, the top bits of the (mixed) hash select the bucket and the
+    bucket keeps the minimum of the remaining bits. Empty buckets of short texts take the value of the next non-empty
+    bucket, offset by the distance (rotation densification), so that the signatures of two texts stay comparable.
+    """
+
+    if not (hashes := shingle_hashes(text)):
+        return None
+    sig = [_EMPTY] * MINHASH_PERMUTATIONS
+    for x in hashes:
+        # the CRC is linear, the multiplication by the golden ratio mixes its bits before they are split
+        h = (x * 0x9E3779B1) & 0xFFFFFFFF
+        bucket, value = h >> _VALUE_BITS, h & _VALUE_MASK
+        if value < sig[bucket]:
+            sig[bucket] = value
+
+    if _EMPTY in sig:
+        # walk around the buckets twice from the end, so that every empty bucket sees the next non-empty one
+        following, distance = _EMPTY, 0
+        for i in range(2 * MINHASH_PERMUTATIONS - 1, -1, -1):
+            j = i % MINHASH_PERMUTATIONS
+            if sig[j] < _EMPTY:
+                following, distance = sig[j], 0
+                continue
+            distance += 1
+            if i < MINHASH_PERMUTATIONS:
+                sig[j] = following + distance * _EMPTY
+    return tuple(sig)
+
+
+def signatures(texts: list[str]) -> list[Signature | None]:
+    return [signature(t) for t in texts]
+
+
+def similarity(a: Signature, b: Signature) -> float:
+    """Return the estimated Jaccard similarity of the shingles of two texts."""
+    return sum(x == y for x, y in zip(a, b)) / MINHASH_PERMUTATIONS
+
+
+def find_near_duplicates(sigs: list[Signature | None], threshold: float) -> dict[int, tuple[int, float]]:
+    """Return the near-duplicates, by index, with the index of their representative and the estimated similarity.
+
+    The first item of every cluster is its representative. Only the representatives are indexed by the bands of their
+    signatures (LSH), an item is compared with the representatives sharing at least one band with it.
+    """
+
+    tables: list[dict[Signature, list[int]]] = [{} for _ in range(MINHASH_BANDS)]
+    representatives: dict[int, Signature] = {}
+    duplicates: dict[int, tuple[int, float]] = {}
+    for i, sig in enumerate(sigs):
+        if sig is None:
+            continue
+        bands = [sig[b * _ROWS : (b + 1) * _ROWS] for b in range(MINHASH_BANDS)]
+        candidates = {c for table, band in zip(tables, bands) for c in table.get(band, ())}
+        best, rep = max(((similarity(sig, representatives[c]), c) for c in candidates), default=(0.0, -1))
+        if best >= threshold:
+            duplicates[i] = (rep, best)
+            continue
+        representatives[i] = sig
+        for table, band in zip(tables, bands):
+            table.setdefault(band, []).append(i)
+    return duplicates
@@ -0,0 +1,192 @@
+from __future__ import annotations
+
+import json
+import math
+from typing import TYPE_CHECKING, Any
+
+from apify import Actor
+
+from .constants import OPENAI_MAX_FILE_BYTES, OPENAI_SUPPORTED_FILES, PLAN_BYTES_PER_TOKEN, PLAN_KEY, PLAN_SAMPLE_ITEMS
+from .projection import compile_projection
+from .scheduler import DATASETS, KEY_VALUE_STORES
+from .shards import is_coordinator
+from .standby import fail
+from .utils import OPENAI_MAX_FILES, OPENAI_MAX_TOKENS_PER_FILE
+
+if TYPE_CHECKING:
+    import tiktoken
+    from apify_client import ApifyClientAsync
+    from openai import AsyncOpenAI
+
+    from .input_model import OpenaiVectorStoreIntegration as ActorInput
+
+
+class CapacityPlan:
+    """The uploads and deletions planned by a run, estimated before any data is downloaded or uploaded.
+
+    Datasets are estimated from a sample of their first items (bytes and tokens per item times the item count), the
+    key-value stores from the sizes of their records. The plan is compared with the OpenAI limits: the number of files in
+    the vector store, the number of tokens of a dataset and the size of a file.
+    """
+
+    def __init__(self, vector_store: dict[str, Any], deletions: int, *, replace: bool = False) -> None:
+        self.vector_store = vector_store
+        self.deletions = deletions
+        # in the replace mode, old files are deleted during the upload and do not add to the peak number of files
+        self.replace = replace
+        self.sources: list[dict[str, Any]] = []
+        self.violations: list[str] = []
+        self.warnings: list[str] = []
+
+    def add(self, kind: str, source_id: str, files: int, nbytes: int, tokens: int | None = None, items: int | None = None) -> None:
+        self.sources.append({"kind": kind, "sourceId": source_id, "items": items, "files": files, "bytes": nbytes, "tokens": tokens})
+
+    @property
+    def uploads(self) -> int:
+        return sum(s["files"] for s in self.sources)
+
+    @property
+    def peak_files(self) -> int:
+        """The number of files in the vector store after the upload, before the old files are deleted."""
+        return int(self.vector_store["files"]) + self.uploads - (min(self.deletions, self.uploads) if self.replace else 0)
+
+    def check(self) -> list[str]:
+        """Compare the plan with the limits and return the violations, which make the run fail."""
+
+        if self.peak_files > OPENAI_MAX_FILES:
+            self.violations.append(
+                f"The vector store would contain {self.peak_files} files ({self.vector_store['files']} existing and {self.uploads} new), "
+                f"OpenAI allows at most {OPENAI_MAX_FILES} files in a vector store. Delete some files or use `replaceFilesOneByOne`."
+            )
+        for s in self.sources:
+            if s["tokens"] and s["tokens"] > OPENAI_MAX_TOKENS_PER_FILE * OPENAI_MAX_FILES:
+                self.violations.append(
+                    f"The dataset {s['sourceId']} has about {s['tokens']} tokens, more than OpenAI allows in {OPENAI_MAX_FILES} files"
+                )
+            elif s["kind"] == DATASETS and s["files"] == 1 and s["bytes"] > OPENAI_MAX_FILE_BYTES:
+                self.violations.append(f"The dataset {s['sourceId']} has about {s['bytes'] / 1e6:.0f} MB, more than OpenAI allows in one file")
+            elif s["kind"] == DATASETS and s["tokens"] is None and s["bytes"] / PLAN_BYTES_PER_TOKEN > OPENAI_MAX_TOKENS_PER_FILE:
+                self.warnings.append(f"The dataset {s['sourceId']} may exceed {OPENAI_MAX_TOKENS_PER_FILE} tokens, provide `assistantId` to split it")
+        return self.violations
+
+    def record(self) -> dict[str, Any]:
+        return {
+            "vectorStore": self.vector_store,
+            "uploads": self.uploads,
+            "deletions": self.deletions,
+            "bytes": sum(s["bytes"] for s in self.sources),
+            "tokens": sum(s["tokens"] or 0 for s in self.sources),
+            "peakFiles": self.peak_files,
+            "sources": self.sources,
+            "violations": self.violations,
+            "warnings": self.warnings,
+        }
+
+
+async def plan_dataset(
+    aclient_apify: ApifyClientAsync,
+    actor_input: ActorInput,
+    dataset_id: str,
+    encoding: tiktoken.core.Encoding | None,
+    only: set[int | str] | None = None,
+) -> tuple[int, int, int | None, int]:
+    """Estimate the files, bytes and tokens of a dataset from a sample of its first items, return them with the item count.
+
+    Without the `encoding` (no assistant) the tokens are not estimated and the dataset is uploaded as one file.
+    """
+
+    dataset = aclient_apify.dataset(dataset_id)
+    info = await dataset.get()
+    items = (info or {}).get("itemCount", 0)
+    sample: list = (await dataset.list_items(clean=True, limit=PLAN_SAMPLE_ITEMS)).items if items else []
+    if actor_input.datasetFields:
+        sample = compile_projection(actor_input.datasetFields)(sample)
+    if not sample:
+        return 0, 0, 0 if encoding else None, items
+
+    serialized = json.dumps(sample)
+    nbytes = len(serialized.encode("utf-8")) * items // len(sample)
+    tokens = len(encoding.encode(serialized)) * items // len(sample) if encoding else None
+    files = max(1, math.ceil(tokens / OPENAI_MAX_TOKENS_PER_FILE)) if tokens else 1
+    if only is not None:
+        # the files deferred by the previous run
+        nbytes, tokens, files = nbytes * len(only) // files, tokens and tokens * len(only) // files, len(only)
+    return files, nbytes, tokens, items
+
+
+async def plan_key_value_store(aclient_apify: ApifyClientAsync, key_value_store_id: str, only: set[str] | None = None) -> tuple[int, int, int]:
+    """Return the number of supported records, their bytes and the number of records too large for OpenAI."""
+
+    kv_store = aclient_apify.key_value_store(key_value_store_id)
+    files, nbytes, too_large = 0, 0, 0
+    exclusive_start_key = None
+    while keys := await kv_store.list_keys(exclusive_start_key=exclusive_start_key):
+        for item in keys.get("items", []):
+            key = item.get("key")
+            if (only is None or key in only) and f".{key.split('.')[-1]}" in OPENAI_SUPPORTED_FILES:
+                files, nbytes = files + 1, nbytes + (item.get("size") or 0)
+                too_large += (item.get("size") or 0) > OPENAI_MAX_FILE_BYTES
+        if not (exclusive_start_key := keys.get("nextExclusiveStartKey", None)):
+            break
+    return files, nbytes, too_large
+
+
+async def plan_run(
+    client: AsyncOpenAI,
+    aclient_apify: ApifyClientAsync,
+    actor_input: ActorInput,
+    encoding: tiktoken.core.Encoding | None,
+    sources: dict[str, dict[str, set | None]],
+    deletions: int,
+) -> CapacityPlan:
+    """Plan the uploads of the sources (by kind and source ID, with the items to process) and the deletions of the run."""
+
+    vs = await client.beta.vector_stores.retrieve(actor_input.vectorStoreId)
+    vector_store = {"id": vs.id, "files": vs.file_counts.total, "usageBytes": vs.usage_bytes}
+    plan = CapacityPlan(vector_store, deletions, replace=bool(actor_input.replaceFilesOneByOne and actor_input.filePrefix))
+
+    for dataset_id, only in sources[DATASETS].items():
+        files, nbytes, tokens, items = await plan_dataset(aclient_apify, actor_input, dataset_id, encoding, only)
+        plan.add(DATASETS, dataset_id, files, nbytes, tokens, items)
+    for key_value_store_id, only in sources[KEY_VALUE_STORES].items():
+        files, nbytes, too_large = await plan_key_value_store(aclient_apify, key_value_store_id, only)
+        plan.add(KEY_VALUE_STORES, key_value_store_id, files, nbytes)
+        if too_large:
+            plan.warnings.append(f"{too_large} records of the key-value store {key_value_store_id} are larger than OpenAI allows and will fail")
+
+    # every shard of a dataset is uploaded as separate files
+    shards = (actor_input.shards or 1) if is_coordinator(actor_input) else 1
+    for s in plan.sources:
+        if s["kind"] == DATASETS and s["items"]:
+            s["files"] = max(s["files"], shards)
+    plan.check()
+    return plan
+
+
+async def preflight(plan: CapacityPlan, *, dry_run: bool) -> bool:
+    """Report the plan and return whether the run continues.
+
+    The plan is saved in the default key-value store. In the dry run, the run stops after the plan is saved. Otherwise, the
+    run fails before anything is uploaded or deleted when the plan violates the OpenAI limits.
+    """
+
+    record = plan.record()
+    Actor.log.info(
+        "Plan: %d files to upload (%.1f MB, ~%d tokens), %d files to delete, %d files in the vector store at the peak",
+        record["uploads"],
+        record["bytes"] / 1e6,
+        record["tokens"],
+        record["deletions"],
+        record["peakFiles"],
+    )
+    for warning in plan.warnings:
+        Actor.log.warning(warning)
+    await Actor.set_value(PLAN_KEY, record)
+
+    if dry_run:
+        Actor.log.info("Dry run, nothing is uploaded or deleted. The plan is saved in the %s record of the key-value store", PLAN_KEY)
+        return False
+    if plan.violations:
+        await fail("The run would exceed the OpenAI limits, nothing was uploaded or deleted. " + " ".join(plan.violations))
+        return False
+    return True
@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+import asyncio
+import heapq
+import itertools
+from collections import Counter, defaultdict
+from typing import TYPE_CHECKING, Any, TypeVar
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable, Iterable
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+
+class UploadPool:
+    """Limit the number of concurrent uploads and the bytes they hold in memory.
+
+    A single pool is shared by all datasets and key-value stores processed in one run, so the total number of in-flight
+    OpenAI requests stays bounded no matter how many sources are ingested in parallel.
+
+    Waiting tasks start in the order of their `priority` (lower first), tasks with the same priority in the order they
+    were submitted. The pool can be resized while running (see `ResourceGovernor`). A task declaring `nbytes` waits until
+    the bytes fit into `max_buffered_bytes`, a single task always runs even when it is larger than the budget.
+
+    Tasks run in lanes, `lane_shares` limits a lane to a share of the pool (e.g. large transfers to a half), so that
+    a lane waiting for its share does not block the tasks of other lanes.
+    """
+
+    def __init__(self, max_concurrency: int, max_buffered_bytes: int | None = None, lane_shares: dict[str, float] | None = None) -> None:
+        self.max_concurrency = max(1, max_concurrency)
+        self.limit = self.max_concurrency
+        self.max_buffered_bytes = max_buffered_bytes
+        self.lane_shares = lane_shares or {}
+        self.running = 0
+        self.buffered_bytes = 0
+        self.lane_running: Counter[str] = Counter()
+        self._waiting: dict[str, list[tuple[Any, int, int, asyncio.Future]]] = defaultdict(list)
+        self._counter = itertools.count()
+
+    def _can_start(self, nbytes: int, lane: str) -> bool:
+        if self.running >= self.limit:
+            return False
+        if lane in self.lane_shares and self.lane_running[lane] >= max(1, int(self.limit * self.lane_shares[lane])):
+            return False
+        return self.max_buffered_bytes is None or self.buffered_bytes == 0 or self.buffered_bytes + nbytes <= self.max_buffered_bytes
+
+    def _wake(self) -> None:
+        """Start waiting tasks in the priority order while they fit into the pool, lanes which are full are skipped."""
+        while True:
+            startable = [(waiting[0], lane) for lane, waiting in self._waiting.items() if waiting and self._can_start(waiting[0][2], lane)]
+            if not startable:
+                return
+            _, lane = min(startable)
+            _, _, nbytes, future = heapq.heappop(self._waiting[lane])
+            if not future.done():
+                self.running += 1
+                self.lane_running[lane] += 1
+                self.buffered_bytes += nbytes
+                future.set_result(None)
+
+    def _release(self, nbytes: int, lane: str) -> None:
+        self.running -= 1
+        self.lane_running[lane] -= 1
+        self.buffered_bytes -= nbytes
+        self._wake()
+
+    async def resize(self, limit: int, max_buffered_bytes: int | None = None) -> None:
+        """Change the number of concurrent tasks (at most `max_concurrency`) and the budget of buffered bytes.
+
+        Running tasks are not interrupted, when the pool shrinks, new tasks wait until enough running tasks finish.
+        """
+        self.limit = min(max(1, limit), self.max_concurrency)
+        self.max_buffered_bytes = max_buffered_bytes
+        self._wake()
+
+    async def acquire(self, nbytes: int = 0, priority: Any = 0, lane: str = "") -> None:
+        """Wait for a slot in the pool (and in the `lane`) and until `nbytes` fit into the budget, see `release`."""
+        future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiting[lane], (priority, next(self._counter), nbytes, future))
+        # wake up on the next iteration of the loop, so that all tasks submitted together are ordered by their priority
+        future.get_loop().call_soon(self._wake)
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                self._release(nbytes, lane)
+            raise
+
+    def release(self, nbytes: int = 0, lane: str = "") -> None:
+        """Release the slot taken by `acquire` with the same `nbytes` and `lane`."""
+        self._release(nbytes, lane)
+
+    async def run(self, fn: Callable[..., Awaitable[R]], *args: Any, nbytes: int = 0, priority: Any = 0, lane: str = "") -> R:
+        """Run `fn(*args)` once a slot in the pool (and in the `lane`) is available and `nbytes` fit into the budget."""
+        await self.acquire(nbytes, priority, lane)
+        try:
+            return await fn(*args)
+        finally:
+            self.release(nbytes, lane)
+
+    async def map(
+        self,
+        fn: Callable[[T], Awaitable[R]],
+        items: Iterable[T],
+        size: Callable[[T], int] | None = None,
+        priority: Callable[[T], Any] | None = None,
+        lane: Callable[[T], str] | None = None,
+    ) -> list[R]:
+        """Run `fn` for every item concurrently (bounded by the pool) and return the results in the input order.
+
+        `size` returns the number of bytes an item holds in memory while it is processed, when known upfront.
+        `priority` orders the items waiting for the pool, lower first, `lane` assigns the item to a lane.
+        """
+        return await asyncio.gather(
+            *(
+                self.run(fn, item, nbytes=size(item) if size else 0, priority=priority(item) if priority else 0, lane=lane(item) if lane else "")
+                for item in items
+            )
+        )
@@ -0,0 +1,143 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, Any
+
+from apify import Actor
+
+from .constants import (
+    PROFILE_CPU_KEY,
+    PROFILE_MEMORY_KEY,
+    PROFILE_MEMORY_TOP_ALLOCATORS,
+    PROFILE_SAMPLING_INTERVAL_SECS,
+    PROFILE_SAVE_INTERVAL_SECS,
+    PROFILE_SNAPSHOT_MIN_INTERVAL_SECS,
+)
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+    from types import FrameType
+
+
+def folded_stack(frame: FrameType | None) -> str:
+    """Return the stack in the folded format used by flame graph tools (outermost frame first)."""
+
+    stack = []
+    while frame is not None:
+        code = frame.f_code
+        stack.append(f"{code.co_name} ({code.co_filename.rsplit('/', 1)[-1]}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(stack))
+
+
+class Profiler:
+    """Sampling CPU profiler and memory snapshots of a run.
+
+    A background thread samples the stack of the main thread (the event loop) and counts the folded stacks.
+    Memory is traced by `tracemalloc`, snapshots of the top allocators are taken periodically and at the labelled
+    places of the pipeline (e.g. after `list_items`). The profile is saved to the default key-value store periodically,
+    so that it is available even when the run runs out of memory.
+    """
+
+    def __init__(self, interval: float = PROFILE_SAMPLING_INTERVAL_SECS) -> None:
+        self.interval = interval
+        self.samples: Counter[str] = Counter()
+        self.snapshots: list[dict[str, Any]] = []
+        self._last_snapshot: dict[str, float] = {}
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+        self._main_thread_id = threading.main_thread().ident or 0
+
+    def start(self) -> None:
+        tracemalloc.start()
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.snapshot("end", force=True)
+        tracemalloc.stop()
+
+    def _sample(self) -> None:
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self._main_thread_id)  # noqa: SLF001
+            self.samples[folded_stack(frame)] += 1
+
+    def snapshot(self, label: str, *, force: bool = False) -> None:
+        """Record the top memory allocators, snapshots with the same label are taken at most once in a while."""
+
+        now = time.monotonic()
+        if not tracemalloc.is_tracing() or (not force and now - self._last_snapshot.get(label, 0) < PROFILE_SNAPSHOT_MIN_INTERVAL_SECS):
+            return
+        self._last_snapshot[label] = now
+
+        current, peak = tracemalloc.get_traced_memory()
+        stats = tracemalloc.take_snapshot().statistics("lineno")[:PROFILE_MEMORY_TOP_ALLOCATORS]
+        self.snapshots.append(
+            {
+                "label": label,
+                "time": round(time.time(), 3),
+                "tracedCurrentMB": round(current / 2**20, 2),
+                "tracedPeakMB": round(peak / 2**20, 2),
+                "maxRssMB": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 2),
+                "topAllocators": [{"location": str(s.traceback), "sizeKB": round(s.size / 1024, 1), "count": s.count} for s in stats],
+            }
+        )
+
+    def folded(self) -> str:
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common())
+
+    async def save(self) -> None:
+        try:
+            await Actor.set_value(PROFILE_CPU_KEY, self.folded(), content_type="text/plain")
+            await Actor.set_value(PROFILE_MEMORY_KEY, self.snapshots)
+        except Exception as e:
+            Actor.log.warning("Failed to save the profile: %s", e)
+
+
+profiler: Profiler | None = None
+
+
+def snapshot(label: str) -> None:
+    """Take a memory snapshot when the profiling is enabled, no-op otherwise."""
+    if profiler:
+        profiler.snapshot(label)
+
+
+@asynccontextmanager
+async def profile(enabled: bool) -> AsyncIterator[None]:  # noqa: FBT001
+    """Profile the wrapped code when `enabled`, save the CPU profile and memory snapshots to the key-value store."""
+
+    global profiler  # noqa: PLW0603
+    if not enabled:
+        yield
+        return
+
+    Actor.log.info("Profiling enabled, the profile is saved as %s and %s in the key-value store", PROFILE_CPU_KEY, PROFILE_MEMORY_KEY)
+    profiler = Profiler()
+    profiler.start()
+
+    async def save_periodically(p: Profiler) -> None:
+        while True:
+            await asyncio.sleep(PROFILE_SAVE_INTERVAL_SECS)
+            p.snapshot("periodic")
+            await p.save()
+
+    task = asyncio.create_task(save_periodically(profiler))
+    try:
+        yield
+    finally:
+        task.cancel()
+        with contextlib.suppress(asyncio.CancelledError):
+            await task
+        profiler.stop()
+        await profiler.save()
+        profiler = None
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterable
+
+MISSING: Any = object()
+WILDCARD = "*"
+
+
+def is_empty(value: Any) -> bool:
+    """Missing value, None, empty string or empty container."""
+    return value is MISSING or value is None or (not value and isinstance(value, (str, list, dict)))
+
+
+def _step(key: str) -> Callable[[Any], Any]:
+    index = int(key) if key.lstrip("-").isdigit() else None
+
+    def get(value: Any) -> Any:
+        if isinstance(value, dict):
+            return value.get(key, MISSING)
+        if index is not None and isinstance(value, list) and -len(value) <= index < len(value):
+            return value[index]
+        return MISSING
+
+    return get
+
+
+@lru_cache(maxsize=256)
+def compile_field_path(path: str) -> Callable[[Any], Any]:
+    """Compile a dotted field path into an accessor function, the path is parsed only once.
+
+    The path can index into lists (`metadata.headers.0`) and contain wildcards (`items.*.url`), which return a list of all
+    matching values. The accessor returns `MISSING` when the value does not exist.
+
+    Example:
+      >>> compile_field_path("a.1.b")({"a": [{"b": 1}, {"b": 2}]})
+      2
+      >>> compile_field_path("a.*.b")({"a": [{"b": 1}, {"c": 2}, {"b": 3}]})
+      [1, 3]
+    """
+
+    keys = path.split(".")
+    if WILDCARD in keys:
+        i = keys.index(WILDCARD)
+        head = compile_field_path(".".join(keys[:i])) if i else None
+        tail = compile_field_path(".".join(keys[i + 1 :])) if i + 1 < len(keys) else None
+
+        def get_all(item: Any) -> Any:
+            value = head(item) if head else item
+            if isinstance(value, dict):
+                value = list(value.values())
+            elif not isinstance(value, list):
+                return MISSING
+            values = [tail(v) for v in value] if tail else value
+            return [v for v in values if v is not MISSING] or MISSING
+
+        return get_all
+
+    if len(keys) == 1 and not keys[0].lstrip("-").isdigit():
+        key = keys[0]
+        return lambda item: item.get(key, MISSING) if isinstance(item, dict) else MISSING
+
+    steps = tuple(_step(k) for k in keys)
+
+    def get(item: Any) -> Any:
+        value = item
+        for step in steps:
+            if (value := step(value)) is MISSING:
+                break
+        return value
+
+    return get
+
+
+def compile_projection(fields: Iterable[str]) -> Callable[[Iterable[dict]], list[dict]]:
+    """Compile `datasetFields` into a function projecting a whole page of dataset items.
+
+    Every item is converted to a dict with all the field paths as keys, so that all items share the same keys, missing
+    values are None. Items in which all the fields are empty are dropped.
+    """
+
+    accessors = tuple((field, compile_field_path(field)) for field in fields)
+
+    def project(items: Iterable[dict]) -> list[dict]:
+        projected: list[dict] = []
+        append = projected.append
+        for item in items:
+            d: dict[str, Any] = {}
+            empty = True
+            for field, get in accessors:
+                if (value := get(item)) is MISSING:
+                    d[field] = None
+                else:
+                    d[field] = value
+                    empty = empty and is_empty(value)
+            if not empty:
+                append(d)
+        return projected
+
+    return project
@@ -0,0 +1,64 @@
+from __future__ import annotations
+
+import sys
+from typing import TYPE_CHECKING
+
+if TYPE_CHECKING:
+    from openai.types import FileDeleted
+    from openai.types.beta.vector_stores import VectorStoreFile, VectorStoreFileDeleted
+    from openai.types.file_object import FileObject
+
+
+class FileRecord:
+    """The fields of an OpenAI file used by the run, held instead of the `FileObject` returned by the OpenAI SDK.
+
+    The pydantic models keep every field of the API response together with their own bookkeeping, which adds up to hundreds
+    of MB when listing the files of an organization with 100k files. A slotted record keeps only the id, the name, the size
+    and the creation time.
+    """
+
+    __slots__ = ("bytes", "created_at", "filename", "id")
+
+    def __init__(self, file_id: str, filename: str, nbytes: int = 0, created_at: int = 0) -> None:
+        self.id = file_id
+        self.filename = filename
+        self.bytes = nbytes
+        self.created_at = created_at
+
+    @classmethod
+    def from_file(cls, file: FileObject) -> FileRecord:
+        return cls(file.id, file.filename, file.bytes, file.created_at)
+
+    def __repr__(self) -> str:
+        return f"FileRecord(id={self.id!r}, filename={self.filename!r})"
+
+
+class VectorStoreFileRecord:
+    """The fields of a vector store file used by the run, held instead of the `VectorStoreFile` of the OpenAI SDK."""
+
+    __slots__ = ("created_at", "id", "status", "usage_bytes")
+
+    def __init__(self, file_id: str, status: str, usage_bytes: int = 0, created_at: int = 0) -> None:
+        self.id = file_id
+        # the statuses are few, every record refers to the same string
+        self.status = sys.intern(status)
+        self.usage_bytes = usage_bytes
+        self.created_at = created_at
+
+    @classmethod
+    def from_file(cls, file: VectorStoreFile) -> VectorStoreFileRecord:
+        return cls(file.id, file.status, file.usage_bytes, file.created_at)
+
+
+class DeletedRecord:
+    """The result of deleting a file or removing it from the vector store."""
+
+    __slots__ = ("deleted", "id")
+
+    def __init__(self, file_id: str, *, deleted: bool) -> None:
+        self.id = file_id
+        self.deleted = deleted
+
+    @classmethod
+    def from_deleted(cls, deleted: FileDeleted | VectorStoreFileDeleted) -> DeletedRecord:
+        return cls(deleted.id, deleted=deleted.deleted)
@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+import asyncio
+from collections import defaultdict
+from typing import TYPE_CHECKING
+
+from apify import Actor
+
+from .pool import UploadPool
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+
+class FileReplacer:
+    """Replace old files one by one, as soon as the new version of a file is attached to the vector store.
+
+    Every new file replaces the old files with the same name, i.e. the files of the same source (dataset or key-value store
+    ID) with the same batch index or record key. The replacement is per batch, not per document: when the number of batches
+    of a dataset changes, the batch with the same index may contain other items. The old file is removed from the vector
+    store and deleted from OpenAI in the background, so the cleanup runs together with the upload. Old files that were not
+    replaced (e.g. the files of another dataset) are returned by `remaining` and are expected to be deleted at the end of the run.
+    """
+
+    def __init__(self, old_files: dict[str, str], delete: Callable[[list[str]], Awaitable[object]], max_concurrency: int = 1) -> None:
+        self.replaced: list[str] = []
+        self._delete = delete
+        self._pool = UploadPool(max_concurrency)
+        self._tasks: set[asyncio.Task] = set()
+        self._by_name: dict[str, list[str]] = defaultdict(list)
+        self._remaining = dict(old_files)
+        for file_id, filename in old_files.items():
+            if filename:
+                self._by_name[filename].append(file_id)
+
+    @property
+    def remaining(self) -> list[str]:
+        """Old files that have not been replaced (yet)."""
+        return list(self._remaining)
+
+    def replace(self, filename: str) -> None:
+        """Schedule the deletion of the predecessors of the newly attached file `filename`."""
+
+        for file_id in self._by_name.pop(filename, []):
+            if file_id in self._remaining:
+                Actor.log.info("Replacing file %s (%s) with its new version", self._remaining.pop(file_id), file_id)
+                self.replaced.append(file_id)
+                task = asyncio.create_task(self._pool.run(self._delete, [file_id]))
+                self._tasks.add(task)
+                task.add_done_callback(self._tasks.discard)
+
+    async def wait(self) -> None:
+        """Wait until all scheduled deletions are finished."""
+        await asyncio.gather(*self._tasks)
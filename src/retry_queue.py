@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any
+
+from apify import Actor
+
+from .constants import RETRY_MAX_ATTEMPTS, RETRY_MAX_PERMANENT_FAILURES, RETRY_QUEUE_KEY_PREFIX
+from .metrics import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+    from openai.types.beta.vector_stores import VectorStoreFile
+
+    # called with the cause of the failure and whether it is permanent
+    OnFailure = Callable[[str, bool], None]
+
+# attachment errors which do not go away by retrying (e.g. a PDF which contains only images)
+PERMANENT_ATTACH_ERRORS = ("unsupported_file", "invalid_file")
+_RETRYABLE_STATUS = (408, 409, 429)
+
+
+def retry_queue_key(vector_store_id: str) -> str:
+    return f"{RETRY_QUEUE_KEY_PREFIX}{vector_store_id}"
+
+
+def classify_error(error: BaseException) -> tuple[str, bool]:
+    """Return the cause of the failure and whether it is permanent.
+
+    Timeouts, connection errors, rate limits and server errors are transient, other API errors (e.g. a file that is too
+    large) are permanent. Unknown errors are considered transient.
+    """
+
+    import openai
+
+    cause = f"{type(error).__name__}: {error}"
+    if isinstance(error, openai.APIStatusError):
+        return cause, error.status_code < 500 and error.status_code not in _RETRYABLE_STATUS  # noqa: PLR2004
+    return cause, False
+
+
+def classify_attach_error(file_vs: VectorStoreFile) -> tuple[str, bool]:
+    """Return the cause of the failed attachment to the vector store and whether it is permanent."""
+
+    if file_vs.last_error:
+        return f"{file_vs.last_error.code}: {file_vs.last_error.message}", file_vs.last_error.code in PERMANENT_ATTACH_ERRORS
+    return f"status: {file_vs.status}", False
+
+
+class RetryQueue:
+    """Files which failed to be created or attached, with the cause of the failure.
+
+    Transient failures are retried with a backoff at the end of the run, those which still fail are deferred to the next
+    run (see `DeadlineScheduler`). A file which failed `RETRY_MAX_ATTEMPTS` times (across runs) and permanent failures,
+    such as PDFs containing only images, are not retried. The queue is saved to the named key-value store, so that the
+    causes and the number of attempts are known to the next run. The contents of the failed files can be kept in memory
+    for the retries of this run, so that their source is not downloaded and processed again.
+    """
+
+    def __init__(self, transient: list[dict] | None = None, permanent: list[dict] | None = None) -> None:
+        self.previous = {self.key(e["kind"], e["sourceId"], e["item"]): e for e in transient or []}
+        self.permanent = permanent or []
+        self.failed: dict[tuple[str, str, Any], dict] = {}
+        self.contents: dict[tuple[str, str, Any], tuple[str, bytes]] = {}
+
+    @staticmethod
+    def key(kind: str, source_id: str, item: int | str) -> tuple[str, str, Any]:
+        return kind, source_id, item
+
+    def add(self, kind: str, source_id: str, item: int | str, filename: str, cause: str, *, permanent: bool) -> None:
+        """Record a failed file, the attempts of a file which failed in the previous run are counted."""
+
+        key = self.key(kind, source_id, item)
+        previous = self.failed.get(key) or self.previous.get(key) or {}
+        entry = {"kind": kind, "sourceId": source_id, "item": item, "filename": filename, "cause": cause, "attempts": previous.get("attempts", 0) + 1}
+        if not permanent and entry["attempts"] >= RETRY_MAX_ATTEMPTS:
+            permanent, entry["cause"] = True, f"{cause} (gave up after {entry['attempts']} attempts)"
+        self.failed.pop(key, None)
+        if permanent:
+            self.contents.pop(key, None)
+            Actor.log.error("File %s failed permanently and will not be retried: %s", filename, entry["cause"])
+            metrics.increment("filesFailedPermanently")
+            self.permanent.append(entry)
+        else:
+            Actor.log.warning("File %s failed (attempt %d) and will be retried: %s", filename, entry["attempts"], cause)
+            self.failed[key] = entry
+
+    def on_failure(self, kind: str, source_id: str, item: int | str, filename: str) -> OnFailure:
+        return lambda cause, permanent: self.add(kind, source_id, item, filename, cause, permanent=permanent)
+
+    def succeeded(self, kind: str, source_id: str, item: int | str) -> None:
+        self.failed.pop(self.key(kind, source_id, item), None)
+        self.contents.pop(self.key(kind, source_id, item), None)
+
+    def keep(self, kind: str, source_id: str, item: int | str, filename: str, content: bytes) -> None:
+        """Keep the content of a file which failed transiently for the retries of this run."""
+
+        if (key := self.key(kind, source_id, item)) in self.failed:
+            self.contents[key] = (filename, content)
+
+    def kept(self, kind: str, source_id: str, items: set) -> dict[Any, tuple[str, bytes]] | None:
+        """Return the filenames and contents of the items, None unless the contents of all items are kept."""
+
+        keys = [self.key(kind, source_id, item) for item in items]
+        if not keys or any(key not in self.contents for key in keys):
+            return None
+        return {key[2]: self.contents.pop(key) for key in keys}
+
+    def transient(self) -> dict[str, dict[str, list]]:
+        """Return the items of the transient failures by kind and source ID."""
+
+        items: dict[str, dict[str, list]] = {}
+        for kind, source_id, item in self.failed:
+            items.setdefault(kind, {}).setdefault(source_id, []).append(item)
+        return items
+
+    def record(self) -> dict[str, list[dict]]:
+        return {"transient": list(self.failed.values()), "permanent": self.permanent[-RETRY_MAX_PERMANENT_FAILURES:]}
+
+    @classmethod
+    async def load(cls, store_name: str, vector_store_id: str) -> RetryQueue:
+        """Load the queue saved by the previous run from the named key-value store."""
+
+        try:
+            store = await Actor.open_key_value_store(name=store_name)
+            if record := await store.get_value(retry_queue_key(vector_store_id)):
+                return cls(record.get("transient"), record.get("permanent"))
+        except Exception as e:
+            Actor.log.warning("Failed to load the retry queue from the key-value store %s: %s", store_name, e)
+        return cls()
+
+    async def save(self, store_name: str, vector_store_id: str) -> None:
+        """Save the queue to the named key-value store, the record is deleted when there are no failures."""
+
+        record = self.record()
+        try:
+            store = await Actor.open_key_value_store(name=store_name)
+            await store.set_value(retry_queue_key(vector_store_id), record if record["transient"] or record["permanent"] else None)
+        except Exception as e:
+            Actor.log.warning("Failed to save the retry queue to the key-value store %s: %s", store_name, e)
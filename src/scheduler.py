@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import datetime, timezone
+from typing import Any
+
+from apify import Actor
+
+from .constants import (
+    DEADLINE_CLEANUP_MARGIN_SECS,
+    DEADLINE_DEFAULT_FILE_SECS,
+    DEADLINE_DELETE_FILE_SECS,
+    DEADLINE_EWMA_ALPHA,
+    PENDING_WORK_KEY_PREFIX,
+)
+
+DATASETS = "datasets"
+KEY_VALUE_STORES = "keyValueStores"
+
+
+def pending_work_key(vector_store_id: str) -> str:
+    return f"{PENDING_WORK_KEY_PREFIX}{vector_store_id}"
+
+
+class DeadlineScheduler:
+    """Fit the ingestion into the run timeout.
+
+    A new file is started only when its estimated duration fits before the deadline, minus the time reserved for the
+    cleanup (deleting the old files). The duration is estimated from the observed files, scaled by the size of the file.
+    Files which do not fit are deferred, the deferred work and the files created so far are saved to the named
+    key-value store and the next run with the same vector store resumes the work.
+
+    Without a deadline (e.g. when running locally without a timeout), all files are started.
+    """
+
+    def __init__(self, timeout_at: datetime | None, cleanup_files: int = 0) -> None:
+        self.timeout_at = timeout_at
+        self.cleanup_files = cleanup_files
+        self.file_secs = DEADLINE_DEFAULT_FILE_SECS
+        self.file_bytes = 0.0
+        self.observed = 0
+        self.deferred: dict[str, dict[str, list]] = {DATASETS: defaultdict(list), KEY_VALUE_STORES: defaultdict(list)}
+        self.created: dict[str, dict[str, list[str]]] = {DATASETS: defaultdict(list), KEY_VALUE_STORES: defaultdict(list)}
+
+    @property
+    def stopped_early(self) -> bool:
+        return any(items for source in self.deferred.values() for items in source.values())
+
+    def remaining_secs(self) -> float:
+        if self.timeout_at is None:
+            return float("inf")
+        return (self.timeout_at - datetime.now(timezone.utc)).total_seconds()
+
+    def cleanup_secs(self) -> float:
+        return DEADLINE_CLEANUP_MARGIN_SECS + self.cleanup_files * DEADLINE_DELETE_FILE_SECS
+
+    def estimate(self, nbytes: int = 0) -> float:
+        """Estimate the duration of uploading and attaching a file of `nbytes`."""
+        if self.file_bytes and nbytes > self.file_bytes:
+            return self.file_secs * nbytes / self.file_bytes
+        return self.file_secs
+
+    def observe(self, secs: float, nbytes: int) -> None:
+        """Update the estimates with a finished file (exponentially weighted average)."""
+        alpha = DEADLINE_EWMA_ALPHA if self.observed else 1.0
+        self.file_secs += alpha * (secs - self.file_secs)
+        self.file_bytes += alpha * (nbytes - self.file_bytes)
+        self.observed += 1
+
+    def can_start(self, nbytes: int = 0) -> bool:
+        return self.remaining_secs() - self.cleanup_secs() > self.estimate(nbytes)
+
+    def defer(self, kind: str, source_id: str, item: int | str) -> None:
+        self.deferred[kind][source_id].append(item)
+
+    def add_created(self, kind: str, source_id: str, file_ids: list[str]) -> None:
+        self.created[kind][source_id].extend(file_ids)
+
+    def resume(self, resumed: dict[str, dict[str, dict]]) -> None:
+        """Take over the files created for the sources resumed from a previous run, they are kept if the work is deferred again."""
+        for kind, sources in resumed.items():
+            for source_id, work in sources.items():
+                Actor.log.info("Resuming %d files deferred by the previous run from %s: %s", len(work["pending"]), kind, source_id)
+                self.add_created(kind, source_id, work["created"])
+
+    def pending_work(self, file_prefix: str | None, delete_file_ids: list[str]) -> dict[str, Any]:
+        """Return the record of the deferred work, the files created for the deferred sources are kept by the next run."""
+
+        work: dict[str, Any] = {"filePrefix": file_prefix or "", "deleteFileIds": delete_file_ids, DATASETS: {}, KEY_VALUE_STORES: {}}
+        for kind, sources in self.deferred.items():
+            for source_id, items in sources.items():
+                if items:
+                    work[kind][source_id] = {"pending": sorted(items), "created": self.created[kind][source_id]}
+        return work
+
+
+async def load_pending_work(store_name: str, vector_store_id: str) -> dict[str, Any] | None:
+    """Load the work deferred by a previous run from the named key-value store."""
+
+    try:
+        store = await Actor.open_key_value_store(name=store_name)
+        if work := await store.get_value(pending_work_key(vector_store_id)):
+            return dict(work)
+    except Exception as e:
+        Actor.log.warning("Failed to load the pending work from the key-value store %s: %s", store_name, e)
+    return None
+
+
+async def save_pending_work(store_name: str, vector_store_id: str, work: dict[str, Any] | None) -> None:
+    """Save the deferred work to the named key-value store, the record is deleted when `work` is None."""
+
+    try:
+        store = await Actor.open_key_value_store(name=store_name)
+        await store.set_value(pending_work_key(vector_store_id), work)
+    except Exception as e:
+        Actor.log.warning("Failed to save the pending work to the key-value store %s: %s", store_name, e)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import time
+from typing import TYPE_CHECKING
+
+from apify import Actor
+
+from .clients import HttpPools, create_apify_client, create_openai_client
+from .constants import STANDBY_INVENTORY_TTL_SECS, STANDBY_MAX_CLIENTS
+
+if TYPE_CHECKING:
+    from apify_client import ApifyClientAsync
+    from openai import AsyncOpenAI
+
+    from .input_model import OpenaiVectorStoreIntegration as ActorInput
+    from .records import FileRecord
+
+
+class FileInventory:
+    """Files of the vector stores found by the `filePrefix`, kept between the jobs of a standby run.
+
+    Listing the files by the prefix pages through all OpenAI files of the organization, so the inventory is updated with
+    the files created and deleted by every job and listed again only when it is older than `ttl_secs` (it may miss
+    changes made by others in the meantime).
+    """
+
+    def __init__(self, ttl_secs: float = STANDBY_INVENTORY_TTL_SECS) -> None:
+        self.ttl_secs = ttl_secs
+        self._files: dict[tuple[str, str], tuple[float, dict[str, str]]] = {}
+
+    def get(self, vector_store_id: str, file_prefix: str) -> dict[str, str] | None:
+        """Return the mapping of file id to filename, None when the files are not known or are out of date."""
+
+        if (entry := self._files.get((vector_store_id, file_prefix))) is None or time.monotonic() - entry[0] > self.ttl_secs:
+            return None
+        Actor.log.info("Using %d files with the prefix %s from the inventory of the previous jobs", len(entry[1]), file_prefix)
+        return dict(entry[1])
+
+    def put(self, vector_store_id: str, file_prefix: str, files: dict[str, str]) -> None:
+        self._files[(vector_store_id, file_prefix)] = (time.monotonic(), dict(files))
+
+    def update(self, vector_store_id: str, file_prefix: str | None, created: list[FileRecord], deleted: list[str]) -> None:
+        """Add the files created and remove the files deleted by a job, the age of the inventory does not change."""
+
+        if not file_prefix or (entry := self._files.get((vector_store_id, file_prefix))) is None:
+            return
+        removed = set(deleted)
+        files = {k: v for k, v in entry[1].items() if k not in removed}
+        files.update({f.id: f.filename for f in created if f.filename.startswith(file_prefix)})
+        self._files[(vector_store_id, file_prefix)] = (entry[0], files)
+
+    def invalidate(self, vector_store_id: str) -> None:
+        self._files = {k: v for k, v in self._files.items() if k[0] != vector_store_id}
+
+
+class Session:
+    """The OpenAI and Apify clients and the file inventory, created once and reused by all jobs of a run.
+
+    A regular run processes a single job, in the standby mode the warm clients (with their open connections) and the
+    inventory are reused by every job. The clients of at most `max_clients` API keys are kept, the least recently used
+    are evicted and their connection pools closed. The tiktoken encodings are cached by `get_encoding_for_model` for the whole process.
+    """
+
+    def __init__(self, max_clients: int = STANDBY_MAX_CLIENTS) -> None:
+        self.inventory = FileInventory()
+        self.max_clients = max_clients
+        self._clients: dict[str, tuple[AsyncOpenAI, ApifyClientAsync, HttpPools]] = {}
+
+    async def clients(self, actor_input: ActorInput) -> tuple[AsyncOpenAI, ApifyClientAsync]:
+        """Return the clients for the OpenAI API key of the input, the connection pools are sized by the first job."""
+
+        key = actor_input.openaiApiKey
+        if (entry := self._clients.pop(key, None)) is None:
+            while len(self._clients) >= self.max_clients:
+                evicted = self._clients.pop(next(iter(self._clients)))
+                await evicted[2].aclose()
+            pools = HttpPools(actor_input.maxConcurrency or 1)
+            client = create_openai_client(key, pools)
+            entry = (client, create_apify_client(pools, api_url=Actor.config.api_base_url), pools)
+        # the most recently used clients are kept at the end
+        self._clients[key] = entry
+        return entry[0], entry[1]
+
+    async def aclose(self) -> None:
+        """Close the connection pools of all clients."""
+
+        while self._clients:
+            _, (_, _, pools) = self._clients.popitem()
+            await pools.aclose()
@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import asyncio
+import zlib
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any
+
+from apify import Actor
+
+from .constants import MANIFEST_KEY
+from .crypto import encrypt_input_value, load_private_key
+
+if TYPE_CHECKING:
+    from apify._models import ActorRun
+
+    from .input_model import OpenaiVectorStoreIntegration as ActorInput
+    from .records import FileRecord
+
+
+def shard_range(total: int, index: int, count: int) -> tuple[int, int]:
+    """Return the offset and limit of the shard `index` of `count` contiguous shards of `total` items."""
+    start, end = total * index // count, total * (index + 1) // count
+    return start, end - start
+
+
+def in_shard(key: str, index: int, count: int) -> bool:
+    """Return whether the key belongs to the shard `index` of `count`, keys are assigned to shards by a stable hash."""
+    return zlib.crc32(key.encode("utf-8")) % count == index
+
+
+def is_coordinator(actor_input: ActorInput) -> bool:
+    return (actor_input.shards or 1) > 1 and actor_input.shardIndex is None
+
+
+def get_shard(actor_input: ActorInput) -> tuple[int, int] | None:
+    """Return the shard (index, count) processed by a child run, None when the run is not a child run."""
+    if actor_input.shardIndex is None or (actor_input.shards or 1) <= 1:
+        return None
+    return actor_input.shardIndex, actor_input.shards or 1
+
+
+def encrypt_secret(value: str) -> str:
+    """Encrypt the value as a secret input field, the platform decrypts it in `Actor.get_input` of the child run.
+
+    The value is encrypted by the public part of the input secrets key of the run, the same key is used by the child runs.
+    """
+    key_file, passphrase = Actor.config.input_secrets_private_key_file, Actor.config.input_secrets_private_key_passphrase
+    if not key_file or not passphrase:
+        raise ValueError("The input secrets key is not available, secrets cannot be passed to the child runs")
+    return encrypt_input_value(value, load_private_key(key_file, passphrase).public_key())
+
+
+def get_child_input(payload: dict, actor_input: ActorInput, index: int, encrypted_api_key: str) -> dict:
+    """Return the input of the child run processing the shard `index`.
+
+    The child runs do not delete any files, the old files are deleted once by the coordinator. The OpenAI API key is
+    passed encrypted, so it is not stored in plain text in the input of the child runs.
+    """
+    return payload | {
+        "openaiApiKey": encrypted_api_key,
+        "datasetIds": actor_input.datasetIds or [],
+        "keyValueStoreIds": actor_input.keyValueStoreIds or [],
+        "fileIdsToDelete": [],
+        "replaceFilesOneByOne": False,
+        "shards": actor_input.shards,
+        "shardIndex": index,
+    }
+
+
+async def save_manifest(files: list[FileRecord], deferred: int, failed: int) -> None:
+    """Save the files created by a child run, the coordinator merges the manifests of all child runs."""
+    manifest = {"created": [{"id": f.id, "filename": f.filename} for f in files], "deferred": deferred, "failed": failed}
+    await Actor.set_value(MANIFEST_KEY, manifest)
+
+
+async def load_manifest(run: ActorRun | None) -> dict[str, Any] | None:
+    """Load the manifest of a finished child run, None when the run did not succeed."""
+    if run is None or run.status != "SUCCEEDED":
+        return None
+    record = await Actor.apify_client.key_value_store(run.default_key_value_store_id).get_record(MANIFEST_KEY)
+    return dict(record["value"]) if record else None
+
+
+async def run_shards(payload: dict, actor_input: ActorInput, reserve_secs: float) -> list[dict[str, Any] | None]:
+    """Run the child runs of this Actor in parallel and return their manifests (None for a child run which failed).
+
+    The child runs use the same build and memory as the coordinator and must finish `reserve_secs` before the coordinator
+    times out, so that the coordinator has time to delete the old files.
+    """
+
+    count = actor_input.shards or 1
+    encrypted_api_key = encrypt_secret(actor_input.openaiApiKey)
+    timeout = None
+    if timeout_at := Actor.config.timeout_at:
+        timeout = max(timedelta(minutes=1), timeout_at - datetime.now(timezone.utc) - timedelta(seconds=reserve_secs))
+
+    async def call(index: int) -> dict[str, Any] | None:
+        run = await Actor.call(
+            str(Actor.config.actor_id),
+            get_child_input(payload, actor_input, index, encrypted_api_key),
+            build=Actor.config.actor_build_number,
+            memory_mbytes=Actor.config.memory_mbytes,
+            timeout=timeout,
+        )
+        Actor.log.info("Shard %d/%d finished, run: %s, status: %s", index + 1, count, run and run.id, run and run.status)
+        return await load_manifest(run)
+
+    Actor.log.info("Processing the sources in %d shards by child runs", count)
+    return await asyncio.gather(*(call(i) for i in range(count)))
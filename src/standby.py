@@ -0,0 +1,198 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import time
+from http import HTTPStatus
+from typing import TYPE_CHECKING, Any
+
+from apify import Actor
+from pydantic import ValidationError
+
+from .constants import STANDBY_COALESCE_SECS_DEFAULT, STANDBY_MAX_BODY_BYTES
+from .input_model import OpenaiVectorStoreIntegration as ActorInput
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+# the fields identifying the sources, triggers which differ only in these fields are coalesced into one job
+SOURCE_FIELDS = ("payload", "datasetId", "keyValueStoreId", "datasetIds", "keyValueStoreIds")
+
+
+class JobError(Exception):
+    """A job of the standby mode failed, the Actor keeps serving other triggers."""
+
+
+def is_standby() -> bool:
+    return Actor.config.meta_origin == "STANDBY"
+
+
+async def fail(msg: str) -> None:
+    """Fail the run with the message, in the standby mode only the current job fails."""
+
+    Actor.log.error(msg)
+    if is_standby():
+        raise JobError(msg)
+    await Actor.fail(status_message=msg)
+
+
+def source_ids(payload: dict) -> tuple[list[str], list[str]]:
+    """Return the dataset and key-value store IDs of the trigger, the integration resource replaces the debug IDs."""
+
+    resource = (payload.get("payload") or {}).get("resource") or {}
+    datasets = [resource.get("defaultDatasetId") or payload.get("datasetId"), *(payload.get("datasetIds") or [])]
+    key_value_stores = [resource.get("defaultKeyValueStoreId") or payload.get("keyValueStoreId"), *(payload.get("keyValueStoreIds") or [])]
+    return list(dict.fromkeys(filter(None, datasets))), list(dict.fromkeys(filter(None, key_value_stores)))
+
+
+class Batch:
+    """Triggers with the same settings coalesced into a single job."""
+
+    def __init__(self, settings: dict, created_at: float) -> None:
+        self.settings = settings
+        self.created_at = created_at
+        self.triggers = 0
+        self.dataset_ids: list[str] = []
+        self.key_value_store_ids: list[str] = []
+
+    def add(self, dataset_ids: list[str], key_value_store_ids: list[str]) -> None:
+        self.triggers += 1
+        self.dataset_ids.extend(i for i in dataset_ids if i not in self.dataset_ids)
+        self.key_value_store_ids.extend(i for i in key_value_store_ids if i not in self.key_value_store_ids)
+
+    def payload(self) -> dict:
+        return self.settings | {"datasetIds": self.dataset_ids, "keyValueStoreIds": self.key_value_store_ids}
+
+    def summary(self) -> dict[str, Any]:
+        return {
+            "vectorStoreId": self.settings.get("vectorStoreId"),
+            "triggers": self.triggers,
+            "datasetIds": self.dataset_ids,
+            "keyValueStoreIds": self.key_value_store_ids,
+        }
+
+
+class TriggerCoalescer:
+    """Collect the triggers for `window_secs` and run the coalesced jobs one at a time.
+
+    The first trigger with given settings (vector store, prefix, fields, ...) opens a batch, the triggers which arrive
+    within the window add their datasets and key-value stores to it. Jobs run one by one, so that two jobs never replace
+    the files of the same vector store at the same time, triggers arriving during a job open a new batch.
+    """
+
+    def __init__(self, job: Callable[[dict], Awaitable[None]], window_secs: float) -> None:
+        self.job = job
+        self.window_secs = window_secs
+        self.batches: dict[str, Batch] = {}
+        self.running: Batch | None = None
+        self.jobs_finished = 0
+        self.jobs_failed = 0
+        self._ready: asyncio.Queue[str] = asyncio.Queue()
+
+    def add(self, payload: dict) -> Batch:
+        settings = {k: v for k, v in payload.items() if k not in SOURCE_FIELDS}
+        key = json.dumps(settings, sort_keys=True, default=str)
+        if (batch := self.batches.get(key)) is None:
+            batch = self.batches[key] = Batch(settings, time.monotonic())
+            asyncio.get_running_loop().call_later(self.window_secs, self._ready.put_nowait, key)
+        batch.add(*source_ids(payload))
+        return batch
+
+    async def work(self) -> None:
+        """Run the batches whose window elapsed, forever."""
+
+        while True:
+            key = await self._ready.get()
+            self.running = batch = self.batches.pop(key)
+            Actor.log.info("Starting a job coalesced from %d triggers: %s", batch.triggers, batch.summary())
+            try:
+                await self.job(batch.payload())
+                self.jobs_finished += 1
+            except JobError as e:
+                Actor.log.error("Job failed: %s", e)
+                self.jobs_failed += 1
+            except Exception:
+                Actor.log.exception("Job failed")
+                self.jobs_failed += 1
+            finally:
+                self.running = None
+
+    def status(self) -> dict[str, Any]:
+        return {
+            "running": self.running.summary() if self.running else None,
+            "queued": [b.summary() for b in self.batches.values()],
+            "jobsFinished": self.jobs_finished,
+            "jobsFailed": self.jobs_failed,
+        }
+
+
+class StandbyServer:
+    """A minimal HTTP server accepting the integration payloads of the standby mode.
+
+    - `POST /` with the same JSON as the Actor input (e.g. the integration payload with `payload.resource`) or a webhook
+      payload with `resource`, merged over the input of the standby run, responds with `202 Accepted` and the batch the
+      trigger was added to
+    - `GET /` responds with the running and queued jobs (it also serves as the readiness probe)
+    """
+
+    def __init__(self, coalescer: TriggerCoalescer, defaults: dict) -> None:
+        self.coalescer = coalescer
+        self.defaults = defaults
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            method, _, _ = (await reader.readline()).decode("latin-1").partition(" ")
+            headers = {}
+            while (line := await reader.readline()) not in (b"\r\n", b"\n", b""):
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+            length = int(headers.get("content-length") or 0)
+            if length > STANDBY_MAX_BODY_BYTES:
+                status, body = HTTPStatus.REQUEST_ENTITY_TOO_LARGE, {"error": f"The body exceeds {STANDBY_MAX_BODY_BYTES} bytes"}
+            else:
+                status, body = self.dispatch(method, await reader.readexactly(length))
+        except (ValueError, asyncio.IncompleteReadError) as e:
+            status, body = HTTPStatus.BAD_REQUEST, {"error": str(e)}
+
+        data = json.dumps(body).encode("utf-8")
+        head = f"HTTP/1.1 {status.value} {status.phrase}\r\nContent-Type: application/json\r\nContent-Length: {len(data)}\r\n"
+        writer.write(f"{head}Connection: close\r\n\r\n".encode("latin-1") + data)
+        try:
+            await writer.drain()
+        finally:
+            writer.close()
+
+    def dispatch(self, method: str, body: bytes) -> tuple[HTTPStatus, dict]:
+        if method == "GET":
+            return HTTPStatus.OK, self.coalescer.status()
+        if method != "POST":
+            return HTTPStatus.METHOD_NOT_ALLOWED, {"error": f"Method {method} is not allowed, use POST with the JSON input"}
+
+        try:
+            trigger = json.loads(body or b"{}")
+            if "resource" in trigger and "payload" not in trigger:
+                # the payload of a webhook sent directly to the standby URL
+                trigger = {"payload": trigger}
+            payload = self.defaults | trigger
+            ActorInput(**payload)
+        except (ValueError, TypeError) as e:
+            errors = e.errors(include_url=False, include_input=False) if isinstance(e, ValidationError) else str(e)
+            return HTTPStatus.BAD_REQUEST, {"error": "Invalid input", "details": errors}
+
+        if not any(source_ids(trigger)):
+            return HTTPStatus.BAD_REQUEST, {"error": "The trigger does not contain `payload.resource` nor any dataset or key-value store ID"}
+
+        batch = self.coalescer.add(payload)
+        starts_in = max(0.0, batch.created_at + self.coalescer.window_secs - time.monotonic())
+        return HTTPStatus.ACCEPTED, {"status": "queued", "startsInSecs": round(starts_in, 1), "batch": batch.summary()}
+
+
+async def serve(job: Callable[[dict], Awaitable[None]], defaults: dict) -> None:
+    """Serve the integration triggers in the standby mode until the Actor is stopped, the triggers are coalesced into jobs."""
+
+    window_secs = defaults.get("standbyCoalesceSecs")
+    coalescer = TriggerCoalescer(job, STANDBY_COALESCE_SECS_DEFAULT if window_secs is None else window_secs)
+    server = await asyncio.start_server(StandbyServer(coalescer, defaults).handle, port=Actor.config.web_server_port)
+    Actor.log.info("Standby mode, listening on port %d, coalescing triggers for %.0f s", Actor.config.web_server_port, coalescer.window_secs)
+    async with server:
+        await asyncio.gather(server.serve_forever(), coalescer.work())
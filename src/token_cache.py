@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import struct
+import threading
+from hashlib import blake2b
+from typing import TYPE_CHECKING
+
+from apify import Actor
+
+from .constants import TOKEN_CACHE_MAX_AGE_RUNS, TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_RECORD_KEY
+
+if TYPE_CHECKING:
+    import tiktoken
+
+# binary record: header (magic, version, generation, number of entries) followed by entries (digest, token count, last seen generation)
+_MAGIC = b"TCC1"
+_HEADER = struct.Struct("<4sHII")
+_DIGEST_SIZE = 12
+_ENTRY = struct.Struct(f"<{_DIGEST_SIZE}sII")
+
+
+class TokenCountCache:
+    """Token counts of texts, keyed by the content hash and the encoding name.
+
+    The cache is persisted as a compact binary record in a named Apify key-value store, so that datasets which are
+    re-crawled daily do not need to be tokenized again. Every load starts a new generation (run), entries not seen in the
+    last `TOKEN_CACHE_MAX_AGE_RUNS` runs are evicted when the cache is saved. Items are counted in worker threads, the
+    entries and statistics are updated under a lock.
+    """
+
+    def __init__(self, generation: int = 0, entries: dict[bytes, int] | None = None) -> None:
+        self.generation = generation
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        # digest -> token count in the lower 32 bits, last seen generation in the upper 32 bits
+        self._entries: dict[bytes, int] = entries or {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def digest(text: str, encoding_name: str) -> bytes:
+        return blake2b(text.encode("utf-8"), digest_size=_DIGEST_SIZE, person=encoding_name.encode("utf-8")[:16]).digest()
+
+    def count(self, text: str, encoding: tiktoken.core.Encoding) -> int:
+        """Return the number of tokens of the text, tokenize it only if it is not in the cache."""
+
+        key = self.digest(text, encoding.name)
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+        nr_tokens = len(encoding.encode(text)) if value is None else value & 0xFFFFFFFF
+        with self._lock:
+            self._entries[key] = self.generation << 32 | nr_tokens
+        return nr_tokens
+
+    def to_bytes(self, max_age: int = TOKEN_CACHE_MAX_AGE_RUNS, max_entries: int = TOKEN_CACHE_MAX_ENTRIES) -> bytes:
+        """Serialize the cache, drop entries not seen in the last `max_age` runs and keep at most `max_entries` most recent."""
+
+        min_generation = self.generation - max_age
+        entries = [(k, v) for k, v in self._entries.items() if v >> 32 >= min_generation]
+        if len(entries) > max_entries:
+            entries.sort(key=lambda e: e[1] >> 32, reverse=True)
+            del entries[max_entries:]
+
+        buffer = bytearray(_HEADER.size + _ENTRY.size * len(entries))
+        _HEADER.pack_into(buffer, 0, _MAGIC, 1, self.generation, len(entries))
+        for i, (k, v) in enumerate(entries):
+            _ENTRY.pack_into(buffer, _HEADER.size + i * _ENTRY.size, k, v & 0xFFFFFFFF, v >> 32)
+        return bytes(buffer)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> TokenCountCache:
+        """Load the cache saved by the previous run and start a new generation."""
+
+        magic, _, generation, n = _HEADER.unpack_from(data, 0)
+        if magic != _MAGIC or len(data) != _HEADER.size + n * _ENTRY.size:
+            Actor.log.warning("Token count cache has an unexpected format, starting with an empty cache")
+            return cls()
+
+        entries = {k: gen << 32 | nr_tokens for k, nr_tokens, gen in _ENTRY.iter_unpack(memoryview(data)[_HEADER.size :])}
+        return cls(generation + 1, entries)
+
+    @classmethod
+    async def load(cls, store_name: str) -> TokenCountCache:
+        """Load the cache from the named Apify key-value store."""
+
+        try:
+            store = await Actor.open_key_value_store(name=store_name)
+            if data := await store.get_value(TOKEN_CACHE_RECORD_KEY):
+                cache = cls.from_bytes(data)
+                Actor.log.info("Loaded token count cache with %d entries from the key-value store: %s", len(cache), store_name)
+                return cache
+        except Exception as e:
+            Actor.log.warning("Failed to load token count cache from the key-value store %s: %s", store_name, e)
+        return cls()
+
+    async def save(self, store_name: str) -> None:
+        """Save the cache to the named Apify key-value store."""
+
+        try:
+            store = await Actor.open_key_value_store(name=store_name)
+            await store.set_value(TOKEN_CACHE_RECORD_KEY, self.to_bytes(), content_type="application/octet-stream")
+            Actor.log.info("Saved token count cache (hits: %d, misses: %d) to the key-value store: %s", self.hits, self.misses, store_name)
+        except Exception as e:
+            Actor.log.warning("Failed to save token count cache to the key-value store %s: %s", store_name, e)
@@ -0,0 +1,105 @@
+from __future__ import annotations
+
+import os
+from contextlib import ExitStack, contextmanager
+from typing import TYPE_CHECKING, Any, Protocol
+
+from apify import Actor
+
+from .constants import TRACES_FILE_ENV_VAR, TRACING_SERVICE_NAME
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+
+class Span(Protocol):
+    def set_attribute(self, key: str, value: Any) -> Any: ...
+
+
+class NoopSpan:
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = NoopSpan()
+_tracer: Any = None
+
+
+def create_tracer_provider(stack: ExitStack) -> Any:
+    """Create the OpenTelemetry tracer provider configured by the environment, None when tracing is not enabled.
+
+    Spans are exported to the OTLP endpoint (`OTEL_EXPORTER_OTLP_ENDPOINT` or `OTEL_EXPORTER_OTLP_TRACES_ENDPOINT`, the
+    standard OTLP variables such as `OTEL_EXPORTER_OTLP_HEADERS` apply) and/or as JSON lines to the file at `ACTOR_TRACES_FILE`.
+    The `opentelemetry-sdk` (and `opentelemetry-exporter-otlp-proto-http` for OTLP) package is optional. The file is closed by the `stack`.
+    """
+
+    otlp = os.getenv("OTEL_EXPORTER_OTLP_ENDPOINT") or os.getenv("OTEL_EXPORTER_OTLP_TRACES_ENDPOINT")
+    path = os.getenv(TRACES_FILE_ENV_VAR)
+    if not (otlp or path):
+        return None
+
+    try:
+        from opentelemetry.sdk.resources import Resource
+        from opentelemetry.sdk.trace import TracerProvider
+        from opentelemetry.sdk.trace.export import BatchSpanProcessor, ConsoleSpanExporter
+    except ImportError:
+        Actor.log.warning("Tracing is configured, but the opentelemetry-sdk package is not installed, spans are not exported")
+        return None
+
+    attributes = {"service.name": TRACING_SERVICE_NAME}
+    if Actor.config.actor_run_id:
+        attributes["apify.actor_run_id"] = Actor.config.actor_run_id
+    provider = TracerProvider(resource=Resource.create(attributes))
+
+    if otlp:
+        try:
+            from opentelemetry.exporter.otlp.proto.http.trace_exporter import OTLPSpanExporter
+        except ImportError:
+            Actor.log.warning("The opentelemetry-exporter-otlp-proto-http package is not installed, spans are not exported to %s", otlp)
+        else:
+            provider.add_span_processor(BatchSpanProcessor(OTLPSpanExporter()))
+
+    if path:
+        out = stack.enter_context(open(path, "a", encoding="utf-8"))  # noqa: SIM115
+        provider.add_span_processor(BatchSpanProcessor(ConsoleSpanExporter(out=out, formatter=lambda s: s.to_json(indent=None) + "\n")))
+
+    Actor.log.info("Tracing enabled, exporting spans to %s", " and ".join(filter(None, [otlp, path])))
+    return provider
+
+
+@contextmanager
+def tracing() -> Iterator[None]:
+    """Enable tracing for the wrapped code when configured, all spans are children of a single run span.
+
+    The run span continues the trace from the `TRACEPARENT` environment variable (W3C trace context) when set, so that the
+    run can be correlated with the rest of a pipeline.
+    """
+
+    global _tracer  # noqa: PLW0603
+    with ExitStack() as stack:
+        if (provider := create_tracer_provider(stack)) is None:
+            yield
+            return
+
+        from opentelemetry.trace.propagation.tracecontext import TraceContextTextMapPropagator
+
+        parent = TraceContextTextMapPropagator().extract({"traceparent": os.environ.get("TRACEPARENT", "")})
+        _tracer = provider.get_tracer(__name__)
+        stack.callback(provider.shutdown)
+        try:
+            with _tracer.start_as_current_span("run", context=parent):
+                yield
+        finally:
+            _tracer = None
+
+
+@contextmanager
+def span(name: str, attributes: dict[str, Any] | None = None) -> Iterator[Span]:
+    """Trace the wrapped code as a span, no-op when tracing is not enabled. Exceptions are recorded in the span."""
+
+    if _tracer is None:
+        yield _NOOP_SPAN
+        return
+
+    with _tracer.start_as_current_span(name, attributes=attributes) as s:
+        yield s
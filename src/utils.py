@@ -1,42 +1,65 @@
+from __future__ import annotations
+
+import asyncio
 import json
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
 
-import tiktoken
 from apify import Actor
 
+from .metrics import metrics
+from .projection import MISSING, compile_field_path
+from .standby import fail
+
+if TYPE_CHECKING:
+    import tiktoken
+
+    from .token_cache import TokenCountCache
+
 OPENAI_MAX_FILES = 10_000
 OPENAI_MAX_TOKENS_PER_FILE = 5_000_000
 
 
-def get_nested_value(data: dict, keys: str) -> dict:
+def get_nested_value(data: dict, keys: str) -> Any:
     """
-    Extract nested value from dict.
+    Extract nested value from dict, return empty dict if the value is not found.
+
+    Use `compile_projection` to select fields from many items.
 
     Example:
       >>> get_nested_value({"a": "v1", "c1": {"c2": "v2"}}, "c1.c2")
       'v2'
     """
 
-    keys_l = keys.split(".")
-    result = data
+    result = compile_field_path(keys)(data)
+    return {} if result is MISSING else result
+
+
+@lru_cache(maxsize=8)
+def get_encoding_for_model(model: str) -> tiktoken.core.Encoding:
+    """Get tiktoken encoding for the model.
 
-    for key in keys_l:
-        if key in result:
-            result = result[key]
-        else:
-            # If any of the keys are not found, return None
-            return {}
+    tiktoken is imported only when needed (it is not used in runs without `assistantId`) and the encodings are cached.
+    """
+    import tiktoken
+
+    return tiktoken.encoding_for_model(model)
 
-    return result
 
+async def split_data_if_required(data: list, encoding: tiktoken.core.Encoding, token_cache: TokenCountCache | None = None) -> list:
+    """Split data if number of tokens is larger than OpenAI's limits.
 
-async def split_data_if_required(data: list, encoding: tiktoken.core.Encoding) -> list:
-    """Split data if number of tokens is larger than OpenAI's limits."""
+    With the `token_cache`, every item is tokenized (or found in the cache) only once and the number of tokens of the whole
+    dataset is estimated as the sum of the items (plus one token per separator). Tokenization runs in a thread, so that
+    the uploads of other sources are not stalled.
+    """
 
-    nr_tokens = len(encoding.encode(json.dumps(data)))
+    nr_tokens, token_counts = await asyncio.to_thread(count_tokens, data, encoding, token_cache)
     Actor.log.debug("Number of tokens in dataset %s", nr_tokens)
+    metrics.increment("tokensCounted", nr_tokens)
     if nr_tokens > OPENAI_MAX_TOKENS_PER_FILE * OPENAI_MAX_FILES:
-        await Actor.fail(
-            status_message=f"Number of tokens in a dataset exceeds OpenAI Assistants limits "
+        await fail(
+            f"Number of tokens in a dataset exceeds OpenAI Assistants limits "
             f"Max token per file {OPENAI_MAX_TOKENS_PER_FILE}, "
             f"max files: {OPENAI_MAX_FILES}"
         )
@@ -47,14 +70,25 @@ async def split_data_if_required(data: list, encoding: tiktoken.core.Encoding) -
             nr_tokens,
             OPENAI_MAX_TOKENS_PER_FILE,
         )
-        data = split_data_into_batches(data, max_tokens=OPENAI_MAX_TOKENS_PER_FILE, encoding=encoding)
+        data = await asyncio.to_thread(
+            split_data_into_batches, data, max_tokens=OPENAI_MAX_TOKENS_PER_FILE, encoding=encoding, token_counts=token_counts
+        )
         Actor.log.debug("The data were split into batches %s", len(data))
     else:
         data = [data]
     return data
 
 
-def split_data_into_batches(data: list, max_tokens: int, encoding: tiktoken.core.Encoding) -> list:
+def count_tokens(data: list, encoding: tiktoken.core.Encoding, token_cache: TokenCountCache | None = None) -> tuple[int, list[int] | None]:
+    """Return the number of tokens of the data and, with the `token_cache`, the number of tokens of every item."""
+
+    if token_cache is None:
+        return len(encoding.encode(json.dumps(data))), None
+    token_counts = [token_cache.count(json.dumps(d), encoding) for d in data]
+    return sum(token_counts) + len(data) + 1, token_counts
+
+
+def split_data_into_batches(data: list, max_tokens: int, encoding: tiktoken.core.Encoding, token_counts: list[int] | None = None) -> list:
     """
     Splits a list of items into batches where the total size of each batch, measured in tokens,
     does not exceed a specified maximum.
@@ -64,6 +98,7 @@ def split_data_into_batches(data: list, max_tokens: int, encoding: tiktoken.core
     Args:
     - v (list): The list of items to be batched.
     - max_tokens (int): The maximum number of tokens that each batch can contain.
+    - token_counts (list[int], optional): Already known number of tokens of each item, the items are not tokenized again.
 
     Returns:
     - list: A list of lists, where each sublist represents a batch of items. Each batch's combined token count does
@@ -81,7 +116,7 @@ def split_data_into_batches(data: list, max_tokens: int, encoding: tiktoken.core
     batch_tok, batch_start = 0, 0
     try:
         for i, v in enumerate(data):
-            t = len(encoding.encode(json.dumps(v)))
+            t = token_counts[i] if token_counts is not None else len(encoding.encode(json.dumps(v)))
             if batch_tok + t < max_tokens:
                 batch_tok += t
             else:
@@ -98,6 +133,7 @@ def split_data_into_batches(data: list, max_tokens: int, encoding: tiktoken.core
 
 if __name__ == "__main__":
     import apify_client
+    import tiktoken
 
     dataset_id = "fLR7roVL7yaMXlBYW"
     fields = None
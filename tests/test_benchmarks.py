@@ -0,0 +1,42 @@
+from benchmarks import bench_memory
+from benchmarks.bench_micro import compare, run
+from benchmarks.bench_pipeline import run_scenario
+from benchmarks.fake_server import FakeServerConfig, start_server
+
+
+def test_pipeline_end_to_end_with_fake_server() -> None:
+    server, _ = start_server(FakeServerConfig(latency_ms=1, processing_delay_ms=10, rate_limit=0.05))
+    try:
+        result = run_scenario(server.url, items=50, records=5)
+        assert result.exit_code == 0
+        assert result.files_created == 6, "One file for the dataset and one for each record"
+        assert result.requests_by_endpoint["GET /v2/datasets/{id}/items"] >= 1
+        assert result.run_report["filesCreated"] == 6
+        assert result.run_report["apiCalls"]["POST /v1/files"] >= 6
+        assert set(result.run_report["phasesSecs"]) == {"discovery", "planning", "ingestion", "cleanup"}
+
+        # the second run replaces the files created by the first one
+        result = run_scenario(server.url, items=50, records=5, actor_input={"replaceFilesOneByOne": True}, reset=False)
+        assert result.exit_code == 0
+        assert result.files_created == 6
+        assert len(server.state.files) == 6, "Files from the first run are deleted"
+        assert len(server.state.vector_store_files["vs-benchmark"]) == 6
+    finally:
+        server.shutdown()
+
+
+def test_micro_benchmarks_compare() -> None:
+    results = run([10], repeat=1, fixtures=["actors"])
+    assert "projection/compile_projection[actors-10]" in results
+
+    baseline = {name: {"min": r["min"] / 10, "median": r["median"]} for name, r in results.items()}
+    assert sorted(compare(results, baseline, threshold=1.2)) == sorted(results)
+    assert compare(results, results, threshold=1.2) == []
+
+
+def test_memory_benchmark_compact_records() -> None:
+    results = bench_memory.run([1000])
+    for model, record in [("FileObject", "FileRecord"), ("VectorStoreFile", "VectorStoreFileRecord"), ("FileDeleted", "DeletedRecord")]:
+        [compact] = [r for name, r in results.items() if f"/{record}[" in name]
+        [full] = [r for name, r in results.items() if f"/{model}[" in name]
+        assert compact["bytesPerFile"] < full["bytesPerFile"] / 2
@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from src.boilerplate import LineFrequency, line_key, strip_boilerplate
+
+NAVIGATION = "Home\nProducts\nPricing"
+FOOTER = "© 2024 Apify   Technologies s.r.o.\nCookie settings"
+
+
+def page(i: int) -> dict:
+    return {"url": f"https://example.com/{i}", "text": f"{NAVIGATION}\nTitle {i}\n\nContent of the page {i}.\nPricing\n{FOOTER}"}
+
+
+def test_lines_repeated_on_most_pages_are_stripped() -> None:
+    items = [page(i) for i in range(10)] + [{"url": "https://example.com/no-text"}]
+    # a line on 3 of 10 pages is not boilerplate
+    for i in range(3):
+        items[i]["text"] += "\nRelated: Apify SDK"
+
+    stripped, lines, chars = strip_boilerplate(items, threshold_percent=50)
+
+    assert lines == 5
+    assert stripped[0]["text"] == "Title 0\n\nContent of the page 0.\nRelated: Apify SDK"
+    assert stripped[5]["text"] == "Title 5\n\nContent of the page 5."
+    assert stripped[10] == {"url": "https://example.com/no-text"}
+    assert chars == sum(len(a["text"]) - len(b["text"]) for a, b in zip(items[:10], stripped))
+    # the items are not modified in place
+    assert items[0]["text"].startswith(NAVIGATION)
+
+    # small datasets are kept as they are
+    assert strip_boilerplate(items[:3], threshold_percent=50) == (items[:3], 0, 0)
+
+
+def test_line_frequency_forgets_rare_lines() -> None:
+    frequency = LineFrequency(error=0.1)
+    for i in range(100):
+        frequency.add(f"menu\n  footer  line\nunique {i}")
+
+    assert len(frequency.counts) < 20
+    assert len(frequency.frequent(0.5)) == 2
+
+
+def test_lines_below_the_threshold_are_kept() -> None:
+    frequency = LineFrequency(error=0.1)
+    for i in range(100):
+        frequency.add("menu\nsidebar" if i < 49 else "menu")
+
+    assert frequency.frequent(0.5) == {line_key("menu")}
@@ -0,0 +1,52 @@
+from __future__ import annotations
+
+import httpx
+from openai import AsyncOpenAI
+
+from src.clients import HttpPools, RoutingTransport, create_apify_client, is_bulk_request
+
+
+async def test_routing_transport_separates_bulk_requests() -> None:
+    routed: list[tuple[str, str]] = []
+
+    def handler(lane: str) -> httpx.MockTransport:
+        def _handle(request: httpx.Request) -> httpx.Response:
+            routed.append((lane, request.url.path))
+            if request.method == "POST":
+                return httpx.Response(
+                    200,
+                    json={
+                        "id": "file-1",
+                        "bytes": 1,
+                        "created_at": 0,
+                        "filename": "a.txt",
+                        "object": "file",
+                        "purpose": "assistants",
+                        "status": "processed",
+                    },
+                )
+            return httpx.Response(200, json={"object": "list", "data": [], "has_more": False})
+
+        return httpx.MockTransport(_handle)
+
+    transport = RoutingTransport(handler("control"), handler("bulk"), httpx.Timeout(600))
+    client = AsyncOpenAI(api_key="test", http_client=httpx.AsyncClient(transport=transport))
+
+    await client.files.create(file=("a.txt", b"data"), purpose="assistants")
+    _ = [f async for f in client.files.list()]
+
+    assert routed == [("bulk", "/v1/files"), ("control", "/v1/files")]
+
+
+def test_create_apify_client_keeps_headers() -> None:
+    client = create_apify_client(HttpPools(max_concurrency=4), token="test-token")
+    headers = client.http_client.httpx_async_client.headers
+    assert headers["Authorization"] == "Bearer test-token"
+    assert headers["User-Agent"].startswith("ApifyClient/")
+
+
+def test_attaching_files_to_vector_store_is_not_bulk() -> None:
+    upload = httpx.Request("POST", "https://api.openai.com/v1/files")
+    attach = httpx.Request("POST", "https://api.openai.com/v1/vector_stores/vs_1/files")
+    assert is_bulk_request(upload)
+    assert not is_bulk_request(attach)
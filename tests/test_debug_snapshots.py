@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import gzip
+import json
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+from unittest.mock import AsyncMock, MagicMock
+
+from apify import Actor
+
+from src import main
+from src.input_model import OpenaiVectorStoreIntegration as ActorInput
+
+if TYPE_CHECKING:
+    import pytest
+
+
+async def test_dataset_files_are_saved_gzipped_as_they_are_created(monkeypatch: pytest.MonkeyPatch) -> None:
+    uploaded: dict[str, bytes] = {}
+
+    async def create_file_and_add_to_vector_store(_ingestor: object, filename: str, content: bytes, *_args: object) -> SimpleNamespace:
+        uploaded[filename] = content
+        return SimpleNamespace(id=f"file-{filename}", filename=filename)
+
+    store = MagicMock()
+    store.set_value = AsyncMock()
+    monkeypatch.setattr(main, "create_file_and_add_to_vector_store", create_file_and_add_to_vector_store)
+    monkeypatch.setattr(Actor, "open_key_value_store", AsyncMock(return_value=store))
+
+    items = [{"text": f"item {i}", "url": f"https://example.com/{i}"} for i in range(5)]
+    aclient_apify = MagicMock()
+    aclient_apify.dataset.return_value.list_items = AsyncMock(return_value=SimpleNamespace(items=items))
+    actor_input = ActorInput(  # type: ignore[call-arg]
+        vectorStoreId="vs_1", openaiApiKey="key", datasetFields=["text"], filePrefix="debug", saveInApifyKeyValueStore=True
+    )
+
+    files = await main.create_files_from_dataset(MagicMock(), aclient_apify, actor_input, dataset_id="ds_1")
+
+    assert [f.filename for f in files] == ["debug_ds_1_0.json"]
+    key, value = store.set_value.call_args.args
+    assert key == "debug_ds_1_0.json.gz"
+    assert store.set_value.call_args.kwargs["content_type"] == "application/gzip"
+    # the debug copy holds exactly the uploaded bytes
+    assert gzip.decompress(value) == uploaded["debug_ds_1_0.json"]
+    assert json.loads(uploaded["debug_ds_1_0.json"]) == [{"text": f"item {i}"} for i in range(5)]
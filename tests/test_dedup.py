@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import random
+from typing import TYPE_CHECKING
+from unittest.mock import AsyncMock
+
+import pytest
+from apify import Actor
+
+from src import dedup
+from src.dedup import compute_signatures, drop_near_duplicates
+from src.minhash import find_near_duplicates, signature, signatures, similarity
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+WORDS = [f"word{i}" for i in range(2000)]
+
+
+@pytest.fixture()
+def page() -> Callable[..., str]:
+    """Random pages from a generator seeded for every test, independent of other tests and of the global random state."""
+    rng = random.Random(7)
+
+    def _page(n: int = 300) -> str:
+        return " ".join(rng.choices(WORDS, k=n))
+
+    return _page
+
+
+def variant(text: str) -> str:
+    """The same page with a different date in the footer."""
+    return f"{text} updated on 2024-11-27"
+
+
+def test_near_duplicates_keep_the_first_item_of_a_cluster(page: Callable[..., str]) -> None:
+    a, b = page(), page()
+    texts = [a, b, variant(a), "", variant(b), variant(variant(a))]
+    sigs = signatures(texts)
+
+    assert sigs[3] is None
+    assert similarity(signature(a), signature(a)) == 1.0  # type: ignore[arg-type]
+    duplicates = find_near_duplicates(sigs, threshold=0.9)
+    assert {i: rep for i, (rep, _) in duplicates.items()} == {2: 0, 4: 1, 5: 0}
+    assert find_near_duplicates(sigs, threshold=1.0) == {}
+
+
+async def test_drop_near_duplicates_reports_dropped_urls(monkeypatch: pytest.MonkeyPatch, page: Callable[..., str]) -> None:
+    push_data = AsyncMock()
+    monkeypatch.setattr(Actor, "push_data", push_data)
+    text = page()
+    items = [
+        {"url": "https://example.com/a", "text": text},
+        {"url": "https://example.com/a?print=1", "text": variant(text)},
+        {"url": "https://example.com/b", "text": page()},
+    ]
+
+    kept = await drop_near_duplicates(items, 90, source="the dataset ds_1")
+
+    assert [d["url"] for d in kept] == ["https://example.com/a", "https://example.com/b"]
+    assert push_data.await_args is not None
+    [report] = push_data.await_args.args[0]
+    assert (report["url"], report["duplicateOf"], report["status"]) == ("https://example.com/a?print=1", "https://example.com/a", "near-duplicate")
+
+
+async def test_signatures_of_large_datasets_are_computed_in_processes(monkeypatch: pytest.MonkeyPatch, page: Callable[..., str]) -> None:
+    monkeypatch.setattr(dedup, "NEAR_DUPLICATE_PARALLEL_MIN_ITEMS", 10)
+    monkeypatch.setattr(dedup.os, "cpu_count", lambda: 2)
+    texts = [page(50) for _ in range(30)]
+
+    assert await compute_signatures(texts) == signatures(texts)
@@ -6,8 +6,9 @@ from apify import Actor
 from apify_client import ApifyClientAsync
 from dotenv import load_dotenv
 
+from src.ingestor import create_file
 from src.input_model import OpenaiVectorStoreIntegration as ActorInput
-from src.main import create_file, create_files_from_dataset, create_files_from_key_value_store, delete_files
+from src.main import create_files_from_dataset, create_files_from_key_value_store, delete_files
 
 load_dotenv()
 
@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import functools
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+from unittest.mock import AsyncMock, MagicMock
+
+from src import main
+from src.follow import DatasetFollower, group_window_items, window_item
+from src.input_model import OpenaiVectorStoreIntegration as ActorInput
+from src.retry_queue import RetryQueue
+from src.scheduler import DATASETS, DeadlineScheduler
+
+if TYPE_CHECKING:
+    import pytest
+
+    from src.retry_queue import OnFailure
+
+
+def mock_apify_client(statuses: list[str], item_counts: list[int]) -> MagicMock:
+    client = MagicMock()
+    client.run.return_value.get = AsyncMock(side_effect=[{"status": s} for s in statuses])
+    client.dataset.return_value.get = AsyncMock(side_effect=[{"itemCount": c} for c in item_counts])
+    return client
+
+
+async def test_follow_ingests_new_items_in_batches_until_the_run_finishes() -> None:
+    # the items written at the end of the run are ingested in batches sized by the final item count
+    client = mock_apify_client(["RUNNING", "RUNNING", "RUNNING", "SUCCEEDED"], [5, 12, 15, 25, 25, 25])
+    windows = []
+
+    async def ingest(window: tuple[int, int]) -> list:
+        windows.append(window)
+        return [SimpleNamespace(id=f"file-{window[0]}")]
+
+    follower = DatasetFollower(client, "run_1", "ds_1", batch_items=10, poll_interval_secs=0)
+    files = await follower.follow(ingest)
+
+    assert windows == [(0, 10), (10, 10), (20, 5)]
+    assert [f.id for f in files] == ["file-0", "file-10", "file-20"]
+    assert follower.succeeded
+    client.dataset.return_value.list_items.assert_not_called()
+
+
+async def test_follow_keeps_old_files_when_the_run_fails() -> None:
+    client = mock_apify_client(["FAILED"], [3, 3])
+    follower = DatasetFollower(client, "run_1", "ds_1", batch_items=10, poll_interval_secs=0)
+    ingest = AsyncMock(return_value=[])
+    await follower.follow(ingest)
+
+    ingest.assert_awaited_once_with(window=(0, 3))
+    assert follower.status == "FAILED"
+    assert not follower.succeeded
+
+
+def test_follower_is_created_only_for_a_running_source_run() -> None:
+    actor_input = ActorInput(vectorStoreId="vs_1", openaiApiKey="key", datasetFields=["text"], followSourceRun=True)  # type: ignore[call-arg]
+
+    def payload(status: str) -> dict:
+        return {"payload": {"resource": {"id": "run_1", "status": status, "defaultDatasetId": "ds_1"}}}
+
+    follower = DatasetFollower.from_payload(MagicMock(), actor_input, payload("RUNNING"))
+    assert follower is not None
+    assert follower.dataset_id == "ds_1"
+    assert DatasetFollower.from_payload(MagicMock(), actor_input, payload("SUCCEEDED")) is None
+    assert DatasetFollower.from_payload(MagicMock(), actor_input, {}) is None
+    actor_input.followSourceRun = False
+    assert DatasetFollower.from_payload(MagicMock(), actor_input, payload("RUNNING")) is None
+
+
+async def test_failed_window_is_queued_and_old_files_are_kept(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(main, "RETRY_BACKOFF_SECS", 0)
+    monkeypatch.setattr(main, "save_pending_work", AsyncMock())
+    monkeypatch.setattr(RetryQueue, "save", AsyncMock())
+    items = [{"text": str(i)} for i in range(4)]
+    client = mock_apify_client(["RUNNING", "SUCCEEDED"], [2, 4, 4])
+
+    async def list_items(*, offset: int, limit: int, **_: object) -> SimpleNamespace:
+        return SimpleNamespace(items=items[offset : offset + limit])
+
+    client.dataset.return_value.list_items = list_items
+    actor_input = ActorInput(vectorStoreId="vs_1", openaiApiKey="key", datasetFields=["text"])  # type: ignore[call-arg]
+
+    async def upload(_: object, filename: str, __: bytes, on_failure: OnFailure) -> SimpleNamespace | None:
+        if filename == "ds_1_2_0.json":
+            on_failure("timeout", False)  # noqa: FBT003
+            return None
+        return SimpleNamespace(id=f"file-{filename}", filename=filename)
+
+    monkeypatch.setattr(main, "create_file_and_add_to_vector_store", upload)
+    scheduler, retries = DeadlineScheduler(None), RetryQueue()
+    ingest = functools.partial(
+        main.create_files_from_dataset, MagicMock(), client, actor_input, dataset_id="ds_1", scheduler=scheduler, retries=retries
+    )
+    follower = DatasetFollower(client, "run_1", "ds_1", batch_items=2, poll_interval_secs=0)
+
+    files = await follower.follow(ingest, stop=lambda: not scheduler.can_start())
+    assert [f.filename for f in files] == ["ds_1_0_0.json"]
+    assert retries.transient() == {DATASETS: {"ds_1": [window_item((2, 2), 0)]}}
+
+    await main.retry_failed_files(retries, scheduler, lambda _, source_id, only: ingest(dataset_id=source_id, only=only))
+    file_ids = await main.save_deferred_work(actor_input, scheduler, retries, ["old-1"], pending=None, shard=None)
+
+    # the window kept failing, it is deferred to the next run together with the old files
+    assert follower.succeeded
+    assert file_ids == []
+    assert scheduler.deferred[DATASETS] == {"ds_1": ["2+2:0"]}
+    work = main.save_pending_work.await_args.args[2]  # type: ignore[attr-defined]
+    assert work["deleteFileIds"] == ["old-1"]
+    assert work[DATASETS]["ds_1"]["pending"] == ["2+2:0"]
+
+
+def test_window_items_are_grouped_by_window() -> None:
+    assert group_window_items([window_item((0, 10), 1), window_item((0, 10), 0), window_item((10, 5), 0), 3]) == {
+        (0, 10): {0, 1},
+        (10, 5): {0},
+        None: {3},
+    }
@@ -0,0 +1,86 @@
+from __future__ import annotations
+
+import time
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, Any
+from unittest.mock import AsyncMock, MagicMock
+
+from apify import Actor
+
+from src.garbage import collect_garbage, find_garbage
+from src.metrics import metrics
+
+if TYPE_CHECKING:
+    import pytest
+
+OLD = int(time.time()) - 7200
+NEW = int(time.time())
+
+
+def file(file_id: str, filename: str, created_at: int = OLD, nbytes: int = 100) -> SimpleNamespace:
+    return SimpleNamespace(id=file_id, filename=filename, created_at=created_at, bytes=nbytes)
+
+
+def vs_file(file_id: str, status: str = "completed", created_at: int = OLD, usage_bytes: int = 10) -> SimpleNamespace:
+    return SimpleNamespace(id=file_id, status=status, created_at=created_at, usage_bytes=usage_bytes)
+
+
+def mock_client(files: list[SimpleNamespace], vs_files: list[SimpleNamespace], other_vs_files: list[SimpleNamespace] | None = None) -> MagicMock:
+    async def items(values: list) -> Any:
+        for v in values:
+            yield v
+
+    vector_stores = {"vs_1": vs_files, "vs_2": other_vs_files or []}
+    assistant = SimpleNamespace(tool_resources=SimpleNamespace(code_interpreter=SimpleNamespace(file_ids=["file-assistant"])))
+    client = MagicMock()
+    client.files.list = lambda: items(files)
+    client.files.delete = AsyncMock()
+    client.beta.vector_stores.list = lambda: items([SimpleNamespace(id=i) for i in vector_stores])
+    client.beta.vector_stores.files.list = lambda vector_store_id: items(vector_stores[vector_store_id])
+    client.beta.vector_stores.files.delete = AsyncMock()
+    client.beta.assistants.list = lambda: items([assistant])
+    return client
+
+
+FILES = [
+    file("file-attached", "prefix_a.json"),
+    file("file-detached", "prefix_b.json", nbytes=1000),
+    file("file-uploading", "prefix_c.json", created_at=NEW),
+    file("file-other", "other_d.json"),
+    file("file-failed", "prefix_e.pdf", nbytes=500),
+    file("file-other-store", "prefix_f.json"),
+    file("file-assistant", "prefix_g.csv"),
+]
+VS_FILES = [vs_file("file-attached"), vs_file("file-deleted", usage_bytes=20), vs_file("file-failed", "failed", usage_bytes=0)]
+# files with the same prefix attached to another vector store or to an assistant are not orphans
+OTHER_VS_FILES = [vs_file("file-other-store")]
+
+
+async def test_find_garbage_in_one_inventory_pass() -> None:
+    garbage = await find_garbage(mock_client(FILES, VS_FILES, OTHER_VS_FILES), "vs_1", "prefix_")  # type: ignore[arg-type]
+
+    # the file being uploaded by a concurrent run, the file without the prefix and the files referenced elsewhere are kept
+    assert [f.id for f in garbage.detached] == ["file-detached"]
+    assert [f.id for f in garbage.dangling] == ["file-deleted"]
+    assert [f.id for f in garbage.stale] == ["file-failed"]
+    assert [f.id for f in garbage.stale_files] == ["file-failed"]
+
+    garbage = await find_garbage(mock_client(FILES, VS_FILES), "vs_1", None)  # type: ignore[arg-type]
+    assert (garbage.detached, garbage.stale_files) == ([], [])
+    assert len(garbage) == 2
+
+
+async def test_collect_garbage_reports_reclaimed_bytes(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(Actor, "push_data", AsyncMock())
+    metrics.reset()
+    # the bytes reclaimed earlier in the same process (e.g. by a previous job in standby) are not reported
+    metrics.increment("bytesReclaimed", 10_000)
+    client = mock_client(FILES, VS_FILES, OTHER_VS_FILES)
+
+    summary = await collect_garbage(client, "vs_1", "prefix_", max_concurrency=2)  # type: ignore[arg-type]
+
+    assert sorted(c.args[0] for c in client.files.delete.call_args_list) == ["file-detached", "file-failed"]
+    assert sorted(c.args[0] for c in client.beta.vector_stores.files.delete.call_args_list) == ["file-deleted", "file-failed"]
+    assert summary["bytesReclaimed"] == 1000 + 500 + 20
+    assert metrics.counters["danglingEntriesRemoved"] == 1
+    assert metrics.counters["staleFilesDeleted"] == 1
@@ -0,0 +1,24 @@
+from src.governor import ResourceGovernor
+from src.pool import UploadPool
+
+MB = 2**20
+
+
+async def test_governor_shrinks_and_grows_pool() -> None:
+    pool = UploadPool(max_concurrency=8)
+    governor = ResourceGovernor(pool, memory_limit_bytes=1000 * MB, target_ratio=0.8)
+
+    await governor.update(900 * MB)
+    assert pool.limit == 4
+    assert pool.max_buffered_bytes == 16 * MB
+
+    await governor.update(700 * MB)
+    assert pool.limit == 4
+    assert pool.max_buffered_bytes == 100 * MB
+
+    await governor.update(100 * MB, cpu_overloaded=True)
+    assert pool.limit == 4
+
+    for _ in range(10):
+        await governor.update(100 * MB)
+    assert pool.limit == 8
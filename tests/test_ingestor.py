@@ -0,0 +1,140 @@
+from __future__ import annotations
+
+import asyncio
+from contextlib import aclosing
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+from unittest.mock import AsyncMock, MagicMock
+
+from apify import Actor
+
+from src import main
+from src.ingestor import STATUS_ERROR, Ingestor
+from src.metrics import RunMetrics, metrics
+from src.pool import UploadPool
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator
+
+    import pytest
+
+
+def fake_client(statuses: dict[str, str] | None = None, delay: float = 0) -> MagicMock:
+    """OpenAI client whose files are attached with the status by filename (completed by default)."""
+
+    statuses = statuses or {}
+    client = MagicMock()
+    running = SimpleNamespace(now=0, peak=0)
+    names: dict[str, str] = {}
+
+    async def create(file: tuple[str, bytes], purpose: str) -> SimpleNamespace:  # noqa: ARG001
+        if file[0] == "broken.json":
+            raise RuntimeError("upload failed")
+        running.now += 1
+        running.peak = max(running.peak, running.now)
+        await asyncio.sleep(delay)
+        running.now -= 1
+        names[f"file-{file[0]}"] = file[0]
+        return SimpleNamespace(id=f"file-{file[0]}", filename=file[0], bytes=len(file[1]), created_at=0)
+
+    async def create_and_poll(vector_store_id: str, file_id: str, poll_interval_ms: int) -> SimpleNamespace:  # noqa: ARG001
+        return SimpleNamespace(id=file_id, status=statuses.get(names[file_id], "completed"), last_error=None)
+
+    client.files.create = create
+    client.files.delete = AsyncMock(side_effect=lambda file_id: SimpleNamespace(id=file_id, deleted=True))
+    client.beta.vector_stores.files.create_and_poll = create_and_poll
+    client.beta.vector_stores.files.delete = AsyncMock(side_effect=lambda file_id, vector_store_id: SimpleNamespace(id=file_id, deleted=True))  # noqa: ARG005
+    client.running = running
+    return client
+
+
+async def test_ingest_yields_results_and_bounds_concurrency() -> None:
+    client = fake_client({"b.json": "failed"}, delay=0.01)
+    documents = [(f"{i}.json", b"[]") for i in range(10)] + [("b.json", b"[]"), ("broken.json", b"[]")]
+
+    results = [r async for r in Ingestor(client, "vs_1", max_concurrency=3).ingest(documents)]
+
+    by_name = {r.filename: r for r in results}
+    assert len(results) == len(documents)
+    assert client.running.peak == 3
+    assert by_name["0.json"].file.id == "file-0.json"  # type: ignore[union-attr]
+    assert (by_name["b.json"].status, by_name["b.json"].file) == ("failed", None)
+    assert (by_name["broken.json"].status, by_name["broken.json"].file_id) == (STATUS_ERROR, "")
+    # the file which could not be attached is deleted
+    client.files.delete.assert_awaited_once_with("file-b.json")
+
+
+async def test_ingest_consumes_async_iterables_lazily() -> None:
+    client = fake_client()
+    produced = []
+
+    async def documents() -> AsyncIterator[tuple[str, bytes]]:
+        for i in range(100):
+            produced.append(i)
+            yield f"{i}.json", b"[]"
+
+    async with aclosing(Ingestor(client, "vs_1", max_concurrency=2).ingest(documents())) as results:
+        async for result in results:
+            assert result.status == "completed"
+            break
+
+    # the consumer stopped early, the rest of the documents is not read
+    assert len(produced) < 10
+
+
+async def test_ingest_shares_the_pool_with_other_work() -> None:
+    client = fake_client(delay=0.01)
+    pool = UploadPool(2)
+    documents = [(f"{i}.json", b"[]") for i in range(6)]
+
+    async def other_work() -> None:
+        await asyncio.sleep(0.05)
+
+    # the other work takes one slot of the pool, the documents are uploaded in the other one
+    other = asyncio.create_task(pool.run(other_work))
+    await asyncio.sleep(0)
+    results = [r async for r in Ingestor(client, "vs_1", pool=pool).ingest(documents)]
+    await other
+
+    assert len(results) == len(documents)
+    assert client.running.peak == 1
+    assert pool.running == 0
+
+
+async def test_metrics_are_recorded_only_when_provided() -> None:
+    metrics.reset()
+    run_metrics = RunMetrics()
+    documents = [("a.json", b"[]"), ("broken.json", b"[]")]
+
+    _ = [r async for r in Ingestor(fake_client(), "vs_1").ingest(documents)]
+    assert not metrics.counters
+    assert not metrics.file_latencies
+
+    _ = [r async for r in Ingestor(fake_client(), "vs_1", metrics=run_metrics).ingest(documents)]
+    assert (run_metrics.counters["filesCreated"], run_metrics.counters["filesFailed"]) == (1, 1)
+    assert len(run_metrics.file_latencies) == 1
+
+
+async def test_delete_removes_files_from_vector_store_and_openai() -> None:
+    client = fake_client()
+
+    deleted = await Ingestor(client, "vs_1").delete(["file-1", "file-2"])
+
+    assert [d.id for d in deleted] == ["file-1", "file-2"]
+    client.beta.vector_stores.files.delete.assert_awaited_with("file-2", vector_store_id="vs_1")
+
+
+async def test_actor_pushes_rows_of_created_files(monkeypatch: pytest.MonkeyPatch) -> None:
+    push_data = AsyncMock()
+    monkeypatch.setattr(Actor, "push_data", push_data)
+    ingestor = Ingestor(fake_client({"b.json": "failed"}), "vs_1")
+
+    assert (await main.create_file_and_add_to_vector_store(ingestor, "a.json", b"[]")).id == "file-a.json"  # type: ignore[union-attr]
+    assert await main.create_file_and_add_to_vector_store(ingestor, "b.json", b"[]") is None
+    assert await main.create_file_and_add_to_vector_store(ingestor, "broken.json", b"[]") is None
+
+    rows = [c.args[0] for c in push_data.await_args_list]
+    assert rows == [
+        {"filename": "a.json", "file_id": "file-a.json", "status": "completed", "error": ""},
+        {"filename": "b.json", "file_id": "file-b.json", "status": "failed", "error": ""},
+    ]
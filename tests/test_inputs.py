@@ -0,0 +1,23 @@
+from unittest.mock import AsyncMock, MagicMock
+
+from src.input_model import OpenaiVectorStoreIntegration as ActorInput
+from src.main import check_inputs
+
+
+async def test_check_inputs_merges_source_ids() -> None:
+    client = MagicMock()
+    client.beta.vector_stores.retrieve = AsyncMock()
+
+    actor_input = ActorInput(  # type: ignore
+        vectorStoreId="vs_1",
+        openaiApiKey="test_openai_api_key",
+        datasetFields=["text"],
+        datasetIds=["ds_2", "ds_1"],
+        keyValueStoreIds=["kvs_2"],
+    )
+    payload = {"payload": {"resource": {"defaultDatasetId": "ds_1", "defaultKeyValueStoreId": "kvs_1"}}}
+
+    await check_inputs(client, actor_input, payload)
+    assert actor_input.datasetIds == ["ds_1", "ds_2"]
+    assert actor_input.keyValueStoreIds == ["kvs_1", "kvs_2"]
+    assert actor_input.datasetId == "ds_1"
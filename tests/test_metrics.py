@@ -0,0 +1,46 @@
+import httpx
+
+from src.clients import RoutingTransport
+from src.metrics import RunMetrics, endpoint_name, metrics, percentiles
+
+
+def test_endpoint_name() -> None:
+    assert endpoint_name("GET", "/v1/vector_stores/vs_abc/files/file-123") == "GET /v1/vector_stores/{id}/files/{id}"
+    assert endpoint_name("POST", "/v1/files") == "POST /v1/files"
+    assert endpoint_name("GET", "/v2/key-value-stores/kvs1/records/dir/a.pdf") == "GET /v2/key-value-stores/{id}/records/{key}"
+
+
+def test_percentiles() -> None:
+    assert percentiles([]) == {}
+    assert percentiles([float(i) for i in range(1, 101)]) == {"p50": 51.0, "p90": 91.0, "p99": 100.0, "max": 100.0}
+
+
+def test_run_metrics_report() -> None:
+    m = RunMetrics()
+    with m.phase("ingestion"), m.operation("upload"):
+        m.increment("filesCreated")
+        m.record_file(0.5)
+
+    report = m.report()
+    assert report["filesCreated"] == 1
+    assert report["operations"]["upload"]["count"] == 1
+    assert "ingestion" in report["phasesSecs"]
+    assert report["fileLatencySecs"]["max"] == 0.5
+    assert "Created 1 files" in m.summary()
+
+
+async def test_routing_transport_records_requests() -> None:
+    def handle(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(429 if request.method == "DELETE" else 200, json={})
+
+    metrics.reset()
+    mock = httpx.MockTransport(handle)
+    async with httpx.AsyncClient(transport=RoutingTransport(mock, mock, httpx.Timeout(1))) as client:
+        await client.post("https://api.openai.com/v1/files", content=b"12345")
+        await client.delete("https://api.openai.com/v1/files/file-1")
+
+    report = metrics.report()
+    assert report["apiCalls"] == {"POST /v1/files": 1, "DELETE /v1/files/{id}": 1}
+    assert report["rateLimited"] == 1
+    assert report["bytesUploaded"] == 5
+    assert report["failedAttempts"] == 1
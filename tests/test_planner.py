@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+from unittest.mock import AsyncMock, MagicMock
+
+from apify import Actor
+
+from src import planner
+from src.input_model import OpenaiVectorStoreIntegration as ActorInput
+from src.planner import CapacityPlan, plan_run, preflight
+from src.scheduler import DATASETS, KEY_VALUE_STORES
+from src.utils import OPENAI_MAX_FILES, OPENAI_MAX_TOKENS_PER_FILE
+
+if TYPE_CHECKING:
+    import pytest
+
+
+def mock_clients(vs_files: int, item_count: int, records: list[dict]) -> tuple[MagicMock, MagicMock]:
+    client = MagicMock()
+    vs = SimpleNamespace(id="vs_1", file_counts=SimpleNamespace(total=vs_files), usage_bytes=1000)
+    client.beta.vector_stores.retrieve = AsyncMock(return_value=vs)
+
+    aclient_apify = MagicMock()
+    items = [{"text": "a" * 96, "ignored": "b" * 1000}] * 10
+    aclient_apify.dataset.return_value.get = AsyncMock(return_value={"itemCount": item_count})
+    aclient_apify.dataset.return_value.list_items = AsyncMock(return_value=SimpleNamespace(items=items))
+    aclient_apify.key_value_store.return_value.list_keys = AsyncMock(return_value={"items": records})
+    return client, aclient_apify
+
+
+async def test_plan_estimates_uploads_from_a_sample() -> None:
+    actor_input = ActorInput(vectorStoreId="vs_1", openaiApiKey="key", datasetFields=["text"])  # type: ignore[call-arg]
+    records = [{"key": "a.pdf", "size": 300}, {"key": "b.pdf", "size": 700}, {"key": "c.exe", "size": 5000}]
+    client, aclient_apify = mock_clients(vs_files=10, item_count=1_000_000, records=records)
+    # about one token per 4 bytes
+    encoding = SimpleNamespace(encode=lambda s: range(len(s) // 4))
+    sources: dict[str, dict[str, set | None]] = {DATASETS: {"ds_1": None}, KEY_VALUE_STORES: {"kvs_1": None}}
+
+    plan = await plan_run(client, aclient_apify, actor_input, encoding, sources, deletions=3)  # type: ignore[arg-type]
+    record = plan.record()
+
+    dataset, kv_store = record["sources"]
+    assert dataset["items"] == 1_000_000
+    # only the selected fields are counted, `{"text": "a...a"}, ` is 110 bytes in the serialized sample
+    assert dataset["bytes"] == 110 * 1_000_000
+    assert dataset["files"] == -(-dataset["tokens"] // OPENAI_MAX_TOKENS_PER_FILE) > 1
+    assert (kv_store["files"], kv_store["bytes"]) == (2, 1000)
+    assert record["uploads"] == dataset["files"] + 2
+    assert record["peakFiles"] == 10 + record["uploads"]
+    assert record["violations"] == []
+
+
+async def test_plan_fails_fast_when_the_vector_store_would_be_full(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(Actor, "set_value", AsyncMock())
+    fail = AsyncMock()
+    monkeypatch.setattr(planner, "fail", fail)
+
+    plan = CapacityPlan({"id": "vs_1", "files": OPENAI_MAX_FILES - 1, "usageBytes": 0}, deletions=2)
+    plan.add(KEY_VALUE_STORES, "kvs_1", files=2, nbytes=100)
+    assert len(plan.check()) == 1
+
+    # the dry run saves the plan and stops without failing
+    assert not await preflight(plan, dry_run=True)
+    fail.assert_not_called()
+    assert not await preflight(plan, dry_run=False)
+    fail.assert_called_once()
+
+    # in the replace mode, the old files are deleted while the new ones are uploaded
+    plan = CapacityPlan({"id": "vs_1", "files": OPENAI_MAX_FILES - 1, "usageBytes": 0}, deletions=2, replace=True)
+    plan.add(KEY_VALUE_STORES, "kvs_1", files=2, nbytes=100)
+    assert plan.check() == []
+    assert await preflight(plan, dry_run=False)
@@ -0,0 +1,90 @@
+from __future__ import annotations
+
+import asyncio
+
+from src.pool import UploadPool
+
+
+async def test_upload_pool_map_keeps_order() -> None:
+    pool = UploadPool(max_concurrency=3)
+
+    async def double(x: int) -> int:
+        await asyncio.sleep(0.01 * (5 - x))
+        return 2 * x
+
+    assert await pool.map(double, range(5)) == [0, 2, 4, 6, 8]
+
+
+async def test_upload_pool_limits_concurrency() -> None:
+    pool = UploadPool(max_concurrency=2)
+    running, peak = 0, 0
+
+    async def task(_: int) -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await pool.map(task, range(10))
+    assert peak == 2
+
+
+async def test_upload_pool_resize() -> None:
+    pool = UploadPool(max_concurrency=4)
+    await pool.resize(1)
+    running, peak = 0, 0
+
+    async def task(_: int) -> None:
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+
+    await pool.map(task, range(5))
+    assert peak == 1
+
+    await pool.resize(10)
+    assert pool.limit == 4
+
+
+async def test_upload_pool_limits_buffered_bytes() -> None:
+    pool = UploadPool(max_concurrency=10, max_buffered_bytes=100)
+    peak = 0
+
+    async def task(_: int) -> None:
+        nonlocal peak
+        peak = max(peak, pool.buffered_bytes)
+        await asyncio.sleep(0.01)
+
+    sizes = [60, 30, 30, 200]
+    await pool.map(task, range(len(sizes)), size=sizes.__getitem__)
+    assert peak == 200  # a record larger than the budget runs alone
+    assert pool.buffered_bytes == 0
+
+
+async def test_upload_pool_priority_and_lanes() -> None:
+    pool = UploadPool(max_concurrency=2, lane_shares={"large": 0.5})
+    started: list[int] = []
+
+    async def task(size: int) -> None:
+        started.append(size)
+        await asyncio.sleep(0.001 * size)
+
+    sizes = [1, 50, 2, 40, 3]
+    await pool.map(task, sizes, priority=lambda size: -size, lane=lambda size: "large" if size >= 10 else "")
+    # the largest file starts first, the second large file waits for the large lane while the small files run
+    assert started == [50, 3, 2, 1, 40]
+
+
+async def test_upload_pool_largest_first_shortens_makespan() -> None:
+    sizes = [1, 1, 1, 1, 1, 1, 6]
+
+    async def makespan(priority: bool) -> float:  # noqa: FBT001
+        pool = UploadPool(max_concurrency=2)
+        start = asyncio.get_running_loop().time()
+        await pool.map(lambda size: asyncio.sleep(0.02 * size), sizes, priority=(lambda size: -size) if priority else None)
+        return asyncio.get_running_loop().time() - start
+
+    assert await makespan(priority=True) < await makespan(priority=False) * 0.8
@@ -0,0 +1,39 @@
+import time
+
+from src import profiling
+from src.profiling import Profiler, folded_stack
+
+
+def busy_loop(secs: float) -> None:
+    end = time.monotonic() + secs
+    while time.monotonic() < end:
+        sum(range(1000))
+
+
+def test_profiler_samples_main_thread() -> None:
+    p = Profiler(interval=0.001)
+    p.start()
+    busy_loop(0.2)
+    p.snapshot("busy")
+    p.snapshot("busy")  # rate limited
+    p.stop()
+
+    assert "busy_loop (test_profiling.py" in p.folded()
+    assert [s["label"] for s in p.snapshots] == ["busy", "end"]
+    assert p.snapshots[0]["topAllocators"]
+
+
+def test_folded_stack_outermost_first() -> None:
+    def inner() -> str:
+        import sys
+
+        return folded_stack(sys._getframe())
+
+    stack = inner().split(";")
+    assert stack[-1].startswith("inner (test_profiling.py")
+    assert stack[-2].startswith("test_folded_stack_outermost_first")
+
+
+def test_snapshot_is_noop_without_profiler() -> None:
+    assert profiling.profiler is None
+    profiling.snapshot("list_items")
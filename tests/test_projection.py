@@ -0,0 +1,29 @@
+from src.projection import MISSING, compile_field_path, compile_projection
+
+ITEM = {
+    "url": "https://example.com",
+    "text": "",
+    "metadata": {"title": "Example", "headers": [{"name": "h1"}, {"name": "h2"}], "languageCode": None},
+}
+
+
+def test_compile_field_path() -> None:
+    assert compile_field_path("url")(ITEM) == "https://example.com"
+    assert compile_field_path("metadata.title")(ITEM) == "Example"
+    assert compile_field_path("metadata.headers.1.name")(ITEM) == "h2"
+    assert compile_field_path("metadata.headers.-1.name")(ITEM) == "h2"
+    assert compile_field_path("metadata.headers.*.name")(ITEM) == ["h1", "h2"]
+    assert compile_field_path("metadata.*")(ITEM) == ["Example", [{"name": "h1"}, {"name": "h2"}], None]
+    assert compile_field_path("metadata.headers.5.name")(ITEM) is MISSING
+    assert compile_field_path("metadata.title.x")(ITEM) is MISSING
+    assert compile_field_path("missing")(ITEM) is MISSING
+
+
+def test_compile_projection_keeps_all_fields_and_drops_empty_items() -> None:
+    project = compile_projection(["url", "text", "metadata.title", "metadata.languageCode"])
+    items = [ITEM, {"text": ""}, {"other": 1}, {"text": "hello"}]
+
+    assert project(items) == [
+        {"url": "https://example.com", "text": "", "metadata.title": "Example", "metadata.languageCode": None},
+        {"url": None, "text": "hello", "metadata.title": None, "metadata.languageCode": None},
+    ]
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+import asyncio
+
+from src.replace import FileReplacer
+
+
+async def test_file_replacer() -> None:
+    deleted: list[str] = []
+
+    async def delete(ids: list[str]) -> None:
+        await asyncio.sleep(0)
+        deleted.extend(ids)
+
+    old_files = {"f1": "prefix_ds0_0.json", "f2": "prefix_ds0_1.json", "f3": "prefix_kvs0_a.pdf", "f4": "", "f5": "prefix_ds0_0.json"}
+    replacer = FileReplacer(old_files, delete)
+
+    replacer.replace("prefix_ds0_0.json")
+    replacer.replace("prefix_kvs0_a.pdf")
+    replacer.replace("prefix_kvs0_a.pdf")
+    # the files of another dataset with the same batch index do not replace the old files
+    replacer.replace("prefix_ds1_1.json")
+    await replacer.wait()
+
+    assert sorted(deleted) == ["f1", "f3", "f5"]
+    assert sorted(replacer.replaced) == ["f1", "f3", "f5"]
+    assert sorted(replacer.remaining) == ["f2", "f4"]
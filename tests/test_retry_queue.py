@@ -0,0 +1,102 @@
+from __future__ import annotations
+
+from types import SimpleNamespace
+from typing import TYPE_CHECKING
+from unittest.mock import AsyncMock, MagicMock
+
+import httpx
+import openai
+
+from src import main
+from src.constants import RETRY_MAX_ATTEMPTS
+from src.input_model import OpenaiVectorStoreIntegration as ActorInput
+from src.retry_queue import RetryQueue, classify_attach_error, classify_error
+from src.scheduler import DATASETS, KEY_VALUE_STORES, DeadlineScheduler
+
+if TYPE_CHECKING:
+    import pytest
+
+    from src.retry_queue import OnFailure
+
+
+def status_error(cls: type[openai.APIStatusError], status_code: int) -> openai.APIStatusError:
+    response = httpx.Response(status_code, request=httpx.Request("POST", "https://api.openai.com/v1/files"))
+    return cls("error", response=response, body=None)
+
+
+def test_classify_errors() -> None:
+    assert not classify_error(status_error(openai.InternalServerError, 500))[1]
+    assert not classify_error(status_error(openai.RateLimitError, 429))[1]
+    assert not classify_error(openai.APITimeoutError(request=httpx.Request("POST", "https://api.openai.com/v1/files")))[1]
+    assert classify_error(status_error(openai.BadRequestError, 400))[1]
+
+    image_only_pdf = SimpleNamespace(status="failed", last_error=SimpleNamespace(code="unsupported_file", message="No text"))
+    assert classify_attach_error(image_only_pdf) == ("unsupported_file: No text", True)  # type: ignore[arg-type]
+    assert classify_attach_error(SimpleNamespace(status="cancelled", last_error=None)) == ("status: cancelled", False)  # type: ignore[arg-type]
+
+
+def test_queue_separates_transient_and_permanent_failures() -> None:
+    queue = RetryQueue(transient=[{"kind": DATASETS, "sourceId": "ds_1", "item": 0, "attempts": RETRY_MAX_ATTEMPTS - 1}])
+    queue.add(DATASETS, "ds_1", 1, "prefix_ds_1_1.json", "timeout", permanent=False)
+    queue.add(KEY_VALUE_STORES, "kvs_1", "a.pdf", "prefix_kvs_1_a.pdf", "unsupported_file: No text", permanent=True)
+    # the file failed in the previous runs too many times
+    queue.add(DATASETS, "ds_1", 0, "prefix_ds_1_0.json", "timeout", permanent=False)
+
+    assert queue.transient() == {DATASETS: {"ds_1": [1]}}
+    record = queue.record()
+    assert [e["item"] for e in record["transient"]] == [1]
+    assert [e["item"] for e in record["permanent"]] == ["a.pdf", 0]
+    assert record["permanent"][1]["cause"] == f"timeout (gave up after {RETRY_MAX_ATTEMPTS} attempts)"
+
+    queue.succeeded(DATASETS, "ds_1", 1)
+    assert queue.transient() == {}
+
+
+async def test_retry_failed_files(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(main, "RETRY_BACKOFF_SECS", 0)
+    queue, scheduler = RetryQueue(), DeadlineScheduler(None)
+    queue.add(DATASETS, "ds_1", 1, "f1", "timeout", permanent=False)
+    queue.add(KEY_VALUE_STORES, "kvs_1", "a.pdf", "f2", "timeout", permanent=False)
+    calls = []
+
+    async def ingest(kind: str, source_id: str, only: set) -> list:
+        calls.append((kind, source_id, only))
+        if kind == DATASETS:
+            queue.succeeded(kind, source_id, 1)
+            return [SimpleNamespace(id="file-1")]
+        queue.add(kind, source_id, "a.pdf", "f2", "timeout", permanent=False)
+        return []
+
+    files = await main.retry_failed_files(queue, scheduler, ingest)
+
+    assert [f.id for f in files] == ["file-1"]
+    assert calls[:2] == [(DATASETS, "ds_1", {1}), (KEY_VALUE_STORES, "kvs_1", {"a.pdf"})]
+    # the key-value store record keeps failing and is deferred to the next run
+    assert scheduler.deferred[KEY_VALUE_STORES] == {"kvs_1": ["a.pdf"]}
+    assert scheduler.created[DATASETS]["ds_1"] == ["file-1"]
+
+
+async def test_retried_dataset_files_are_not_downloaded_again(monkeypatch: pytest.MonkeyPatch) -> None:
+    aclient_apify = MagicMock()
+    aclient_apify.dataset.return_value.list_items = AsyncMock(return_value=SimpleNamespace(items=[{"text": "a"}]))
+    actor_input = ActorInput(vectorStoreId="vs_1", openaiApiKey="key", datasetFields=["text"])  # type: ignore[call-arg]
+    uploads = []
+
+    async def upload(_: object, filename: str, content: bytes, on_failure: OnFailure) -> SimpleNamespace | None:
+        uploads.append((filename, content))
+        if len(uploads) == 1:
+            on_failure(*classify_error(TimeoutError("timeout")))
+            return None
+        return SimpleNamespace(id="file-1", filename=filename)
+
+    monkeypatch.setattr(main, "create_file_and_add_to_vector_store", upload)
+    queue = RetryQueue()
+    assert await main.create_files_from_dataset(MagicMock(), aclient_apify, actor_input, dataset_id="ds_1", retries=queue) == []
+    assert queue.transient() == {DATASETS: {"ds_1": [0]}}
+
+    files = await main.create_files_from_dataset(MagicMock(), aclient_apify, actor_input, dataset_id="ds_1", retries=queue, only={0})
+
+    assert [f.id for f in files] == ["file-1"]
+    aclient_apify.dataset.return_value.list_items.assert_awaited_once()
+    assert uploads[1] == ("ds_1_0.json", b'[{"text": "a"}]')
+    assert not queue.contents
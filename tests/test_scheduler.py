@@ -0,0 +1,55 @@
+from datetime import datetime, timedelta, timezone
+
+from src.input_model import OpenaiVectorStoreIntegration as ActorInput
+from src.main import get_resumed_work
+from src.scheduler import DATASETS, KEY_VALUE_STORES, DeadlineScheduler
+
+
+def test_scheduler_without_deadline_starts_everything() -> None:
+    assert DeadlineScheduler(None, cleanup_files=10_000).can_start(10**9)
+
+
+def test_scheduler_reserves_time_for_cleanup() -> None:
+    timeout_at = datetime.now(timezone.utc) + timedelta(seconds=100)
+    assert DeadlineScheduler(timeout_at, cleanup_files=10).can_start()
+    assert not DeadlineScheduler(timeout_at, cleanup_files=100).can_start()
+
+
+def test_scheduler_estimates_from_observed_files() -> None:
+    scheduler = DeadlineScheduler(datetime.now(timezone.utc) + timedelta(seconds=60))
+    scheduler.observe(2.0, 1000)
+    assert scheduler.estimate(500) == 2.0
+    assert scheduler.estimate(10_000) == 20.0
+    assert scheduler.can_start(1000)
+    assert not scheduler.can_start(100_000)
+
+
+def test_scheduler_pending_work() -> None:
+    scheduler = DeadlineScheduler(None)
+    scheduler.add_created(DATASETS, "ds_1", ["file-1"])
+    scheduler.add_created(KEY_VALUE_STORES, "kvs_1", ["file-2"])
+    scheduler.defer(DATASETS, "ds_1", 3)
+    scheduler.defer(DATASETS, "ds_1", 2)
+    assert scheduler.stopped_early
+
+    work = scheduler.pending_work("prefix", ["file-old"])
+    assert work == {
+        "filePrefix": "prefix",
+        "deleteFileIds": ["file-old"],
+        DATASETS: {"ds_1": {"pending": [2, 3], "created": ["file-1"]}},
+        KEY_VALUE_STORES: {},
+    }
+
+
+def test_resumed_work_skips_sources_processed_again() -> None:
+    actor_input = ActorInput(vectorStoreId="vs_1", openaiApiKey="key", datasetFields=["text"], datasetIds=["ds_2"])  # type: ignore
+    pending = {
+        "filePrefix": "",
+        "deleteFileIds": [],
+        DATASETS: {"ds_1": {"pending": [1], "created": []}, "ds_2": {"pending": [1], "created": []}},
+        KEY_VALUE_STORES: {"kvs_1": {"pending": ["a.pdf"], "created": ["file-1"]}},
+    }
+    resumed = get_resumed_work(actor_input, pending)
+    assert list(resumed[DATASETS]) == ["ds_1"]
+    assert resumed[KEY_VALUE_STORES]["kvs_1"]["created"] == ["file-1"]
+    assert get_resumed_work(actor_input, None) == {DATASETS: {}, KEY_VALUE_STORES: {}}
@@ -0,0 +1,69 @@
+import base64
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import pytest
+from apify import Actor
+from apify._crypto import decrypt_input_secrets
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from src import main
+from src.input_model import OpenaiVectorStoreIntegration as ActorInput
+from src.shards import encrypt_secret, get_child_input, get_shard, in_shard, is_coordinator, shard_range
+
+
+def test_shard_range_covers_all_items() -> None:
+    ranges = [shard_range(10, i, 3) for i in range(3)]
+    assert ranges == [(0, 3), (3, 3), (6, 4)]
+    assert shard_range(2, 2, 3) == (1, 1)
+
+
+def test_in_shard_assigns_every_key_to_one_shard() -> None:
+    keys = [f"file-{i}.pdf" for i in range(100)]
+    shards = [[k for k in keys if in_shard(k, i, 4)] for i in range(4)]
+    assert sorted(k for shard in shards for k in shard) == sorted(keys)
+    assert all(shards)
+
+
+def test_child_input() -> None:
+    payload = {"vectorStoreId": "vs_1", "openaiApiKey": "key", "datasetFields": ["text"], "shards": 2, "replaceFilesOneByOne": True}
+    actor_input = ActorInput(**payload, datasetIds=["ds_1"])  # type: ignore
+    assert is_coordinator(actor_input)
+
+    child = ActorInput(**get_child_input(payload, actor_input, 1, "ENCRYPTED_VALUE:cGFzcw==:a2V5"))
+    assert child.openaiApiKey == "ENCRYPTED_VALUE:cGFzcw==:a2V5"
+    assert not is_coordinator(child)
+    assert get_shard(child) == (1, 2)
+    assert child.datasetIds == ["ds_1"]
+    assert not child.replaceFilesOneByOne
+
+
+def test_encrypted_secret_is_decrypted_by_get_input(monkeypatch: pytest.MonkeyPatch) -> None:
+    passphrase = "passphrase"
+    private_key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+    pem = private_key.private_bytes(
+        serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.BestAvailableEncryption(passphrase.encode())
+    )
+    monkeypatch.setattr(Actor.config, "input_secrets_private_key_file", base64.b64encode(pem).decode())
+    monkeypatch.setattr(Actor.config, "input_secrets_private_key_passphrase", passphrase)
+
+    encrypted = encrypt_secret("sk-secret")
+    assert "sk-secret" not in encrypted
+    assert decrypt_input_secrets(private_key, {"openaiApiKey": encrypted}) == {"openaiApiKey": "sk-secret"}
+
+
+@patch("apify.Actor.push_data", AsyncMock())
+async def test_coordinator_deletes_old_files_once_all_shards_finish() -> None:
+    actor_input = ActorInput(vectorStoreId="vs_1", openaiApiKey="key", datasetFields=["text"], shards=2)  # type: ignore
+    manifest = {"created": [{"id": "file-new", "filename": "a.json"}], "deferred": 0, "failed": 0}
+
+    with patch.object(main, "run_shards", AsyncMock(return_value=[manifest, manifest])), patch.object(
+        main, "delete_files", AsyncMock()
+    ) as delete_files, patch.object(main, "delete_files_from_vector_store", AsyncMock()):
+        await main.run_coordinator(MagicMock(), actor_input, {}, {"file-old": "a.json"})
+        delete_files.assert_awaited_once()
+        assert delete_files.await_args.args[1] == ["file-old"]
+
+    with patch.object(main, "run_shards", AsyncMock(return_value=[manifest, None])), patch.object(main, "delete_files", AsyncMock()) as delete_files:
+        await main.run_coordinator(MagicMock(), actor_input, {}, {"file-old": "a.json"})
+        delete_files.assert_not_awaited()
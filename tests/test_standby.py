@@ -0,0 +1,75 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from http import HTTPStatus
+from types import SimpleNamespace
+
+from src.session import FileInventory, Session
+from src.standby import StandbyServer, TriggerCoalescer
+
+DEFAULTS = {"vectorStoreId": "vs_1", "openaiApiKey": "key", "datasetFields": ["text"], "filePrefix": "prefix"}
+
+
+async def test_triggers_within_window_are_coalesced_into_one_job() -> None:
+    jobs: list[dict] = []
+
+    async def job(payload: dict) -> None:
+        jobs.append(payload)
+
+    coalescer = TriggerCoalescer(job, window_secs=0.05)
+    worker = asyncio.create_task(coalescer.work())
+    server = StandbyServer(coalescer, DEFAULTS)
+
+    for dataset_id in ["ds_1", "ds_2", "ds_1"]:
+        status, _ = server.dispatch("POST", json.dumps({"payload": {"resource": {"defaultDatasetId": dataset_id}}}).encode())
+        assert status == HTTPStatus.ACCEPTED
+    # a webhook payload sent directly to the standby URL joins the batch, a trigger with other settings is a separate job
+    server.dispatch("POST", json.dumps({"resource": {"defaultKeyValueStoreId": "kvs_1"}}).encode())
+    server.dispatch("POST", json.dumps({"datasetId": "ds_3", "filePrefix": "other"}).encode())
+
+    await asyncio.sleep(0.2)
+    worker.cancel()
+
+    assert len(jobs) == 2
+    assert jobs[0] == DEFAULTS | {"datasetIds": ["ds_1", "ds_2"], "keyValueStoreIds": ["kvs_1"]}
+    assert jobs[1] == DEFAULTS | {"filePrefix": "other", "datasetIds": ["ds_3"], "keyValueStoreIds": []}
+    assert coalescer.status()["jobsFinished"] == 2
+
+
+def test_invalid_triggers_are_rejected() -> None:
+    server = StandbyServer(TriggerCoalescer(lambda _: asyncio.sleep(0), window_secs=1), DEFAULTS)
+
+    assert server.dispatch("POST", b"{}")[0] == HTTPStatus.BAD_REQUEST
+    assert server.dispatch("POST", b"not json")[0] == HTTPStatus.BAD_REQUEST
+    assert server.dispatch("POST", b'{"datasetId": "ds_1", "maxConcurrency": "many"}')[0] == HTTPStatus.BAD_REQUEST
+    assert server.dispatch("DELETE", b"")[0] == HTTPStatus.METHOD_NOT_ALLOWED
+    assert server.dispatch("GET", b"")[0] == HTTPStatus.OK
+
+
+def test_file_inventory_is_updated_by_jobs() -> None:
+    inventory = FileInventory(ttl_secs=60)
+    assert inventory.get("vs_1", "prefix") is None
+
+    inventory.put("vs_1", "prefix", {"file-1": "prefix_ds_1_0.json", "file-2": "prefix_ds_1_1.json"})
+    created = [SimpleNamespace(id="file-3", filename="prefix_ds_2_0.json"), SimpleNamespace(id="file-4", filename="other_0.json")]
+    inventory.update("vs_1", "prefix", created, deleted=["file-1"])  # type: ignore[arg-type]
+    assert inventory.get("vs_1", "prefix") == {"file-2": "prefix_ds_1_1.json", "file-3": "prefix_ds_2_0.json"}
+
+    inventory.invalidate("vs_1")
+    assert inventory.get("vs_1", "prefix") is None
+
+    inventory = FileInventory(ttl_secs=0)
+    inventory.put("vs_1", "prefix", {})
+    assert inventory.get("vs_1", "prefix") is None
+
+
+async def test_session_evicts_least_recently_used_clients() -> None:
+    session = Session(max_clients=2)
+    inputs = [SimpleNamespace(openaiApiKey=key, maxConcurrency=1) for key in ["k1", "k2", "k1", "k3"]]
+    clients = [await session.clients(actor_input) for actor_input in inputs]  # type: ignore[arg-type]
+
+    assert clients[0] == clients[2]
+    assert list(session._clients) == ["k1", "k3"]
+    await session.aclose()
+    assert not session._clients
@@ -0,0 +1,24 @@
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+# generous budget, the goal is to catch regressions such as importing the OpenAI SDK or tiktoken at module load
+IMPORT_TIME_BUDGET_SECS = 3.0
+
+SCRIPT = """
+import json, sys, time
+t = time.perf_counter()
+import src.main
+print(json.dumps({"time": time.perf_counter() - t, "modules": sorted(sys.modules)}))
+"""
+
+
+def test_import_main_does_not_load_heavy_modules() -> None:
+    # the command is the current interpreter with the constant script above, no untrusted input
+    out = subprocess.run([sys.executable, "-c", SCRIPT], capture_output=True, text=True, check=True, cwd=Path(__file__).parent.parent)  # noqa: S603
+    result = json.loads(out.stdout.strip().splitlines()[-1])
+
+    assert "tiktoken" not in result["modules"], "tiktoken should be imported only when an assistant is used"
+    assert "openai" not in result["modules"], "OpenAI SDK should be imported while the Actor is initializing"
+    assert result["time"] < IMPORT_TIME_BUDGET_SECS
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import threading
+
+from src.token_cache import TokenCountCache
+from src.utils import split_data_if_required, split_data_into_batches
+
+
+class WordEncoding:
+    """Tokenize by whitespace and count calls, a stand-in for tiktoken encoding."""
+
+    name = "words"
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def encode(self, text: str) -> list[str]:
+        self.calls += 1
+        return text.split()
+
+
+def test_token_cache_hits_skip_encoding() -> None:
+    encoding = WordEncoding()
+    cache = TokenCountCache()
+
+    assert cache.count("a b c", encoding) == 3  # type: ignore[arg-type]
+    assert cache.count("a b c", encoding) == 3  # type: ignore[arg-type]
+    assert encoding.calls == 1
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+def test_token_cache_roundtrip_and_eviction() -> None:
+    encoding = WordEncoding()
+    cache = TokenCountCache()
+    cache.count("old text", encoding)  # type: ignore[arg-type]
+
+    for _ in range(3):
+        cache = TokenCountCache.from_bytes(cache.to_bytes(max_age=2))
+        cache.count("new text here", encoding)  # type: ignore[arg-type]
+
+    assert cache.generation == 3
+    assert len(cache) == 2
+    assert len(TokenCountCache.from_bytes(cache.to_bytes(max_age=2))) == 1, "Entry not seen in last two runs is evicted"
+    assert len(TokenCountCache.from_bytes(cache.to_bytes(max_entries=1))) == 1
+
+    calls = encoding.calls
+    assert cache.count("new text here", encoding) == 3  # type: ignore[arg-type]
+    assert encoding.calls == calls
+
+
+def test_split_data_into_batches_with_token_counts() -> None:
+    data = [{"name": "Alice"}, {"name": "Bob"}, {"name": "Carol"}]
+    batches = split_data_into_batches(data, 15, WordEncoding(), token_counts=[5, 5, 5])  # type: ignore[arg-type]
+    assert batches == [data[:2], data[2:]]
+
+
+async def test_split_data_if_required_tokenizes_off_the_event_loop() -> None:
+    loop_thread = threading.get_ident()
+    threads: set[int] = set()
+
+    class ThreadRecordingEncoding(WordEncoding):
+        def encode(self, text: str) -> list[str]:
+            threads.add(threading.get_ident())
+            return super().encode(text)
+
+    data = [{"text": "a b c"}, {"text": "d e"}]
+    result = await split_data_if_required(data, ThreadRecordingEncoding(), TokenCountCache())  # type: ignore[arg-type]
+
+    assert result == [data]
+    assert threads
+    assert loop_thread not in threads
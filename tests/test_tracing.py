@@ -0,0 +1,31 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from src.metrics import RunMetrics
+from src.tracing import NoopSpan, span, tracing
+
+
+def test_span_is_noop_without_tracing(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("ACTOR_TRACES_FILE", raising=False)
+    monkeypatch.delenv("OTEL_EXPORTER_OTLP_ENDPOINT", raising=False)
+    with tracing(), span("files.create", {"file.name": "a.json"}) as s:
+        assert isinstance(s, NoopSpan)
+        s.set_attribute("file.id", "file-1")
+
+
+def test_spans_exported_to_file(monkeypatch: pytest.MonkeyPatch, tmp_path: Path) -> None:
+    pytest.importorskip("opentelemetry.sdk")
+    trace_id = "4bf92f3577b34da6a3ce929d0e0e4736"
+    monkeypatch.setenv("ACTOR_TRACES_FILE", str(tmp_path / "traces.jsonl"))
+    monkeypatch.setenv("TRACEPARENT", f"00-{trace_id}-00f067aa0ba902b7-01")
+
+    with tracing(), RunMetrics().phase("ingestion"), span("files.create", {"file.name": "a.json"}) as s:
+        s.set_attribute("file.id", "file-1")
+
+    spans = {s["name"]: s for s in map(json.loads, (tmp_path / "traces.jsonl").read_text().splitlines())}
+    assert set(spans) == {"run", "ingestion", "files.create"}
+    assert {s["context"]["trace_id"] for s in spans.values()} == {f"0x{trace_id}"}
+    assert spans["files.create"]["parent_id"] == spans["ingestion"]["context"]["span_id"]
+    assert spans["files.create"]["attributes"] == {"file.name": "a.json", "file.id": "file-1"}